@@ -1,40 +1,83 @@
 import os
 import json
-import hashlib
 import shutil
 import glob
 
-from jinja2 import Environment, BaseLoader
-
 import logging
 logger = logging.getLogger('APP')
 
-from dotenv import load_dotenv
-load_dotenv()
 
+from config import CONFIG
 from llm import llm_query
+from llm_parser import parse_tags
+from metrics import AGENT_STEPS
+from tracing import span
+from log_writer import LOG_WRITER, log_record
+from prompt_registry import PROMPTS
+from prefetch import FilePrefetcher
+from tool_memo import ToolMemo, LoopDetector, AGENT_LOOPS
+from conversation_store import Conversation, ConversationView
 from command_interpreter import CommandInterpreter
+from change_tracker import ChangeTracker, storage_path_of
+from relevance_index import RELEVANCE_INDEXES, RELEVANCE_TOP_K
+from task_budget import TaskBudget
 from prompts.analytic_tools import tools as analytic_tools
 from prompts.coder_tools import tools as coder_tools
 
-IDE_MCP_HOST=os.getenv('IDE_MCP_HOST')
-MAX_ITERATION=int(os.getenv('MAX_ITERATION'))
-DEEPTHINKING_AGENTS=os.getenv('DEEPTHINKING_AGENTS', '').split(',')
+IDE_MCP_HOST=CONFIG.ide_mcp_host
+MAX_ITERATION=CONFIG.required('max_iteration')
+DEEPTHINKING_AGENTS=CONFIG.deepthinking_agents
+# separate - plan by additional LLM call before the tool call, single - plan and tool call in one completion
+THINKING_MODE=CONFIG.thinking_mode
+# N - plan every N steps, error - plan only after failed step
+THINKING_FREQUENCY=CONFIG.thinking_frequency
+PREFETCH_FILES=CONFIG.prefetch_files
 
-def _parse_tool_arguments(json_data: str):
+def _parse_tool_arguments(json_data: str, cancel_token=None, budget: TaskBudget|None = None):
     try:
         return json.loads(json_data)
     except json.decoder.JSONDecodeError as e:
-        json_data = llm_query(f"fix this JSON: ```{json_data}```\nwrap answer into tag <RESULT>", ['RESULT']).get('RESULT', [''])[0]
+        json_data = llm_query(f"fix this JSON: ```{json_data}```\nwrap answer into tag <RESULT>", ['RESULT'], cancel_token=cancel_token, purpose='json_repair', budget=budget).get('RESULT', [''])[0]
         if not json_data:
             raise e
 
         return json.loads(json_data)
 
 
+def _bind_tool_arguments(arguments, tools: list[dict], name: str) -> list:
+    """
+    Positional arguments of the tool call in order of parameters of the tool schema (not of JSON keys):
+    omitted optional parameters are None, values of unknown keys fill the missing parameters in order
+    """
+    if type(arguments) is not dict:
+        return list(arguments) if type(arguments) is list else [arguments]
+
+    parameters = []
+    for tool in tools:
+        if tool['function']['name'] == name:
+            parameters = list(tool['function'].get('parameters', {}).get('properties', {}))
+            break
+
+    values = [arguments.get(parameter) for parameter in parameters]
+    unknown_values = [value for key, value in arguments.items() if key not in parameters]
+    for i, value in enumerate(values):
+        if value is None and unknown_values:
+            values[i] = unknown_values.pop(0)
+
+    values += unknown_values
+    while values and values[-1] is None:
+        values.pop()
+
+    return values
+
+
 class BaseAgent:
     DEEP_THINK_TAG = 'work_plan'
+    PLAN_REQUEST = f"Update the work plan in <{DEEP_THINK_TAG}> tag and call the next tool in the same answer."
     STORAGE_PATH = './storage'
+    BUDGET_WARNING = "WARNING: the task budget is almost spent ({spent}). Finish the work and call `report` with the current result!"
+    PARTIAL_REPORT_CALLS = 20
+    WRITE_TOOLS = ['write_file', 'replace_code_in_file']
 
     def __init__(self, role: str, system_prompt: str, step_prompt: str, thinking: bool):
         self.system_prompt = system_prompt
@@ -48,28 +91,70 @@ class BaseAgent:
         self.role = role
         self.log_file = role
         self.thinking = thinking
+        self.native_reasoning = False
         self.storage_path = None
-
-    def conversation_filter(self, conversation: list[dict]) -> list[dict]:
+        self.cancel_token = None
+        self.agent_step = 0
+        self.journal = None
+        self.journal_scope = None
+        self.resume_state = None
+        self.file_cache = None
+        self.content_pool = None
+        self.change_tracker = None
+        self.prefetcher = None
+        self.tool_memo = None
+        self.budget = None
+
+    def conversation_filter(self, conversation: ConversationView) -> ConversationView:
         return conversation
 
     def get_tools(self) -> list[dict]:
         return []
 
-    def init(self, instruction: str, manifest: dict, log_file: str):
+    def init(self, instruction: str, manifest: dict, log_file: str, cancel_token=None, file_cache=None, content_pool=None, change_tracker=None):
         self.instruction = instruction
         self.project_description = manifest['description']
         self.project_structure = manifest['files_structure']
-        self.interpreter = CommandInterpreter(IDE_MCP_HOST, manifest['base_path'])
+        self.interpreter = CommandInterpreter(IDE_MCP_HOST, manifest['base_path'], cancel_token, file_cache)
+        self.tool_memo = ToolMemo(manifest['base_path'])
         self.log_file = log_file
-
-        self.storage_path = os.path.join(self.STORAGE_PATH, hashlib.sha256(manifest['base_path'].encode()).hexdigest())
-        if not os.path.exists(self.storage_path):
-            os.mkdir(self.storage_path)
-
-    def run(self):
+        self.cancel_token = cancel_token
+        self.file_cache = file_cache
+        self.content_pool = content_pool
+        if file_cache and PREFETCH_FILES:
+            self.prefetcher = FilePrefetcher(manifest['base_path'], file_cache)
+
+        self.storage_path = storage_path_of(self.STORAGE_PATH, manifest['base_path'])
+        self.change_tracker = change_tracker if change_tracker else ChangeTracker(manifest['base_path'], self.storage_path)
+
+    def set_journal(self, journal, scope: str, resume_state: dict|None = None):
+        self.journal = journal
+        self.journal_scope = scope
+        self.resume_state = resume_state
+
+    def _checkpoint(self, conversation: Conversation):
+        if self.journal:
+            self.journal.checkpoint(self.journal_scope, self.agent_step, conversation)
+
+    def run(self, budget: TaskBudget|None = None):
+        self.agent_step = 0
+        self.budget = budget
+        with span('agent.run', role=self.role) as agent_span:
+            try:
+                yield from self._run()
+            finally:
+                AGENT_STEPS.observe(self.agent_step, role=self.role)
+                agent_span.set(steps=self.agent_step)
+                if self.prefetcher:
+                    # the next agent of the task can edit files: the prefetch must not outlive this agent
+                    self.prefetcher.wait()
+                    prefetch_stats = self.prefetcher.get_stats()
+                    agent_span.set(**prefetch_stats)
+                    self.log({'event': 'prefetch', **prefetch_stats}, True)
+
+    def _run(self):
         assert self.instruction, 'Init() s required'
-        specific_model = os.environ.get(f'MODEL:{self.role}', None)
+        specific_model = CONFIG.role_model(self.role)
 
         yield {
             'message': f"start {self.role}...",
@@ -77,14 +162,17 @@ class BaseAgent:
             'type': "info",
         }
 
-        sub_prompt = self.step_prompt.format(
-            project_description=self.project_description,
-            project_structure="\n".join([f"- {path}" for path in self.project_structure]),
-        )
+        sub_prompt = PROMPTS.render_manifest(self.step_prompt, self.project_description, self.project_structure)
 
-        self.log("============= INSTRUCTION =============\n" + self.instruction, True)
+        if self.file_cache:
+            sub_prompt += self._loaded_files_prompt()
 
-        conversation = [
+        if RELEVANCE_TOP_K > 0 and not self.resume_state:
+            sub_prompt += self._relevant_files_prompt()
+
+        self.log({'event': 'instruction', 'instruction': self.instruction}, True)
+
+        conversation = Conversation.from_messages([
             {
                 'role': 'system',
                 'content': self.system_prompt + "\n" + sub_prompt
@@ -93,12 +181,25 @@ class BaseAgent:
                 'role': 'user',
                 'content': self.instruction
             }
-        ]
+        ], self.content_pool)
+
+        self.agent_step = 1
+        pending_output = None
+        if self.resume_state and self.resume_state['conversation']:
+            conversation = Conversation.from_messages(self.resume_state['conversation'], self.content_pool)
+            self.agent_step = self.resume_state['step']
+            pending_output = self.resume_state['pending']
+            self.journal.restore(self.journal_scope, conversation)
+        else:
+            self._checkpoint(conversation)
 
-        agent_step = 1
         max_skip_command = 3
+        loop_detector = LoopDetector()
+        is_loop_warned = False
+        is_budget_warned = False
+        last_step_failed = False
         while True:
-            if agent_step > MAX_ITERATION:
+            if self.agent_step > MAX_ITERATION:
                 logger.warning("MAX_STEP exceed!")
                 yield {
                     'message': "MAX_STEP exceed!",
@@ -108,11 +209,22 @@ class BaseAgent:
                 }
                 break
 
-            conversation = self.conversation_filter(conversation)
+            exhausted_limit = self.budget.exhausted() if self.budget else None
+            if exhausted_limit and not pending_output:
+                logger.warning(f"Task budget exhausted: {exhausted_limit}")
+                self.log({'event': 'budget_exhausted', 'limit': exhausted_limit, **self.budget.spent()}, True)
+                yield {
+                    'message': self._partial_report(conversation, exhausted_limit),
+                    'result': {},
+                    'type': "report",
+                    'exit': True,
+                }
+                break
 
             yield {'type': 'nope'}
-            if self.thinking:
-                think_output = llm_query(conversation, model_name=specific_model)
+            is_planning = self._is_planning_step(last_step_failed)
+            if is_planning and THINKING_MODE == 'separate' and not pending_output:
+                think_output = llm_query(self.conversation_filter(conversation.view()).to_provider(), model_name=specific_model, cancel_token=self.cancel_token, purpose='plan', budget=self.budget)
                 think_output = think_output.get('_output', '')
                 if think_output and think_output.find(f'<{self.DEEP_THINK_TAG}>') > -1:
                     think_output_msg = think_output\
@@ -128,10 +240,38 @@ class BaseAgent:
                         'role': 'assistant',
                         'content': think_output
                     })
+                    self._checkpoint(conversation)
 
-            output = llm_query(conversation, tools=self.get_tools(), model_name=specific_model)
-            self.log("============= LLM OUTPUT =============", True)
-            self.log('LLM OUTPUT:\n' + output.get('output', ''), True)
+            if pending_output:
+                # LLM call was completed before restart
+                output = pending_output
+                pending_output = None
+            else:
+                if self.prefetcher:
+                    # warm file cache while LLM is thinking
+                    self.prefetcher.schedule(str(conversation[-1].get('content') or ''))
+
+                messages = self.conversation_filter(conversation.view()).to_provider()
+                if is_planning and THINKING_MODE == 'single' and not self.native_reasoning:
+                    # plan comes in the same completion as the tool call
+                    messages = messages + [{'role': 'user', 'content': self.PLAN_REQUEST}]
+
+                # the last steps or after the loop warning the agent has to report: simple call
+                purpose = 'report' if self.agent_step >= MAX_ITERATION or is_loop_warned or is_budget_warned else 'agent'
+                output = llm_query(messages, tools=self.get_tools(), model_name=specific_model, cancel_token=self.cancel_token, purpose=purpose, budget=self.budget)
+                if self.journal:
+                    self.journal.llm_output(self.journal_scope, self.agent_step, output)
+
+            self.log({'event': 'llm_output', 'output': output.get('_output', '')}, True)
+
+            plan = self._extract_plan(output) if self.thinking and THINKING_MODE == 'single' else ''
+            if plan and output.get('_tool_calls'):
+                self.log({'event': 'plan', 'plan': plan}, True)
+                yield {
+                    'message': plan,
+                    'result': {},
+                    'type': "markdown",
+                }
 
             tool_call_description = None
             current_tool_call = None
@@ -143,7 +283,9 @@ class BaseAgent:
                 tool_call_description = {
                     'function': tool_call.function.name,
                     'id': tool_call.id,
-                    'args': list(_parse_tool_arguments(tool_call.function.arguments).values()) if tool_call.function.arguments else []
+                    'args': _bind_tool_arguments(
+                        _parse_tool_arguments(tool_call.function.arguments, self.cancel_token, self.budget), self.get_tools(), tool_call.function.name
+                    ) if tool_call.function.arguments else []
                 }
                 current_tool_call = tool_call
                 break
@@ -158,6 +300,7 @@ class BaseAgent:
                 break
             elif not current_tool_call and output['_output']:
                 max_skip_command -= 1
+                last_step_failed = True
 
                 yield {
                     'message': output['_output'],
@@ -170,16 +313,33 @@ class BaseAgent:
                     'role': 'assistant',
                     'content': output['_output'],
                 })
+                self._checkpoint(conversation)
 
                 continue
 
-            self.log(tool_call_description, True)
+            self.log({'event': 'tool_call', **tool_call_description}, True)
             conversation.append({
                 'role': 'assistant',
                 'content': output['_output'],
                 'tool_calls': [current_tool_call]
             })
 
+            is_loop = tool_call_description['function'] != 'report' and loop_detector.add(
+                LoopDetector.signature(tool_call_description['function'], tool_call_description['args'])
+            )
+            if is_loop:
+                AGENT_LOOPS.inc(role=self.role)
+
+            if is_loop and is_loop_warned:
+                logger.warning("Loop of tool calls detected!")
+                yield {
+                    'message': "Loop of tool calls detected, early stop",
+                    'result': {},
+                    'type': "error",
+                    'exit': True,
+                }
+                break
+
             if tool_call_description['function'] == 'report':
                 yield {
                     'message': tool_call_description['args'][0],
@@ -190,14 +350,47 @@ class BaseAgent:
                 break
             else:
                 yield {'type': 'nope'}
-                result = self.interpreter.execute(tool_call_description['function'], tool_call_description['args'])
+                result = self.tool_memo.lookup(tool_call_description['function'], tool_call_description['args'])
+                if result is None:
+                    if self.prefetcher and tool_call_description['function'] == 'read_file' and tool_call_description['args']:
+                        self.prefetcher.on_read(str(tool_call_description['args'][0]))
+                    if self.prefetcher and tool_call_description['function'] in self.WRITE_TOOLS:
+                        self.prefetcher.wait()
+
+                    result = self.interpreter.execute(tool_call_description['function'], tool_call_description['args'])
+                    if not result.get('error', False):
+                        self.tool_memo.store(tool_call_description['function'], tool_call_description['args'], current_tool_call.id, result)
+
                 is_success = not result.get('error', False)
+                last_step_failed = not is_success or is_loop
+
+                if is_success and self.prefetcher:
+                    self.prefetcher.on_result(result)
+
+                if is_loop:
+                    is_loop_warned = True
+                    result['result'] += "\n\nWARNING: you are repeating the same tool calls. Change the approach or call `report` with the current result!"
+
+                if self.budget and not is_budget_warned and self.budget.is_low():
+                    is_budget_warned = True
+                    budget_warning = self.BUDGET_WARNING.format(spent=self.budget.describe())
+                    result['result'] += "\n\n" + budget_warning
+                    yield {
+                        'message': budget_warning,
+                        'result': {},
+                        'type': "info",
+                        'exit': False,
+                    }
 
                 if 'error' in result:
                     del result['error']
 
+                if is_success and self.file_cache and result.get('tool_name') == 'read':
+                    self.file_cache.set_fact(result['file_path'], 'read_by', self.role)
+
                 if is_success and 'file_edit' in result:
-                    result['source_file_path'] = self.cache_file(result['file_name'], result['source_file_content'])
+                    # source is kept in git or in the storage only, not in events
+                    result['source_file_path'] = self.change_tracker.source(result['file_name'], result.pop('source_file_content'))
 
                 if not tool_call_description['args']:
                     tool_call_description['args'] = ['']
@@ -216,72 +409,90 @@ class BaseAgent:
                     'name': current_tool_call.function.name,
                     'content': result['result'],
                 }
-                self.log("TOOL RESULT:", True)
-                self.log(result_msg, True)
+                self.log({'event': 'tool_result', **result_msg}, True)
 
                 conversation.append(result_msg)
 
-                agent_step += 1
+                self.agent_step += 1
+                self._checkpoint(conversation)
 
-    def log(self, data, to_file=False):
-        if type(data) is list or type(data) is dict:
-            data = json.dumps(data, ensure_ascii=False, indent=4)
+    def _is_planning_step(self, last_step_failed: bool) -> bool:
+        if not self.thinking:
+            return False
 
-        data = f"[ {self.role} ] {data}"
+        if THINKING_FREQUENCY == 'error':
+            return last_step_failed
 
-        if not to_file:
-            logger.info(data)
-            return
+        return (self.agent_step - 1) % THINKING_FREQUENCY == 0
 
-        with open(self.log_file, "a", encoding='utf8') as f:
-            f.write(data + "\n\n")
+    def _extract_plan(self, output: dict) -> str:
+        if output.get('_reasoning'):
+            # provider returns native reasoning: structured plan is not requested anymore
+            self.native_reasoning = True
+            return output['_reasoning']
 
-    def cache_file(self, file_name: str, source_file_content: str) -> str:
-        source_file_content_path = os.path.join(self.storage_path, hashlib.sha256(file_name.encode()).hexdigest() + '.txt')
-        if not os.path.exists(source_file_content_path):
-            with open(source_file_content_path, 'w', encoding='utf8') as f:
-                f.write(source_file_content)
+        plan = parse_tags(output.get('_output', ''), [self.DEEP_THINK_TAG]).get(self.DEEP_THINK_TAG)
+        return plan[0].strip() if plan else ''
 
-        return os.path.abspath(source_file_content_path)
+    def _partial_report(self, conversation: Conversation, limit: str) -> str:
+        # no LLM call is left: the report is made of the tool calls done and the last text of the model
+        tool_calls = []
+        last_text = ''
+        for record in conversation.records():
+            if record.role != 'assistant':
+                continue
 
+            if record.content:
+                last_text = str(record.content)
+            for tool_call in record.tool_calls or ():
+                tool_calls.append(f"- {tool_call.name} {tool_call.arguments[:200]}")
 
-class AnalyticAgent(BaseAgent):
-    def get_tools(self) -> list[dict]:
-        return analytic_tools
+        report = [f"The work is stopped, the task budget is exhausted ({limit}): the result is partial."]
+        if tool_calls:
+            report.append("Tool calls done:\n" + "\n".join(tool_calls[-self.PARTIAL_REPORT_CALLS:]))
+        if last_text:
+            report.append("Last notes:\n" + last_text)
 
-class CoderAgent(BaseAgent):
-    def get_tools(self) -> list[dict]:
-        return coder_tools
+        return "\n\n".join(report)
 
-    def conversation_filter(self, conversation: list[dict]) -> list[dict]:
-        last_tool = ''
-        modified_conversation = []
-        for m in conversation:
-            modified_conversation.append(m)
+    def _relevant_files_prompt(self) -> str:
+        with span('relevance.search', role=self.role):
+            index = RELEVANCE_INDEXES.get(self.interpreter.project_root)
+            index.refresh()
+            return index.prompt(self.instruction)
 
-            if 'tool_calls' not in m:
-                continue
+    def _loaded_files_prompt(self) -> str:
+        loaded_files = self.file_cache.loaded_files()
+        if not loaded_files:
+            return ''
 
-            tool = m['tool_calls'][0]
-            _hash = tool.function.name + ':' + tool.function.arguments
+        files = []
+        for entry in loaded_files:
+            description = f"{entry.facts['lines']} lines" if 'lines' in entry.facts else ''
+            if 'read_by' in entry.facts:
+                description += f", read by {entry.facts['read_by']}"
+            files.append(f"- {entry.path} ({description.strip(', ')})")
 
-            if tool.function.name != 'read_file':
-                last_tool = _hash
-                continue
+        return "\n\n## Files already read by other agents in this task (read_file returns them from memory):\n" + "\n".join(files)
 
-            if _hash == last_tool:
-                modified_conversation.append({
-                    'role': 'tool',
-                    'tool_call_id': tool.id,
-                    'name': tool.function.name,
-                    'content': 'File has read above!',
-                })
+    def log(self, data, to_file=False):
+        if not to_file:
+            if type(data) is list or type(data) is dict:
+                data = json.dumps(data, ensure_ascii=False, indent=4)
 
-                return modified_conversation
-            else:
-                last_tool = _hash
+            logger.info(f"[ {self.role} ] {data}")
+            return
 
-        return conversation
+        LOG_WRITER.write(self.log_file, log_record(self.role, data))
+
+
+class AnalyticAgent(BaseAgent):
+    def get_tools(self) -> list[dict]:
+        return analytic_tools
+
+class CoderAgent(BaseAgent):
+    def get_tools(self) -> list[dict]:
+        return coder_tools
 
 
 class Agent:
@@ -292,9 +503,14 @@ class Agent:
 
     STEP_PROMPT = './prompts/step.txt'
 
+    # agents without write tools, can work in parallel
+    READ_ONLY_ROLES = ['ANALYTIC']
+
     @staticmethod
-    def setUp():
-        for cache_path in glob.glob(os.path.join(BaseAgent.STORAGE_PATH, '*')):
+    def setUp(project_base_path: str|None = None):
+        # cached sources of edited files: of the project or of all projects
+        pattern = storage_path_of(BaseAgent.STORAGE_PATH, project_base_path) if project_base_path else os.path.join(BaseAgent.STORAGE_PATH, '*')
+        for cache_path in glob.glob(pattern):
             shutil.rmtree(cache_path)
 
     @staticmethod
@@ -302,17 +518,11 @@ class Agent:
         assert role in Agent.PROMPTS, f'invalid role: {role}'
 
         thinking = role in DEEPTHINKING_AGENTS
-        system_prompt = Agent.PROMPTS[role]
-        with open(system_prompt, 'r', encoding='utf8') as f:
-            system_prompt = f.read()
-
-            rtemplate = Environment(loader=BaseLoader).from_string(system_prompt)
-            system_prompt = rtemplate.render(params={
-                'thinking': thinking
-            })
-
-        with open(Agent.STEP_PROMPT, 'r', encoding='utf8') as f:
-            step_prompt = f.read()
+        system_prompt = PROMPTS.render(Agent.PROMPTS[role], params={
+            'thinking': thinking,
+            'plan_on_request': THINKING_MODE == 'single',
+        })
+        step_prompt = PROMPTS.get(Agent.STEP_PROMPT)
 
 
         if role == 'ANALYTIC':
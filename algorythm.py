@@ -2,20 +2,34 @@ import json
 import os
 import glob
 import datetime
+import hashlib
+import uuid
+import queue
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 
+from config import CONFIG
 from mcp_helper import tool_call
 from llm import llm_query
 from path_helper import get_relative_path
 from command_interpreter import CommandInterpreter
-from agents import Agent
+from cancellation import CancellationToken
+from metrics import AGENT_STEPS
+from tracing import span
+from log_writer import LOG_WRITER, log_record
+from journal import TaskJournal
+from file_cache import FileKnowledgeCache
+from conversation_store import Conversation, ContentPool
+from prompt_registry import PROMPTS
+from agents import Agent, BaseAgent
+from change_tracker import ChangeTracker, storage_path_of
+from relevance_index import RELEVANCE_INDEXES, RELEVANCE_TOP_K
+from task_budget import TaskBudget
 from prompts.supervisor_tools import tools as supervisor_tools
 
-from dotenv import load_dotenv
-
-load_dotenv()
-
-IDE_MCP_HOST=os.getenv('IDE_MCP_HOST')
-MAX_ITERATION=os.getenv('MAX_ITERATION')
+IDE_MCP_HOST=CONFIG.ide_mcp_host
+MAX_ITERATION=CONFIG.required('max_iteration')
+MAX_PARALLEL_AGENTS=CONFIG.max_parallel_agents
 
 import logging
 logger = logging.getLogger('APP')
@@ -24,16 +38,20 @@ logging.basicConfig(level=logging.INFO)
 
 class Copilot:
     PROJECT_DESCRIPTION = "./AGENTS.md"
-    MAX_STEP = int(MAX_ITERATION)
-    LOG_FILE = './conversations_log/log.log'
+    MAX_STEP = MAX_ITERATION
+    LOG_PATH = './conversations_log'
+    SYSTEM_PROMPT = './prompts/supervisor_system.txt'
+    STEP_PROMPT = './prompts/step.txt'
+    BUDGET_WARNING = "WARNING: the task budget is almost spent ({spent}). Do not call agents anymore: answer the user with the current result and exit."
 
-    def __init__(self, instruction: str, session: dict):
+    def __init__(self, instruction: str, session: dict, cancel_token: CancellationToken|None=None):
         self.output = []
         self.last_step = None
         self.last_tool = {}
         self.manifest = {}
         self.session = session
         self.instruction = instruction
+        self.cancel_token = cancel_token
 
         self.interpreter = None
 
@@ -43,12 +61,37 @@ class Copilot:
         self.agent_step = 0
 
         self.command_state = []
+        self.task_id = None
+        self.log_file = None
+        self.journal = None
+        self.resume_state = None
+        self.file_cache = None
+        self.content_pool = None
+        self.change_tracker = None
+        self.budget = None
+
+    @classmethod
+    def resume(cls, journal_path: str, session: dict, cancel_token: CancellationToken|None=None) -> 'Copilot':
+        state = TaskJournal.load(journal_path)
+        assert state['task'], f'Empty journal: {journal_path}'
+
+        copilot = cls(state['task']['instruction'], session, cancel_token)
+        copilot.task_id = state['task']['task_id']
+        copilot.journal = TaskJournal(journal_path)
+        copilot.resume_state = state
+        return copilot
+
+    def _pop_resume_scope(self, scope: str) -> dict|None:
+        if not self.resume_state:
+            return None
+
+        return self.resume_state['scopes'].pop(scope, None)
 
     def get_manifest(self, project_base_path: str):
         content = tool_call(IDE_MCP_HOST, 'get_file_text_by_path', {
             'pathInProject': self.PROJECT_DESCRIPTION,
             'projectPath': project_base_path
-        })
+        }, self.cancel_token)
 
         if 'error' in content or 'status' not in content:
             return ''
@@ -59,10 +102,10 @@ class Copilot:
         assert 'project_base_path' in self.session, 'Session not contains `project_base_path`'
 
         if not self.system_prompt:
-            self.system_prompt = open('./prompts/supervisor_system.txt', 'r', encoding='utf8').read()
+            self.system_prompt = PROMPTS.get(self.SYSTEM_PROMPT)
 
         if not self.prompt:
-            self.prompt = open('./prompts/step.txt', 'r', encoding='utf8').read()
+            self.prompt = PROMPTS.get(self.STEP_PROMPT)
 
         assert self.instruction, 'Empty instruction'
 
@@ -77,7 +120,22 @@ class Copilot:
         self.executed_commands = []
         self.command_state = []
         self.agent_step = 1
-        self.interpreter = CommandInterpreter(IDE_MCP_HOST, self.session['project_base_path'])
+        if not self.task_id:
+            self.task_id = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:8]
+
+        if not self.journal:
+            self.journal = TaskJournal(TaskJournal.get_path(self.session['project_base_path'], self.task_id))
+            self.journal.start(self.task_id, self.session['project_base_path'], self.instruction)
+
+        self.log_file = os.path.join(
+            self.LOG_PATH,
+            hashlib.sha256(self.session['project_base_path'].encode()).hexdigest(),
+            self.task_id + '.jsonl'
+        )
+        self.file_cache = FileKnowledgeCache(self.session['project_base_path'])
+        self.content_pool = ContentPool()
+        self.change_tracker = ChangeTracker(self.session['project_base_path'], storage_path_of(BaseAgent.STORAGE_PATH, self.session['project_base_path']))
+        self.interpreter = CommandInterpreter(IDE_MCP_HOST, self.session['project_base_path'], self.cancel_token, self.file_cache)
 
     def _read_project_structure(self, base_path) -> list:
         result = []
@@ -93,26 +151,42 @@ class Copilot:
         return result
 
     def run(self):
-        specific_model = os.environ.get('MODEL:SUPERVISOR', None)
+        self.agent_step = 0
+        # one budget for the supervisor and all sub-agents of the task, a resumed task starts a new one
+        self.budget = TaskBudget.from_config()
+        with span('copilot.run', project=self.session.get('project_base_path')) as copilot_span:
+            try:
+                yield from self._run()
+            finally:
+                AGENT_STEPS.observe(self.agent_step, role='SUPERVISOR')
+                budget_spent = self.budget.spent()
+                copilot_span.set(steps=self.agent_step, **{f"budget_{name}": value for name, value in budget_spent.items()})
+                if self.log_file:
+                    self.log({'event': 'budget', **budget_spent}, True)
+
+    def _run(self):
+        specific_model = CONFIG.role_model('SUPERVISOR')
         yield {
             'message': f"start SUPERVISOR...",
             'type': "info",
         }
 
         self._init()
-        Agent.setUp()
-
-        with open(self.LOG_FILE, "w", encoding='utf8') as f:
-            f.write(str(datetime.datetime.now()) + "\n\n")
+        if not self.resume_state:
+            # cached sources of edited files are still needed for the resumed task
+            Agent.setUp(self.session['project_base_path'])
 
         self.log(f"RUN. Messages: `{self.instruction}`", False)
+        self.log({'event': 'resume' if self.resume_state else 'run', 'task_id': self.task_id, 'project': self.manifest['base_path'], 'instruction': self.instruction}, True)
 
-        sub_prompt = self.prompt.format(
-            project_description=self.manifest['description'],
-            project_structure="\n".join([f"- {path}" for path in self.manifest['files_structure']]),
-        )
+        sub_prompt = PROMPTS.render_manifest(self.prompt, self.manifest['description'], self.manifest['files_structure'])
+        if RELEVANCE_TOP_K > 0 and not self.resume_state:
+            with span('relevance.search', role='SUPERVISOR'):
+                relevance_index = RELEVANCE_INDEXES.get(self.manifest['base_path'])
+                relevance_index.refresh()
+                sub_prompt += relevance_index.prompt(self.instruction)
 
-        conversation_log = [
+        conversation_log = Conversation.from_messages([
             {
                 'role': 'system',
                 'content': self.system_prompt + "\n" + sub_prompt
@@ -121,11 +195,22 @@ class Copilot:
                 'role': 'user',
                 'content': self.instruction
             }
-        ]
+        ], self.content_pool)
+
+        self.agent_step = 1
+        pending_output = None
+        is_budget_warned = False
+        resume_scope = self._pop_resume_scope(TaskJournal.SUPERVISOR_SCOPE)
+        if resume_scope and resume_scope['conversation']:
+            conversation_log = Conversation.from_messages(resume_scope['conversation'], self.content_pool)
+            self.agent_step = resume_scope['step']
+            pending_output = resume_scope['pending']
+            self.journal.restore(TaskJournal.SUPERVISOR_SCOPE, conversation_log)
+        else:
+            self.journal.checkpoint(TaskJournal.SUPERVISOR_SCOPE, self.agent_step, conversation_log)
 
-        agent_step_counter = 1
         while True:
-            if agent_step_counter > self.MAX_STEP:
+            if self.agent_step > self.MAX_STEP:
                 logger.warning("MAX_STEP exceed!")
                 yield {
                     'message': "MAX_STEP exceed!",
@@ -133,129 +218,283 @@ class Copilot:
                 }
                 break
 
-            yield {'type': 'nope'}
-            output = llm_query(conversation_log, tools=supervisor_tools, model_name=specific_model)
-            self.log("============= LLM OUTPUT =============", True)
-
-            tool_call_description = None
-            current_tool_call = None
-            for tool_call in output['_tool_calls']:
-                tool_call_description = {
-                    'function': tool_call.function.name,
-                    'id': tool_call.id,
+            exhausted_limit = self.budget.exhausted()
+            if exhausted_limit and not pending_output:
+                logger.warning(f"Task budget exhausted: {exhausted_limit}")
+                self.log({'event': 'budget_exhausted', 'limit': exhausted_limit, **self.budget.spent()}, True)
+                yield {
+                    'message': f"Task budget exhausted: {self.budget.describe()}",
+                    'type': "error",
+                }
+                yield {
+                    'message': self._partial_report(conversation_log),
+                    'type': "markdown",
                 }
+                break
 
-                arguments = json.loads(tool_call.function.arguments) if tool_call.function.arguments else []
+            yield {'type': 'nope'}
+            if pending_output:
+                # LLM call was completed before restart
+                output = pending_output
+                pending_output = None
+            else:
+                output = llm_query(conversation_log.to_provider(), tools=supervisor_tools, model_name=specific_model, cancel_token=self.cancel_token, purpose='supervisor', budget=self.budget)
+                self.journal.llm_output(TaskJournal.SUPERVISOR_SCOPE, self.agent_step, output)
 
-                if tool_call.function.name == 'call_agent':
-                    instruction = arguments.get('instruction', None)
-                    agent_name = arguments.get('agent_name', None)
-                    tool_call_description['args'] = [agent_name, instruction]
-                elif tool_call.function.name == 'message':
-                    tool_call_description['args'] = [arguments.get('text', None)]
+            self.log({'event': 'llm_output', 'output': output['_output']}, True)
 
-                current_tool_call = tool_call
-                break
+            tool_call_descriptions = [self._describe_tool_call(tool_call) for tool_call in output['_tool_calls']]
 
-            if not tool_call_description and output['_output']:
+            if not tool_call_descriptions and output['_output']:
                 conversation_log.append({
                     'role': 'assistant',
                     'content': output['_output'],
                 })
-                self.log(output['_output'], True)
+                self.log({'event': 'message', 'text': output['_output']}, True)
 
                 yield {
                     'message': output['_output'],
                     'type': "markdown",
                 }
 
-                agent_step_counter += 1
+                self.agent_step += 1
+                self.journal.checkpoint(TaskJournal.SUPERVISOR_SCOPE, self.agent_step, conversation_log)
                 continue
 
-            if not tool_call_description and not output['_output']:
+            if not tool_call_descriptions and not output['_output']:
                 yield {
                     'message': "Agent call error (empty)",
                     'type': "error",
                 }
                 break
 
-            self.log(tool_call_description, True)
+            is_exit = False
+            is_error = False
+            tool_results = {}
+            agent_calls = []
+            for i, tool_call_description in enumerate(tool_call_descriptions):
+                self.log({'event': 'tool_call', **tool_call_description}, True)
 
-            agent_complete_report = None
-            if tool_call_description['function'] == 'exit':
-                break
-            elif tool_call_description['function'] == 'message':
-                yield {
-                    'message': tool_call_description['args'][0],
-                    'type': "markdown",
-                }
-
-                agent_complete_report = 'message print to user'
-            elif tool_call_description['function'] == 'call_agent':
-                agent_name, agent_instruction = tool_call_description['args']
-                if agent_name not in Agent.PROMPTS:
+                if tool_call_description['function'] == 'exit':
+                    is_exit = True
+                elif tool_call_description['function'] == 'message':
                     yield {
-                        'message': f"Agent call error (name), name=`{agent_name}`",
-                        'type': "error",
+                        'message': tool_call_description['args'][0],
+                        'type': "markdown",
                     }
-                    break
 
-                if not agent_instruction:
+                    tool_results[i] = 'message print to user'
+                elif tool_call_description['function'] == 'call_agent':
+                    agent_name, agent_instruction = tool_call_description['args']
+                    if agent_name not in Agent.PROMPTS:
+                        yield {
+                            'message': f"Agent call error (name), name=`{agent_name}`",
+                            'type': "error",
+                        }
+                        is_error = True
+                        break
+
+                    if not agent_instruction:
+                        yield {
+                            'message': f"Agent call error (empty instruction)",
+                            'type': "error",
+                        }
+                        is_error = True
+                        break
+
+                    agent_calls.append((i, agent_name, agent_instruction))
+                else:
                     yield {
-                        'message': f"Agent call error (empty instruction)",
+                        'message': "Agent call error (wrong tool)",
                         'type': "error",
                     }
+                    is_error = True
                     break
 
-                agent = Agent.fabric(agent_name)
-                agent.init(agent_instruction, self.manifest, self.LOG_FILE)
+            if is_error or (is_exit and not agent_calls):
+                break
+
+            for agent_group in self._group_agent_calls(agent_calls):
+                yield from self._run_agent_group(agent_group, tool_results)
 
-                is_agent_completes_work = False
-                for agent_step in agent.run():
-                    if agent_step['type'] == 'report':
-                        is_agent_completes_work = True
-                        agent_complete_report = agent_step['message']
-                        agent_step['type'] = 'markdown'
-                    elif agent_step['type'] == 'error':
-                        agent_complete_report = 'Agent cant complete a work, try another approach: add more details, rewrite instruction for agent!' # TODO ???
-                        is_agent_completes_work = True
+            conversation_log.append({
+                'role': 'assistant',
+                'content': output['_output'],
+                'tool_calls': output['_tool_calls']
+            })
 
-                    yield agent_step
+            for i, tool_call in enumerate(output['_tool_calls']):
+                if tool_call.function.name == 'exit':
+                    # exit with agent calls in one turn: the supervisor must read reports first
+                    tool_results[i] = 'exit ignored: read reports of agents and call exit again'
 
-                    if is_agent_completes_work:
-                        break
-            else:
+                conversation_log.append({
+                    'role': 'tool',
+                    'tool_call_id': tool_call.id,
+                    'name': tool_call.function.name,
+                    'content': tool_results.get(i, '')
+                })
+
+            if not is_budget_warned and self.budget.is_low():
+                is_budget_warned = True
+                budget_warning = self.BUDGET_WARNING.format(spent=self.budget.describe())
+                conversation_log.append({
+                    'role': 'user',
+                    'content': budget_warning,
+                })
                 yield {
-                    'message': "Agent call error (wrong tool)",
-                    'type': "error",
+                    'message': budget_warning,
+                    'type': "info",
                 }
+
+            self.agent_step += 1
+            self.journal.checkpoint(TaskJournal.SUPERVISOR_SCOPE, self.agent_step, conversation_log)
+
+        self.journal.finish()
+
+    def _describe_tool_call(self, tool_call) -> dict:
+        tool_call_description = {
+            'function': tool_call.function.name,
+            'id': tool_call.id,
+        }
+
+        arguments = json.loads(tool_call.function.arguments) if tool_call.function.arguments else []
+
+        if tool_call.function.name == 'call_agent':
+            instruction = arguments.get('instruction', None)
+            agent_name = arguments.get('agent_name', None)
+            tool_call_description['args'] = [agent_name, instruction]
+        elif tool_call.function.name == 'message':
+            tool_call_description['args'] = [arguments.get('text', None)]
+
+        return tool_call_description
+
+    @staticmethod
+    def _partial_report(conversation_log: Conversation) -> str:
+        # reports of agents received so far: the supervisor has no budget to summarize them
+        agent_names = {}
+        reports = []
+        for record in conversation_log.records():
+            for call in record.tool_calls or ():
+                if call.name == 'call_agent':
+                    try:
+                        arguments = json.loads(call.arguments or '{}')
+                    except json.decoder.JSONDecodeError:
+                        # broken arguments are repaired by LLM call: there is no budget for it
+                        arguments = {}
+                    agent_names[call.id] = arguments.get('agent_name') if type(arguments) is dict and arguments.get('agent_name') else 'AGENT'
+
+            if record.role == 'tool' and record.tool_call_id in agent_names and record.content:
+                reports.append(f"### {agent_names[record.tool_call_id]}\n{record.content}")
+
+        if not reports:
+            return "The task is stopped before any agent reported."
+
+        return "The task is stopped, reports of agents so far (partial result):\n\n" + "\n\n".join(reports)
+
+    @staticmethod
+    def _group_agent_calls(agent_calls: list[tuple]) -> list[list[tuple]]:
+        # subsequent read-only agents are run in parallel, agents which change files - one by one in order of calls
+        groups = []
+        for agent_call in agent_calls:
+            agent_name = agent_call[1]
+            if agent_name in Agent.READ_ONLY_ROLES and groups and groups[-1][0][1] in Agent.READ_ONLY_ROLES:
+                groups[-1].append(agent_call)
+            else:
+                groups.append([agent_call])
+
+        return groups
+
+    def _agent_events(self, agent_call: tuple, cancel_token: CancellationToken|None, tool_results: dict, tag: str|None = None):
+        i, agent_name, agent_instruction = agent_call
+        agent_scope = f"{agent_name}:{self.agent_step}.{i}"
+        agent_resume_state = self._pop_resume_scope(agent_scope)
+        if agent_resume_state and agent_resume_state['report'] is not None:
+            # sub-agent completed its work before restart
+            tool_results[i] = agent_resume_state['report']
+            return
+
+        if not agent_resume_state:
+            self.journal.start_scope(agent_scope, agent_name, agent_instruction)
+
+        agent = Agent.fabric(agent_name)
+        agent.init(agent_instruction, self.manifest, self.log_file, cancel_token, self.file_cache, self.content_pool, self.change_tracker)
+        agent.set_journal(self.journal, agent_scope, agent_resume_state)
+
+        for agent_step in agent.run(self.budget):
+            is_agent_completes_work = False
+            if agent_step['type'] == 'report':
+                is_agent_completes_work = True
+                tool_results[i] = agent_step['message']
+                agent_step['type'] = 'markdown'
+            elif agent_step['type'] == 'error':
+                tool_results[i] = 'Agent cant complete a work, try another approach: add more details, rewrite instruction for agent!' # TODO ???
+                is_agent_completes_work = True
+
+            if is_agent_completes_work:
+                self.journal.end_scope(agent_scope, tool_results[i])
+
+            if tag and agent_step['type'] != 'nope':
+                agent_step['agent'] = tag
+                if type(agent_step.get('message')) is str:
+                    agent_step['message'] = f"[{tag}] {agent_step['message']}"
+
+            yield agent_step
+
+            if is_agent_completes_work:
                 break
 
-            if current_tool_call:
-                conversation_log.append({
-                    'role': 'assistant',
-                    'content': output['_output'],
-                    'tool_calls': [current_tool_call]
-                })
+    def _run_agent_group(self, agent_group: list[tuple], tool_results: dict):
+        if len(agent_group) == 1:
+            yield from self._agent_events(agent_group[0], self.cancel_token, tool_results)
+            return
 
-                if agent_complete_report:
-                    conversation_log.append({
-                        'role': 'tool',
-                        'tool_call_id': current_tool_call.id,
-                        'name': current_tool_call.function.name,
-                        'content': agent_complete_report
-                    })
+        # cancelled on stop command or when consumer closes this generator
+        group_cancel_token = CancellationToken()
+        if self.cancel_token:
+            self.cancel_token.on_cancel(group_cancel_token.cancel)
 
-            agent_step_counter += 1
+        events = queue.Queue()
+        agent_events = [
+            self._agent_events(agent_call, group_cancel_token, tool_results, f"{agent_call[1]} #{n + 1}")
+            for n, agent_call in enumerate(agent_group)
+        ]
 
-    def log(self, data, to_file=False):
-        if type(data) is list or type(data) is dict:
-            data = json.dumps(data, ensure_ascii=False, indent=4)
+        def _worker(n: int):
+            try:
+                for event in agent_events[n]:
+                    events.put((n, event))
+                events.put((n, None))
+            except BaseException as e:
+                events.put((n, e))
+
+        executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_AGENTS, thread_name_prefix='agent')
+        try:
+            for n in range(len(agent_events)):
+                executor.submit(contextvars.copy_context().run, _worker, n)
+
+            active_agents = len(agent_events)
+            while active_agents:
+                n, event = events.get()
+                if event is None:
+                    active_agents -= 1
+                elif isinstance(event, BaseException):
+                    raise event
+                else:
+                    yield event
+        finally:
+            group_cancel_token.cancel()
+            if self.cancel_token:
+                self.cancel_token.remove_callback(group_cancel_token.cancel)
+            executor.shutdown(wait=False)
 
+    def log(self, data, to_file=False):
         if not to_file:
+            if type(data) is list or type(data) is dict:
+                data = json.dumps(data, ensure_ascii=False, indent=4)
+
             logger.info(data)
             return
 
-        with open(self.LOG_FILE, "a", encoding='utf8') as f:
-            f.write(data + "\n\n")
+        LOG_WRITER.write(self.log_file, log_record('SUPERVISOR', data))
 
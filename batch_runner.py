@@ -0,0 +1,224 @@
+"""
+Headless batch runner: executes Copilot tasks of a JSONL file without the HTTP server.
+
+Job line: {"project_base_path": "/path/to/project", "instruction": "...", "id": "optional-job-id"}
+Job id is a file name: letters, digits, `.`, `_`, `-`, unique in the file.
+
+Usage:
+    python batch_runner.py jobs.jsonl --workers 4 --output ./batch_output --timeout 3600
+
+Jobs run on a bounded worker pool, tasks of one project never run at the same time.
+Events of every job are written to <output>/<job id>.jsonl, the summary - to <output>/summary.json.
+Job statuses: completed, completed_with_errors (the task emitted `error` events), failed, cancelled, skipped;
+throughput counts completed jobs only.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import logging
+logger = logging.getLogger('APP')
+
+from algorythm import Copilot
+from cancellation import CancellationToken, TaskCancelledError
+from metrics import TASK_DURATION, TASKS
+from log_writer import LOG_WRITER
+
+# job id is the name of its events file
+JOB_ID_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9._-]*')
+
+
+def load_jobs(file_path: str) -> list[dict]:
+    jobs = []
+    ids = set()
+    with open(file_path, 'r', encoding='utf8') as f:
+        for i, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+
+            job = json.loads(line)
+            assert job.get('project_base_path') and job.get('instruction'), f'line {i + 1}: `project_base_path` and `instruction` are required'
+
+            job['id'] = str(job.get('id') or f'{i + 1:05d}')
+            assert JOB_ID_PATTERN.fullmatch(job['id']), f'line {i + 1}: `id` can contain only letters, digits, `.`, `_`, `-` and starts with a letter or digit'
+            assert job['id'] not in ids, f"line {i + 1}: duplicated `id` {job['id']}"
+            ids.add(job['id'])
+
+            job['project_base_path'] = os.path.abspath(job['project_base_path'])
+            jobs.append(job)
+
+    return jobs
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    # nearest-rank percentile of sorted values
+    index = max(0, min(len(values) - 1, math.ceil(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(results: list[dict], wall_seconds: float) -> dict:
+    statuses = {}
+    for result in results:
+        statuses[result['status']] = statuses.get(result['status'], 0) + 1
+
+    latencies = sorted(result['seconds'] for result in results if result['status'] != 'skipped')
+    summary = {
+        'jobs': len(results),
+        'statuses': statuses,
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_per_hour': round(statuses.get('completed', 0) / wall_seconds * 3600, 2) if wall_seconds else 0.0,
+    }
+    if latencies:
+        summary['latency_seconds'] = {
+            'mean': round(statistics.mean(latencies), 3),
+            'p50': round(_percentile(latencies, 50), 3),
+            'p90': round(_percentile(latencies, 90), 3),
+            'p99': round(_percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3),
+        }
+
+    return summary
+
+
+class BatchRunner:
+    def __init__(self, jobs: list[dict], output_path: str, workers: int = 4, timeout: float|None = None):
+        self.jobs = jobs
+        self.output_path = output_path
+        self.workers = max(workers, 1)
+        self.timeout = timeout
+
+        self.cancel_tokens = {}
+        self._lock = threading.Lock()
+
+    def _run_job(self, job: dict, cancel_token: CancellationToken) -> dict:
+        result = {'id': job['id'], 'project_base_path': job['project_base_path'], 'status': 'failed', 'task_id': None, 'events': 0, 'errors': 0}
+        events_path = os.path.join(self.output_path, job['id'] + '.jsonl')
+
+        timer = None
+        if self.timeout:
+            timer = threading.Timer(self.timeout, cancel_token.cancel)
+            timer.daemon = True
+            timer.start()
+
+        start_time = time.perf_counter()
+        copilot = None
+        f = None
+        try:
+            f = open(events_path, 'w', encoding='utf8')
+            copilot = Copilot(job['instruction'], {'project_base_path': job['project_base_path']}, cancel_token)
+            for event in copilot.run():
+                if event['type'] == 'nope':
+                    continue
+
+                result['events'] += 1
+                if event['type'] == 'error':
+                    result['errors'] += 1
+
+                f.write(json.dumps({'timestamp': time.time(), **event}, ensure_ascii=False, default=str) + "\n")
+                f.flush()
+
+            result['status'] = 'completed_with_errors' if result['errors'] else 'completed'
+        except TaskCancelledError:
+            result['status'] = 'cancelled'
+        except Exception as e:
+            logger.exception(f"Job {job['id']} failed")
+            result['error'] = str(e)
+            if f and not f.closed:
+                try:
+                    f.write(json.dumps({'timestamp': time.time(), 'type': 'error', 'message': str(e)}, ensure_ascii=False) + "\n")
+                except OSError:
+                    logger.exception(f"Job {job['id']}: error event is not written")
+        finally:
+            if f:
+                f.close()
+            if timer:
+                timer.cancel()
+
+            result['task_id'] = copilot.task_id if copilot else None
+            result['seconds'] = time.perf_counter() - start_time
+            TASK_DURATION.observe(result['seconds'])
+            TASKS.inc(status=result['status'])
+
+        return result
+
+    def cancel(self):
+        with self._lock:
+            for cancel_token in self.cancel_tokens.values():
+                cancel_token.cancel()
+
+    def run(self) -> list[dict]:
+        os.makedirs(self.output_path, exist_ok=True)
+
+        results = []
+        pending = list(self.jobs)
+        busy_projects = set()
+        futures = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='batch') as executor:
+            try:
+                while pending or futures:
+                    # next jobs in order of the file, a project runs one task at a time
+                    for job in list(pending):
+                        if len(futures) >= self.workers:
+                            break
+                        if job['project_base_path'] in busy_projects:
+                            continue
+
+                        pending.remove(job)
+                        busy_projects.add(job['project_base_path'])
+                        cancel_token = CancellationToken()
+                        with self._lock:
+                            self.cancel_tokens[job['id']] = cancel_token
+                        futures[executor.submit(self._run_job, job, cancel_token)] = job
+
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = futures.pop(future)
+                        busy_projects.discard(job['project_base_path'])
+                        with self._lock:
+                            self.cancel_tokens.pop(job['id'], None)
+
+                        result = future.result()
+                        results.append(result)
+                        logger.info(f"[{len(results)}/{len(self.jobs)}] job {job['id']}: {result['status']} in {result['seconds']:.1f}s")
+            except KeyboardInterrupt:
+                logger.warning("Interrupted: cancel running jobs")
+                self.cancel()
+                for future, job in futures.items():
+                    results.append(future.result())
+                for job in pending:
+                    results.append({'id': job['id'], 'project_base_path': job['project_base_path'], 'status': 'skipped'})
+
+        LOG_WRITER.flush()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run Copilot tasks of a JSONL file')
+    parser.add_argument('jobs', help='JSONL file of jobs: {"project_base_path": ..., "instruction": ..., "id": ...}')
+    parser.add_argument('--workers', type=int, default=4, help='tasks running at the same time')
+    parser.add_argument('--output', default='./batch_output', help='directory of events and summary')
+    parser.add_argument('--timeout', type=float, default=None, help='cancel a task after seconds')
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.jobs)
+    runner = BatchRunner(jobs, args.output, args.workers, args.timeout)
+
+    start_time = time.perf_counter()
+    results = runner.run()
+    summary = summarize(results, time.perf_counter() - start_time)
+
+    with open(os.path.join(args.output, 'summary.json'), 'w', encoding='utf8') as f:
+        json.dump({'summary': summary, 'jobs': results}, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""
+End-to-end benchmark of the agent loop: Copilot.run over synthetic projects of increasing size,
+LLM is a scripted local OpenAI-compatible stub, file tools work in `pure` mode.
+
+Usage (from the repository root):
+    python -m benchmarks.e2e --sizes 1000,10000,100000
+    python -m benchmarks.e2e --sizes 1000 --compare benchmarks/results/e2e-<commit>.json
+
+Every size is measured in a separate process, so the memory high-water mark belongs to one project.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_project import generate_project, write_large_file, small_file_path, large_file_path
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+PROJECTS_PATH = os.path.join(tempfile.gettempdir(), 'code-agent-bench')
+
+LARGE_FILES = 5
+LARGE_FILE_LINES = 20000
+NEW_FILE = 'bench_new.py'
+
+# compared with the previous results: relative growth above threshold is a regression
+COMPARED_METRICS = ['wall_seconds', 'overhead_per_step_ms', 'max_rss_mb']
+
+
+def scenario(files_count: int) -> dict:
+    from benchmarks.llm_stub import tool_call
+
+    return {
+        'SUPERVISOR': [
+            tool_call('call_agent', agent_name='ANALYTIC', instruction=f'Study `{large_file_path(0)}` and its usages'),
+            tool_call('call_agent', agent_name='CODER', instruction=f'Change VALUE in `{large_file_path(0)}`'),
+            tool_call('message', text='Done'),
+            tool_call('exit'),
+        ],
+        'ANALYTIC': [
+            tool_call('list_in_directory', path='.'),
+            tool_call('list_in_directory', path=os.path.dirname(small_file_path(files_count - 1))),
+            tool_call('read_file', path=large_file_path(0)),
+            tool_call('read_file', path=small_file_path(files_count - 1)),
+            tool_call('read_file', path=large_file_path(1)),
+            tool_call('read_file', path=large_file_path(0)),
+            tool_call('report', text='VALUE is defined on the second line'),
+        ],
+        'CODER': [
+            tool_call('read_file', path=large_file_path(0)),
+            tool_call('replace_code_in_file', path=large_file_path(0), str_find='VALUE = 0', str_replace='VALUE = 1'),
+            tool_call('write_file', path=NEW_FILE, content='from large.large_0 import VALUE\n'),
+            tool_call('report', text='VALUE is changed'),
+        ],
+    }
+
+
+def _read_proc_io() -> dict:
+    # linux only: characters and syscalls of read/write of the process
+    try:
+        with open('/proc/self/io', 'r') as f:
+            return {name: int(value) for name, value in (line.split(': ') for line in f.read().splitlines())}
+    except OSError:
+        return {}
+
+
+def _histogram_sum(histogram) -> float:
+    return sum(state[-1] for state in histogram.collect().values())
+
+
+def _restore_project(project_path: str):
+    write_large_file(project_path, 0, LARGE_FILE_LINES)
+    if os.path.exists(os.path.join(project_path, NEW_FILE)):
+        os.remove(os.path.join(project_path, NEW_FILE))
+
+
+def run_child(files_count: int, project_path: str, repeat: int, llm_latency: float) -> dict:
+    from benchmarks.llm_stub import ScriptedLLMServer
+
+    server = ScriptedLLMServer(llm_latency)
+    server.start()
+
+    work_path = tempfile.mkdtemp(prefix='code-agent-bench-')
+    os.environ.update({
+        'OPENAI_API_URL': server.url,
+        'OPENAI_API_KEY': 'benchmark',
+        'OPENAI_API_TIMEOUT': '60',
+        'MODEL': 'benchmark',
+        'MODEL_CHEAP': '',
+        'REASONING_EFFORT': '',
+        'AGENT_FILE_TOOLS': 'pure',
+        'MAX_ITERATION': '20',
+        'DEEPTHINKING_AGENTS': '',
+        'TRACE_FILE': '',
+        'DEBUG': '0',
+    })
+    os.chdir(REPO_ROOT)
+
+    import_start = time.perf_counter()
+    import algorythm
+    import agents
+    import journal
+    from metrics import LLM_QUERY_DURATION, TOOL_EXECUTE_DURATION
+    from log_writer import LOG_WRITER
+    import_seconds = time.perf_counter() - import_start
+
+    journal.JOURNAL_PATH = os.path.join(work_path, 'journal')
+    algorythm.Copilot.LOG_PATH = os.path.join(work_path, 'conversations_log')
+    agents.BaseAgent.STORAGE_PATH = os.path.join(work_path, 'storage')
+
+    runs = []
+    # the first run warms up imports of tools and prompts: not counted
+    for i in range(repeat + 1):
+        server.set_script(scenario(files_count))
+        llm_before = _histogram_sum(LLM_QUERY_DURATION)
+        tool_before = _histogram_sum(TOOL_EXECUTE_DURATION)
+        io_before = _read_proc_io()
+
+        start_time = time.perf_counter()
+        events = 0
+        copilot = algorythm.Copilot('Change VALUE of the large module', {'project_base_path': project_path})
+        for event in copilot.run():
+            if event['type'] == 'error':
+                raise RuntimeError(f"Benchmark scenario failed: {event['message']}")
+            events += 1
+        wall_seconds = time.perf_counter() - start_time
+        LOG_WRITER.flush()
+
+        io_after = _read_proc_io()
+        llm_seconds = _histogram_sum(LLM_QUERY_DURATION) - llm_before
+        steps = server.requests
+        _restore_project(project_path)
+
+        if i == 0:
+            continue
+
+        runs.append({
+            'wall_seconds': wall_seconds,
+            'llm_seconds': llm_seconds,
+            'tool_seconds': _histogram_sum(TOOL_EXECUTE_DURATION) - tool_before,
+            'overhead_per_step_ms': (wall_seconds - llm_seconds) / steps * 1000,
+            'steps': steps,
+            'events': events,
+            'llm_request_bytes': server.request_bytes,
+            'llm_response_bytes': server.response_bytes,
+            'io': {name: io_after[name] - io_before[name] for name in io_after},
+        })
+
+    server.stop()
+
+    result = {'files_count': files_count, 'import_seconds': import_seconds, 'runs': runs}
+    for name in ['wall_seconds', 'llm_seconds', 'tool_seconds', 'overhead_per_step_ms']:
+        result[name] = statistics.median(run[name] for run in runs)
+    result['steps'] = runs[-1]['steps']
+    result['llm_request_bytes'] = runs[-1]['llm_request_bytes']
+    result['io'] = runs[-1]['io']
+    # ru_maxrss: kilobytes on linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result['max_rss_mb'] = max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    baseline_sizes = {item['files_count']: item for item in baseline['sizes']}
+    for item in results['sizes']:
+        base_item = baseline_sizes.get(item['files_count'])
+        if not base_item:
+            continue
+
+        for name in COMPARED_METRICS:
+            if not base_item.get(name):
+                continue
+
+            change = item[name] / base_item[name] - 1
+            print(f"{item['files_count']:>8} {name:<22} {base_item[name]:>12.3f} -> {item[name]:>12.3f} ({change:+.1%})")
+            if change > threshold:
+                regressions.append(f"{item['files_count']} files: {name} {change:+.1%}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end agent loop benchmark')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='files in synthetic projects, comma separated')
+    parser.add_argument('--repeat', type=int, default=3, help='measured runs per size')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='simulated latency of LLM answer, seconds')
+    parser.add_argument('--projects-path', default=PROJECTS_PATH, help='where synthetic projects are generated')
+    parser.add_argument('--output', default=None, help='JSON file of results, default: benchmarks/results/e2e-<commit>.json')
+    parser.add_argument('--compare', default=None, help='JSON file of previous results')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative growth of compared metrics')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--project', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_child(int(args.sizes), args.project, args.repeat, args.llm_latency)
+        print(json.dumps(result))
+        return
+
+    results = {
+        'commit': _git_commit(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'llm_latency': args.llm_latency,
+        'sizes': [],
+    }
+
+    for files_count in [int(size) for size in args.sizes.split(',')]:
+        project_path = os.path.join(args.projects_path, f'project_{files_count}')
+        generate_start = time.perf_counter()
+        generate_project(project_path, files_count, LARGE_FILES, LARGE_FILE_LINES)
+        print(f"project of {files_count} files: {time.perf_counter() - generate_start:.1f}s", file=sys.stderr)
+
+        child = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.e2e', '--child', '--sizes', str(files_count), '--project', project_path,
+             '--repeat', str(args.repeat), '--llm-latency', str(args.llm_latency)],
+            cwd=REPO_ROOT, capture_output=True, text=True,
+        )
+        if child.returncode != 0:
+            print(child.stderr, file=sys.stderr)
+            sys.exit(child.returncode)
+
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        results['sizes'].append(result)
+        print(
+            f"{files_count:>8} files: wall {result['wall_seconds']:.3f}s, LLM {result['llm_seconds']:.3f}s, "
+            f"overhead {result['overhead_per_step_ms']:.2f}ms/step ({result['steps']} steps), "
+            f"max RSS {result['max_rss_mb']:.1f}MB, read {result['io'].get('rchar', 0)} bytes, "
+            f"written {result['io'].get('wchar', 0)} bytes"
+        )
+
+    output = args.output or os.path.join(RESULTS_PATH, f"e2e-{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf8') as f:
+        json.dump(results, f, indent=2)
+    print(f"results: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+        if regressions:
+            print("REGRESSIONS:\n" + "\n".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def tool_call(name: str, **args) -> dict:
+    return {'name': name, 'arguments': args}
+
+
+class ScriptedLLMServer:
+    """
+    Local OpenAI-compatible chat completions endpoint answering with scripted tool calls.
+    Role of the caller is recognized by the tools of request: SUPERVISOR (call_agent), CODER (write_file), ANALYTIC.
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.script = {}
+        self.requests = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def set_script(self, script: dict):
+        with self._lock:
+            self.script = {role: list(calls) for role, calls in script.items()}
+            self.requests = 0
+            self.request_bytes = 0
+            self.response_bytes = 0
+
+    @staticmethod
+    def _role(request: dict) -> str:
+        names = [tool['function']['name'] for tool in request.get('tools') or []]
+        if 'call_agent' in names:
+            return 'SUPERVISOR'
+        if 'write_file' in names:
+            return 'CODER'
+        return 'ANALYTIC'
+
+    def _answer(self, body: bytes) -> bytes:
+        request = json.loads(body)
+        role = self._role(request)
+        with self._lock:
+            self.requests += 1
+            self.request_bytes += len(body)
+            calls = self.script[role].pop(0) if self.script.get(role) else [tool_call('report', text='script is over')]
+            request_id = self.requests
+
+        if type(calls) is dict:
+            calls = [calls]
+
+        message = {
+            'role': 'assistant',
+            'content': '',
+            'tool_calls': [
+                {
+                    'id': f'call_{request_id}_{i}',
+                    'type': 'function',
+                    'function': {'name': call['name'], 'arguments': json.dumps(call['arguments'])},
+                }
+                for i, call in enumerate(calls)
+            ],
+        }
+        response = json.dumps({
+            'id': f'chatcmpl-{request_id}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', ''),
+            'choices': [{'index': 0, 'message': message, 'finish_reason': 'tool_calls'}],
+            'usage': {'prompt_tokens': len(body) // 4, 'completion_tokens': 20, 'total_tokens': len(body) // 4 + 20},
+        }).encode()
+
+        with self._lock:
+            self.response_bytes += len(response)
+
+        return response
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if server.latency:
+                    time.sleep(server.latency)
+
+                response = server._answer(body)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,272 @@
+"""
+Microbenchmarks of the pure-python functions which run on every agent step, parameterized by input size.
+
+Usage (from the repository root):
+    python -m benchmarks.micro --save benchmarks/results/micro-base.json
+    python -m benchmarks.micro --baseline benchmarks/results/micro-base.json
+    python -m benchmarks.micro --filter apply_patch
+
+With --baseline the run fails when ops/sec of any case drops more than the threshold
+of benchmarks/micro_thresholds.json (per benchmark or `default`).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THRESHOLDS_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'micro_thresholds.json')
+
+os.environ['AGENT_FILE_TOOLS'] = 'pure'
+os.environ.setdefault('OPENAI_API_TIMEOUT', '60')
+os.environ.setdefault('MAX_ITERATION', '20')
+os.environ.setdefault('TRACE_FILE', '')
+sys.path.insert(0, REPO_ROOT)
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, sizes: list):
+    """
+    Registers a benchmark: decorated function gets (size, tmp_path) and returns a callable without arguments
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, sizes)
+        return setup
+
+    return decorator
+
+
+def _python_source(lines: int) -> str:
+    result = ['VALUE = 0\n']
+    for i in range(lines // 3):
+        result.append(f'def function_{i}(value):\n    return value + {i}\n\n')
+
+    return ''.join(result)
+
+
+def _make_directory(path: str, entries: int):
+    os.makedirs(path, exist_ok=True)
+    for i in range(entries):
+        if i % 10 == 0:
+            os.makedirs(os.path.join(path, f'dir_{i:06d}'), exist_ok=True)
+        else:
+            open(os.path.join(path, f'file_{i:06d}.py'), 'w').close()
+
+
+@benchmark('apply_patch.exact', [1000, 10000, 100000])
+def bench_apply_patch_exact(size: int, tmp_path: str):
+    from diff_helper import apply_patch
+
+    source = _python_source(size)
+    i = size // 6
+    str_find = f'def function_{i}(value):\n    return value + {i}\n'
+    str_replace = f'def function_{i}(value):\n    return value - {i}\n'
+    return lambda: apply_patch(source, str_find, str_replace)
+
+
+@benchmark('apply_patch.whitespace', [1000, 10000, 100000])
+def bench_apply_patch_whitespace(size: int, tmp_path: str):
+    from diff_helper import apply_patch
+
+    source = _python_source(size)
+    i = size // 6
+    # indentation differs: exact match fails, whitespace-insensitive search is used
+    str_find = f'def function_{i}(value):\n        return value + {i}'
+    str_replace = f'def function_{i}(value):\n    return value - {i}'
+    return lambda: apply_patch(source, str_find, str_replace)
+
+
+@benchmark('parse_tags', [10, 100, 1000])
+def bench_parse_tags(size: int, tmp_path: str):
+    from llm_parser import parse_tags
+
+    # size: KB of LLM output
+    chunk = '<work_plan>- [x] read file\n- [ ] edit file</work_plan>\nSome text of the answer. ' * 4
+    content = (chunk * (size * 1024 // len(chunk) + 1))[:size * 1024] + '<RESULT>{"a": 1}</RESULT>'
+    return lambda: parse_tags(content, ['work_plan', 'RESULT', 'missing'])
+
+
+@benchmark('Copilot._read_project_structure', [100, 1000, 10000])
+def bench_read_project_structure(size: int, tmp_path: str):
+    from algorythm import Copilot
+
+    _make_directory(tmp_path, size)
+    copilot = Copilot('benchmark', {'project_base_path': tmp_path})
+    return lambda: copilot._read_project_structure(tmp_path)
+
+
+@benchmark('CommandInterpreter._command_list', [100, 1000, 10000])
+def bench_command_list(size: int, tmp_path: str):
+    from command_interpreter import CommandInterpreter
+
+    _make_directory(os.path.join(tmp_path, 'src'), size)
+    interpreter = CommandInterpreter('', tmp_path)
+    return lambda: interpreter._command_list('src')
+
+
+@benchmark('mcp_helper._read_file_pure', [10, 1000, 10000])
+def bench_read_file_pure(size: int, tmp_path: str):
+    from mcp_helper import _read_file_pure
+
+    # size: KB of file
+    with open(os.path.join(tmp_path, 'file.py'), 'w', encoding='utf-8') as f:
+        f.write(_python_source(size * 1024 // 40))
+    return lambda: _read_file_pure(tmp_path, 'file.py')
+
+
+@benchmark('mcp_helper._write_file_pure', [10, 1000, 10000])
+def bench_write_file_pure(size: int, tmp_path: str):
+    from mcp_helper import _write_file_pure
+
+    text = _python_source(size * 1024 // 40)
+    return lambda: _write_file_pure(tmp_path, 'src/file.py', text)
+
+
+@benchmark('agent.conversation_step', [100, 1000, 10000])
+def bench_conversation_step(size: int, tmp_path: str):
+    # bookkeeping of one agent step on a conversation of `size` tool calls:
+    # provider messages of the conversation view, loop detection and memo lookup of the next tool call
+    from agents import BaseAgent
+    from conversation_store import Conversation
+    from tool_memo import ToolMemo, LoopDetector
+
+    with open(os.path.join(tmp_path, 'a.py'), 'w', encoding='utf-8') as f:
+        f.write(_python_source(100))
+
+    agent = BaseAgent('CODER', '', '', False)
+    tool_memo = ToolMemo(tmp_path)
+    tool_memo.store('read_file', ['a.py'], 1, {'result': 'content', 'tool_name': 'read', 'file_path': 'a.py'})
+    loop_detector = LoopDetector()
+
+    conversation = Conversation.from_messages([{'role': 'system', 'content': 'system'}, {'role': 'user', 'content': 'instruction'}])
+    for i in range(size):
+        tool_call = SimpleNamespace(id=f'call_{i}', function=SimpleNamespace(name='read_file', arguments=json.dumps({'path': f'file_{i}.py'})))
+        conversation.append({'role': 'assistant', 'content': '', 'tool_calls': [tool_call]})
+        conversation.append({'role': 'tool', 'tool_call_id': tool_call.id, 'name': 'read_file', 'content': 'x' * 1000})
+        loop_detector.add(LoopDetector.signature('read_file', [f'file_{i}.py']))
+
+    def step():
+        messages = agent.conversation_filter(conversation.view()).to_provider()
+        loop_detector.add(LoopDetector.signature('read_file', ['a.py']))
+        loop_detector.history.pop()
+        return messages, tool_memo.lookup('read_file', ['a.py'])
+
+    return step
+
+
+def measure(fn, min_time: float, repeat: int) -> dict:
+    # calibrate loops count to run at least min_time, the best of `repeat` is taken
+    loops = 1
+    while True:
+        start_time = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start_time = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - start_time) / loops)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    fn()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ops_per_sec': 1 / best if best else float('inf'),
+        'seconds_per_op': best,
+        'loops': loops,
+        'alloc_peak_kb': (peak - before) / 1024,
+        'alloc_retained_kb': (after - before) / 1024,
+    }
+
+
+def run(name_filter: str, min_time: float, repeat: int) -> dict:
+    results = {}
+    for name, (setup, sizes) in BENCHMARKS.items():
+        if name_filter and name_filter not in name:
+            continue
+
+        for size in sizes:
+            tmp_path = tempfile.mkdtemp(prefix='code-agent-micro-')
+            try:
+                result = measure(setup(size, tmp_path), min_time, repeat)
+            finally:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
+            key = f'{name}[{size}]'
+            results[key] = result
+            print(f"{key:<45} {result['ops_per_sec']:>14.1f} ops/s {result['seconds_per_op'] * 1e6:>14.1f} us/op "
+                  f"{result['alloc_peak_kb']:>10.1f} KB peak")
+
+    return results
+
+
+def check_regressions(results: dict, baseline: dict, thresholds: dict) -> list[str]:
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+
+        name = key.split('[')[0]
+        threshold = thresholds.get(name, thresholds.get('default', 0.25))
+        change = result['ops_per_sec'] / baseline[key]['ops_per_sec'] - 1
+        if change < -threshold:
+            regressions.append(f"{key}: {baseline[key]['ops_per_sec']:.1f} -> {result['ops_per_sec']:.1f} ops/s ({change:+.1%}, allowed -{threshold:.0%})")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks of hot functions')
+    parser.add_argument('--filter', default='', help='run benchmarks which name contains the substring')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimal time of one measurement, seconds')
+    parser.add_argument('--repeat', type=int, default=5, help='measurements per case, the best is taken')
+    parser.add_argument('--save', default=None, help='save results to JSON file')
+    parser.add_argument('--baseline', default=None, help='JSON file of previous results to check regressions')
+    parser.add_argument('--thresholds', default=THRESHOLDS_PATH, help='JSON file of allowed relative slowdown per benchmark')
+    args = parser.parse_args()
+
+    os.chdir(REPO_ROOT)
+    results = run(args.filter, args.min_time, args.repeat)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf8') as f:
+            json.dump({
+                'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'results': results,
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf8') as f:
+            baseline = json.load(f)['results']
+        with open(args.thresholds, 'r', encoding='utf8') as f:
+            thresholds = json.load(f)
+
+        regressions = check_regressions(results, baseline, thresholds)
+        if regressions:
+            print("REGRESSIONS:\n" + "\n".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
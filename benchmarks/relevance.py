@@ -0,0 +1,95 @@
+"""
+Quality and speed of the relevance index.
+
+Fixture tasks (benchmarks/relevance_tasks.jsonl: instruction and files which the task changes) are ranked
+against this repository: recall@K is the share of tasks with an expected file in the top K of the step prompt,
+MRR is the mean reciprocal rank of the first expected file. Each task with recall@K hit saves agents the steps
+of searching the file by listing and reading.
+
+Usage (from the repository root):
+    python -m benchmarks.relevance
+    python -m benchmarks.relevance --sizes 1000,10000 --top-k 8
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASKS_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'relevance_tasks.jsonl')
+
+os.environ.setdefault('OPENAI_API_TIMEOUT', '60')
+os.environ.setdefault('MAX_ITERATION', '20')
+sys.path.insert(0, REPO_ROOT)
+
+from relevance_index import RelevanceIndex
+from benchmarks.synthetic_project import generate_project
+
+
+def load_tasks(path: str) -> list[dict]:
+    with open(path, 'r', encoding='utf8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(index: RelevanceIndex, tasks: list[dict], top_k: int) -> dict:
+    hits = 0
+    reciprocal_ranks = []
+    for task in tasks:
+        ranked = [path for path, _, _ in index.search(task['instruction'], max(top_k, 50))]
+        ranks = [ranked.index(path) + 1 for path in task['files'] if path in ranked]
+        first_rank = min(ranks) if ranks else None
+
+        hits += 1 if first_rank and first_rank <= top_k else 0
+        reciprocal_ranks.append(1 / first_rank if first_rank else 0)
+        print(f"  {'+' if first_rank and first_rank <= top_k else '-'} rank {first_rank or '-':>3}  {task['instruction'][:80]}")
+
+    return {
+        'tasks': len(tasks),
+        f'recall@{top_k}': hits / len(tasks),
+        'mrr': sum(reciprocal_ranks) / len(tasks),
+    }
+
+
+def measure_speed(files_count: int, top_k: int) -> dict:
+    work_path = os.path.join(tempfile.gettempdir(), f'relevance_bench_{files_count}')
+    generate_project(work_path, files_count, large_files=1, large_file_lines=2000)
+
+    index = RelevanceIndex(work_path, max_files=files_count + 10)
+    start_time = time.perf_counter()
+    index.refresh()
+    build = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    index.refresh()
+    refresh = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for i in range(20):
+        index.search(f'change function_{i * 7} of module and VALUE of large module', top_k)
+    search = (time.perf_counter() - start_time) / 20
+
+    return {'files': files_count, 'build': build, 'refresh': refresh, 'search': search}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quality and speed of the relevance index')
+    parser.add_argument('--tasks', default=TASKS_PATH, help='JSONL file of fixture tasks')
+    parser.add_argument('--top-k', type=int, default=8, help='files in the step prompt')
+    parser.add_argument('--sizes', default='1000,10000', help='comma separated sizes of synthetic projects for speed, empty - skip')
+    args = parser.parse_args()
+
+    index = RelevanceIndex(REPO_ROOT)
+    index.refresh()
+    print(f"fixture tasks on {REPO_ROOT}:")
+    quality = evaluate(index, load_tasks(args.tasks), args.top_k)
+    print(json.dumps(quality))
+
+    for size in [int(size) for size in args.sizes.split(',') if size.strip()]:
+        speed = measure_speed(size, args.top_k)
+        print(f"{speed['files']:>8} files: build {speed['build']:.2f}s, refresh {speed['refresh'] * 1000:.1f} ms, search {speed['search'] * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
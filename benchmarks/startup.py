@@ -0,0 +1,102 @@
+"""
+Cold start budget: import time of the entry points in a fresh interpreter and wall time of the test suite.
+
+Usage (from the repository root):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --skip-tests --repeat 10
+
+The run fails when the median time of any entry exceeds its budget of benchmarks/startup_budget.json
+or when a lazily imported module (`lazy_modules`) is loaded at startup.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'startup_budget.json')
+
+ENTRY_POINTS = ['llm_api_server', 'batch_runner']
+
+# prints seconds of import and loaded modules of the list
+IMPORT_SCRIPT = """
+import json, sys, time
+start_time = time.perf_counter()
+import {module}
+print(json.dumps([time.perf_counter() - start_time, [m for m in {lazy_modules!r} if m in sys.modules]]))
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault('OPENAI_API_TIMEOUT', '60')
+    env.setdefault('MAX_ITERATION', '20')
+    env['AGENT_FILE_TOOLS'] = 'pure'
+    env['TRACE_FILE'] = ''
+    return env
+
+
+def measure_import(module: str, lazy_modules: list, repeat: int) -> tuple[float, list]:
+    times = []
+    loaded = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_SCRIPT.format(module=module, lazy_modules=lazy_modules)],
+            cwd=REPO_ROOT, env=_env(), capture_output=True, text=True, check=True,
+        ).stdout
+        seconds, loaded = json.loads(output.strip().split("\n")[-1])
+        times.append(seconds)
+
+    return statistics.median(times), loaded
+
+
+def measure_tests() -> float:
+    start_time = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'unittest', 'discover', '-s', './tests/', '-p', 'Test*.py'], cwd=REPO_ROOT, env=_env(), capture_output=True, check=True)
+    return time.perf_counter() - start_time
+
+
+def check_budget(results: dict, loaded: dict, budget: dict) -> list[str]:
+    failures = []
+    for name, seconds in results.items():
+        if name in budget and seconds > budget[name]:
+            failures.append(f"{name}: {seconds * 1000:.0f} ms, budget {budget[name] * 1000:.0f} ms")
+
+    for name, modules in loaded.items():
+        if modules:
+            failures.append(f"{name}: imports {', '.join(modules)} at startup")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold start budget of entry points and the test suite')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per entry point, the median is taken')
+    parser.add_argument('--skip-tests', action='store_true', help='do not measure the test suite')
+    parser.add_argument('--budget', default=BUDGET_PATH, help='JSON file of budgets, seconds')
+    args = parser.parse_args()
+
+    with open(args.budget, 'r', encoding='utf8') as f:
+        budget = json.load(f)
+
+    results = {}
+    loaded = {}
+    for module in ENTRY_POINTS:
+        results[module], loaded[module] = measure_import(module, budget.get('lazy_modules', []), args.repeat)
+        print(f"import {module:<24} {results[module] * 1000:8.1f} ms")
+
+    if not args.skip_tests:
+        results['tests'] = measure_tests()
+        print(f"{'test suite':<31} {results['tests'] * 1000:8.1f} ms")
+
+    failures = check_budget(results, loaded, budget)
+    if failures:
+        print("OVER BUDGET:\n" + "\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
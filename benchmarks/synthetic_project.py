@@ -0,0 +1,71 @@
+import json
+import os
+
+MARKER_FILE = '.bench_project'
+FILES_PER_DIR = 100
+
+
+def _small_file(index: int) -> str:
+    return (
+        f'"""Module {index} of the synthetic project"""\n'
+        f'from pkg_{max(index - 1, 0) // FILES_PER_DIR:04d} import module_{max(index - 1, 0):06d}\n\n\n'
+        f'def function_{index}(value):\n'
+        f'    return module_{max(index - 1, 0):06d}.VALUE + value * {index}\n\n\n'
+        f'VALUE = {index}\n'
+    )
+
+
+def _large_file(index: int, lines: int) -> str:
+    result = [f'"""Large module {index} of the synthetic project"""\n', 'VALUE = 0\n']
+    for i in range(lines // 4):
+        result.append(f'\n\ndef large_function_{index}_{i}(value):\n    return value + {i}\n')
+
+    return ''.join(result)
+
+
+def small_file_path(index: int) -> str:
+    return os.path.join(f'pkg_{index // FILES_PER_DIR:04d}', f'module_{index:06d}.py').replace('\\', '/')
+
+
+def large_file_path(index: int) -> str:
+    return f'large/large_{index}.py'
+
+
+def write_large_file(base_path: str, index: int, lines: int):
+    with open(os.path.join(base_path, large_file_path(index)), 'w', encoding='utf8') as f:
+        f.write(_large_file(index, lines))
+
+
+def generate_project(base_path: str, files_count: int, large_files: int = 5, large_file_lines: int = 20000) -> dict:
+    """
+    Generates a python project of `files_count` small modules in packages of FILES_PER_DIR files
+    and `large_files` modules of `large_file_lines` lines. Existing project with the same parameters is reused.
+    """
+    params = {'files_count': files_count, 'large_files': large_files, 'large_file_lines': large_file_lines}
+    marker_path = os.path.join(base_path, MARKER_FILE)
+    if os.path.exists(marker_path):
+        with open(marker_path, 'r', encoding='utf8') as f:
+            if json.load(f) == params:
+                return params
+
+    os.makedirs(os.path.join(base_path, 'large'), exist_ok=True)
+    with open(os.path.join(base_path, 'AGENTS.md'), 'w', encoding='utf8') as f:
+        f.write(f"# Synthetic project\n\n{files_count} python modules in packages `pkg_*`, large modules in `large/`.\n")
+
+    for index in range(files_count):
+        file_path = os.path.join(base_path, small_file_path(index))
+        if index % FILES_PER_DIR == 0:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(os.path.join(os.path.dirname(file_path), '__init__.py'), 'w', encoding='utf8') as f:
+                f.write('')
+
+        with open(file_path, 'w', encoding='utf8') as f:
+            f.write(_small_file(index))
+
+    for index in range(large_files):
+        write_large_file(base_path, index, large_file_lines)
+
+    with open(marker_path, 'w', encoding='utf8') as f:
+        json.dump(params, f)
+
+    return params
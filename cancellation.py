@@ -0,0 +1,99 @@
+import threading
+
+
+class TaskCancelledError(Exception):
+    pass
+
+
+class CancellationToken:
+    POLL_INTERVAL = 0.1
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+
+            self._event.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def wait(self, timeout: float) -> bool:
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelledError("Task was cancelled")
+
+
+def raise_if_cancelled(cancel_token: CancellationToken|None):
+    if cancel_token:
+        cancel_token.raise_if_cancelled()
+
+
+def run_cancellable(fn, cancel_token: CancellationToken|None, on_cancel=None):
+    """
+    Runs blocking `fn` on a daemon thread and returns its result,
+    raises TaskCancelledError within POLL_INTERVAL after token is cancelled
+    (the worker is abandoned, `on_cancel` is used for aborting it: close connection etc)
+    """
+    if not cancel_token:
+        return fn()
+
+    cancel_token.raise_if_cancelled()
+
+    state = {}
+    done = threading.Event()
+
+    def _worker():
+        try:
+            state['result'] = fn()
+        except BaseException as e:
+            state['error'] = e
+        finally:
+            done.set()
+
+    if on_cancel:
+        cancel_token.on_cancel(on_cancel)
+
+    try:
+        threading.Thread(target=_worker, daemon=True).start()
+        while not done.wait(CancellationToken.POLL_INTERVAL):
+            cancel_token.raise_if_cancelled()
+    finally:
+        if on_cancel:
+            cancel_token.remove_callback(on_cancel)
+
+    if 'error' in state:
+        # error can be caused by `on_cancel` aborting the worker
+        cancel_token.raise_if_cancelled()
+        raise state['error']
+
+    return state['result']
@@ -0,0 +1,121 @@
+import os
+import re
+import hashlib
+import subprocess
+import threading
+import logging
+
+from metrics import REGISTRY
+
+logger = logging.getLogger('APP')
+
+GIT_OBJECT_PREFIX = 'git:'
+GIT_TIMEOUT = 10
+
+CHANGE_SOURCES = REGISTRY.counter('change_sources_total', 'Pre-edit sources of edited files per storage, storage=git|snapshot')
+
+
+def git_blob_hash(content: bytes) -> str:
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+def storage_path_of(storage_root: str, project_root: str) -> str:
+    return os.path.join(storage_root, hashlib.sha256(project_root.encode()).hexdigest())
+
+
+def _git(project_root: str, args: list, stdin: bytes|None = None) -> subprocess.CompletedProcess|None:
+    try:
+        return subprocess.run(['git', *args], cwd=project_root, input=stdin, capture_output=True, timeout=GIT_TIMEOUT)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"git {args[0]} failed: {e}")
+        return None
+
+
+class ChangeTracker:
+    """
+    Pre-edit sources of files edited during one task, for diff links. Source equal to the blob of the file
+    in HEAD or in the index is referenced by the blob hash (`git:<hash>`) and read from the git object database
+    when the diff is opened; sources of other files are copied into the storage. The first source of a file wins.
+    """
+    def __init__(self, project_root: str, storage_path: str):
+        self.project_root = project_root
+        self.storage_path = storage_path
+        self._sources = {}
+        self._git_root = False
+        self._lock = threading.Lock()
+
+    def _get_git_root(self) -> str|None:
+        # resolved once per task: None for projects out of git repository or without git installed
+        if self._git_root is False:
+            process = _git(self.project_root, ['rev-parse', '--show-toplevel'])
+            self._git_root = process.stdout.decode().strip() if process and process.returncode == 0 else None
+
+        return self._git_root
+
+    def _git_source(self, file_name: str, content: bytes) -> str|None:
+        git_root = self._get_git_root()
+        if git_root is None:
+            return None
+
+        path = os.path.relpath(os.path.realpath(os.path.join(self.project_root, file_name)), git_root).replace('\\', '/')
+        if path.startswith('../'):
+            return None
+
+        process = _git(self.project_root, ['cat-file', '--batch-check=%(objectname)'], f"HEAD:{path}\n:0:{path}\n".encode())
+        if not process or process.returncode != 0:
+            return None
+
+        blob_hash = git_blob_hash(content)
+        if blob_hash not in process.stdout.decode().split():
+            return None
+
+        return GIT_OBJECT_PREFIX + blob_hash
+
+    def _snapshot(self, file_name: str, content: str) -> str:
+        source_file_content_path = os.path.join(self.storage_path, hashlib.sha256(file_name.encode()).hexdigest() + '.txt')
+        if not os.path.exists(source_file_content_path):
+            os.makedirs(self.storage_path, exist_ok=True)
+            with open(source_file_content_path, 'w', encoding='utf8') as f:
+                f.write(content)
+
+        return os.path.abspath(source_file_content_path)
+
+    def source(self, file_name: str, content: str) -> str:
+        with self._lock:
+            if file_name in self._sources:
+                return self._sources[file_name]
+
+        source = self._git_source(file_name, content.encode('utf-8'))
+        CHANGE_SOURCES.inc(storage='git' if source else 'snapshot')
+        if source is None:
+            source = self._snapshot(file_name, content)
+
+        with self._lock:
+            return self._sources.setdefault(file_name, source)
+
+
+def materialize_source(project_root: str, storage_path: str, source: str) -> str|None:
+    """
+    Path of the file with pre-edit source for the IDE: `git:<hash>` blobs are written into the storage once
+    """
+    if not source.startswith(GIT_OBJECT_PREFIX):
+        return source
+
+    blob_hash = source[len(GIT_OBJECT_PREFIX):]
+    if not re.fullmatch(r'[0-9a-f]{40}', blob_hash):
+        return None
+
+    path = os.path.abspath(os.path.join(storage_path, blob_hash + '.txt'))
+    if os.path.exists(path):
+        return path
+
+    process = _git(project_root, ['cat-file', 'blob', blob_hash])
+    if not process or process.returncode != 0:
+        return None
+
+    os.makedirs(storage_path, exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(process.stdout)
+    os.replace(path + '.tmp', path)
+
+    return path
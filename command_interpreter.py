@@ -2,19 +2,43 @@ import os.path
 
 from diff_helper import apply_patch, PatchError
 import re
+import time
 from mcp_helper import tool_call
+from metrics import TOOL_EXECUTE_DURATION, TOOL_EXECUTE_ERRORS
+from tracing import span
+from result_shaper import ResultShaper
+from tool_executor import TOOL_EXECUTOR, TOOL_MAX_FILE_BYTES
+from dir_tree import DIRECTORY_CACHE, IgnoreRules, render_tree
 import json
 
 class CommandInterpreter:
-    def __init__(self, mcp_host, project_root):
+    OPCODES = ['read_file', 'list_in_directory', 'list_tree', 'write_file', 'replace_code_in_file', 'read_more']
+    LIST_TREE_DEPTH = 3
+    LIST_TREE_MAX_ENTRIES = 300
+
+    def __init__(self, mcp_host, project_root, cancel_token=None, file_cache=None):
         self.mcp_host = mcp_host
         self.project_root = project_root
+        self.cancel_token = cancel_token
+        self.file_cache = file_cache
+        self.shaper = ResultShaper()
+        self.ignore_rules = None
 
     def _command_read(self, file_path) -> dict:
+        if self.file_cache:
+            cached_content = self.file_cache.get(file_path)
+            if cached_content is not None:
+                return {'result': cached_content, 'exists': True, 'tool_name': 'read', 'file_path': file_path}
+
+        absolute_path = os.path.join(self.project_root, file_path)
+        if os.path.isfile(absolute_path) and os.path.getsize(absolute_path) > TOOL_MAX_FILE_BYTES:
+            return {'result': f"ERROR: file is larger than {TOOL_MAX_FILE_BYTES} bytes and can't be processed by tools", 'exists': True, 'error': True}
+
+        stamp = self.file_cache.read_stamp(file_path) if self.file_cache else None
         content = tool_call(self.mcp_host, 'get_file_text_by_path', {
             'pathInProject': file_path,
             'projectPath': self.project_root,
-        })
+        }, self.cancel_token)
 
         is_success = False
         if 'error' in content:
@@ -30,6 +54,9 @@ class CommandInterpreter:
         if is_success:
             response['tool_name'] = 'read'
             response['file_path'] = file_path
+
+            if self.file_cache:
+                self.file_cache.put(file_path, result, stamp, lines=result.count("\n") + 1)
         else:
             response['error'] = True
 
@@ -45,17 +72,42 @@ class CommandInterpreter:
             return {'result': 'ERROR: this is a file'}
 
         result = []
-        for _path in os.listdir(str(absolute_path)):
-            if os.path.isdir(_path):
-                _path += '/'
-            result.append(f"- {_path}")
+        for name, is_dir, _ in DIRECTORY_CACHE.entries(str(absolute_path)):
+            result.append(f"- {name}/" if is_dir else f"- {name}")
 
         return {'result': "\n".join(result), 'tool_name': 'list_in_directory'}
 
+    def _command_list_tree(self, path, depth=None, max_entries=None) -> dict:
+        # omitted optional arguments come as None
+        if type(path) is not str:
+            return {'result': 'ERROR: `path` must be a string', 'error': True}
+
+        path = os.path.normpath(path.replace('\\', '/')).replace('\\', '/').lstrip('/') or '.'
+        absolute_path = os.path.join(self.project_root, path)
+
+        if path.startswith('..') or not os.path.exists(absolute_path):
+            return {'result': 'ERROR: Path not exists', 'error': True}
+
+        if not os.path.isdir(absolute_path):
+            return {'result': 'ERROR: this is a file', 'error': True}
+
+        if self.ignore_rules is None:
+            self.ignore_rules = IgnoreRules.for_project(self.project_root)
+
+        depth = max(1, int(depth if depth is not None else self.LIST_TREE_DEPTH))
+        max_entries = max(1, int(max_entries if max_entries is not None else self.LIST_TREE_MAX_ENTRIES))
+        tree, skipped = render_tree(self.project_root, path, depth, max_entries, self.ignore_rules)
+        if skipped:
+            tree += f"\n... {skipped} more entries are not shown, list subdirectories separately"
+
+        return {'result': tree or '(empty directory)', 'tool_name': 'list_tree'}
+
     def _command_write(self, file_path, data) -> dict:
         # looking for file exists:
         source_file = self._command_read(file_path)
         is_exist = source_file['exists']
+        if is_exist and source_file.get('error', False):
+            return source_file
 
         if type(data) is dict or type(data) is list:
             # workaround for some stupid local LLM
@@ -77,7 +129,10 @@ class CommandInterpreter:
             'text': data.strip(),
             'projectPath': self.project_root,
             'overwrite': True,
-        })
+        }, self.cancel_token)
+
+        if self.file_cache:
+            self.file_cache.invalidate(file_path)
 
         result = {'result': "True" if 'status' in content else "ERROR: " + content['error']}
         if 'status' in content:
@@ -99,6 +154,8 @@ class CommandInterpreter:
         source_file = self._command_read(file_path)
         if not source_file['exists']:
             return {'result': "ERROR: file not exist"}
+        if source_file.get('error', False):
+            return source_file
 
         source_code = source_file['result']
         source_code = [_.rstrip() for _ in source_code.split("\n")]
@@ -113,7 +170,10 @@ class CommandInterpreter:
             'text': patched_file.strip(),
             'projectPath': self.project_root,
             'overwrite': True,
-        })
+        }, self.cancel_token)
+
+        if self.file_cache:
+            self.file_cache.invalidate(file_path)
 
         result = {'result': "True" if 'status' in content else "ERROR: " + content['error']}
         if 'status' in content:
@@ -128,16 +188,35 @@ class CommandInterpreter:
         return result
 
     def execute(self, opcode: str, arguments) -> dict:
+        start_time = time.perf_counter()
+        file_path = arguments[0] if arguments and type(arguments[0]) is str else None
+        with span('tool.execute', opcode=opcode, file_path=file_path) as tool_span:
+            result = TOOL_EXECUTOR.run(opcode, lambda: self._execute(opcode, arguments), self.cancel_token)
+            result = self.shaper.shape(opcode, arguments, result)
+            tool_span.set(error=bool(result.get('error', False)), result_size=len(str(result.get('result', ''))))
+
+        metric_opcode = opcode if opcode in self.OPCODES else 'unknown'
+        TOOL_EXECUTE_DURATION.observe(time.perf_counter() - start_time, opcode=metric_opcode)
+        if result.get('error', False) or str(result.get('result', '')).startswith('ERROR'):
+            TOOL_EXECUTE_ERRORS.inc(opcode=metric_opcode)
+
+        return result
+
+    def _execute(self, opcode: str, arguments) -> dict:
         try:
             if opcode == 'read_file':
                 return self._command_read(*arguments)
             elif opcode == 'list_in_directory':
                 return self._command_list(*arguments)
+            elif opcode == 'list_tree':
+                return self._command_list_tree(*arguments)
             elif opcode == 'write_file':
                 return self._command_write(*arguments)
             elif opcode == 'replace_code_in_file':
                 return self._command_write_diff(*arguments)
+            elif opcode == 'read_more':
+                return self.shaper.next_page(*arguments, execute=self._execute)
             else:
                 return {"result": "ERROR: wrong tool name, check tools list and call correct", 'error': True}
-        except TypeError:
+        except (TypeError, ValueError, AttributeError):
             return {"result": "ERROR: wrong command code/arguments, check tools list and call correct", 'error': True}
\ No newline at end of file
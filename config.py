@@ -0,0 +1,101 @@
+import os
+
+from dotenv import load_dotenv
+
+
+def _int(value, default: int|None = None) -> int|None:
+    return int(value) if value not in (None, '') else default
+
+
+def _float(value, default: float|None = None) -> float|None:
+    return float(value) if value not in (None, '') else default
+
+
+def _list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class ConfigError(Exception):
+    pass
+
+
+def _thinking_frequency(value: str) -> str|int:
+    # `error` - plan only after failed steps, N - plan every N steps
+    value = value.strip()
+    if value == 'error':
+        return value
+
+    if not value.isdigit() or int(value) < 1:
+        raise ConfigError(f"THINKING_FREQUENCY must be `error` or a positive number, got `{value}`, see env.example")
+
+    return int(value)
+
+
+class Config:
+    """
+    Settings of the application: read once from the environment and `.env` (the environment has priority).
+    Modules copy the values they use into module constants at import.
+    """
+    def __init__(self, env):
+        # LLM
+        self.openai_api_url = env.get('OPENAI_API_URL')
+        self.openai_api_key = env.get('OPENAI_API_KEY')
+        self.openai_api_timeout = _int(env.get('OPENAI_API_TIMEOUT'))
+        self.model = env.get('MODEL')
+        self.reasoning_effort = env.get('REASONING_EFFORT')
+        self.max_prompt_output = _int(env.get('MAX_PROMPT_OUTPUT'))
+        self.model_cheap = env.get('MODEL_CHEAP', '')
+        self.model_routing = _list(env.get('MODEL_ROUTING', 'json_repair,report,supervisor'))
+        self.model_prices = env.get('MODEL_PRICES', '')
+
+        # IDE and server
+        self.ide_mcp_host = env.get('IDE_MCP_HOST')
+        self.http_port = _int(env.get('HTTP_PORT'), 5000)
+        self.agent_file_tools = env.get('AGENT_FILE_TOOLS', 'mcp')
+        self.debug = _int(env.get('DEBUG'), 0) == 1
+
+        # agents
+        self.max_iteration = _int(env.get('MAX_ITERATION'))
+        self.max_parallel_agents = _int(env.get('MAX_PARALLEL_AGENTS'), 4)
+        self.deepthinking_agents = env.get('DEEPTHINKING_AGENTS', '').split(',')
+        self.thinking_mode = env.get('THINKING_MODE', 'separate')
+        self.thinking_frequency = _thinking_frequency(env.get('THINKING_FREQUENCY') or '1')
+        self.prefetch_files = _int(env.get('PREFETCH_FILES'), 1) == 1
+        self.relevance_top_k = _int(env.get('RELEVANCE_TOP_K'), 8)
+        self.relevance_max_files = _int(env.get('RELEVANCE_MAX_FILES'), 5000)
+        self.task_max_prompt_tokens = _int(env.get('TASK_MAX_PROMPT_TOKENS'), 0)
+        self.task_max_completion_tokens = _int(env.get('TASK_MAX_COMPLETION_TOKENS'), 0)
+        self.task_max_seconds = _float(env.get('TASK_MAX_SECONDS'), 0)
+        self.task_max_cost = _float(env.get('TASK_MAX_COST'), 0)
+
+        # tools
+        self.tool_workers = _int(env.get('TOOL_WORKERS'), 4)
+        self.tool_timeouts = env.get('TOOL_TIMEOUTS', '')
+        self.tool_max_file_bytes = _int(env.get('TOOL_MAX_FILE_BYTES'), 20 * 1024 * 1024)
+        self.tool_result_limits = env.get('TOOL_RESULT_LIMITS', '')
+        self.list_ignore = env.get('LIST_IGNORE', '.git,.hg,.svn,.idea,.vscode,node_modules,__pycache__,.venv,venv,.mypy_cache,.pytest_cache,.tox,*.pyc')
+
+        # logs and traces
+        self.trace_file = env.get('TRACE_FILE', '')
+        self.log_queue_size = _int(env.get('LOG_QUEUE_SIZE'), 10000)
+        self.log_max_bytes = _int(env.get('LOG_MAX_BYTES'), 10 * 1024 * 1024)
+        self.log_backup_count = _int(env.get('LOG_BACKUP_COUNT'), 3)
+
+    @classmethod
+    def load(cls) -> 'Config':
+        load_dotenv()
+        return cls(os.environ)
+
+    def required(self, name: str):
+        value = getattr(self, name)
+        if value is None:
+            raise ConfigError(f"{name.upper()} is not set, see env.example")
+
+        return value
+
+    @staticmethod
+    def role_model(role: str) -> str|None:
+        return os.environ.get(f'MODEL:{role}', None)
+
+
+CONFIG = Config.load()
@@ -39,13 +39,12 @@ def agent_result_tpl(result: dict, message_type: str, message) -> dict:
     }
 
 def agent_result_of_all_active_tpl(messages: list[dict]) -> dict|None:
-    processed_files = []
+    # links in order of the first change, dict keys are the hash set
+    processed_files = {}
     for message in messages:
         result = message['message'].get('result', {})
         if message['type'] == 'files' and result.get('tool_name', '') in ['write', 'write_diff']:
-            _html = _file_processing_tpl(result)
-            if _html not in processed_files:
-                processed_files.append(_html)
+            processed_files.setdefault(_file_processing_tpl(result), True)
 
     if processed_files:
         message = "<p>📋 Processed files:</p> <ul>" + " ".join([f"<li>{link}</li>" for link in processed_files]) + "</ul>"
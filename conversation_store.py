@@ -0,0 +1,165 @@
+import sys
+import threading
+
+
+class ContentPool:
+    """
+    Run-scoped pool of long strings: equal contents of messages (file reads, tool arguments)
+    share one buffer between conversations of the supervisor and all agents.
+    """
+    MIN_SHARED_LENGTH = 256
+
+    def __init__(self):
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def share(self, text):
+        if type(text) is not str or len(text) < self.MIN_SHARED_LENGTH:
+            return text
+
+        with self._lock:
+            return self._buffers.setdefault(text, text)
+
+    def size(self) -> int:
+        with self._lock:
+            return sum(len(text) for text in self._buffers)
+
+
+class ToolCallRecord:
+    __slots__ = ('id', 'name', 'arguments')
+
+    def __init__(self, id: str, name: str, arguments: str):
+        self.id = id
+        self.name = name
+        self.arguments = arguments
+
+    @property
+    def function(self):
+        # attribute access compatible with tool calls of openai SDK: tool_call.function.name
+        return self
+
+    @staticmethod
+    def create(tool_call, pool: ContentPool|None = None) -> 'ToolCallRecord':
+        if type(tool_call) is ToolCallRecord:
+            return tool_call
+
+        if type(tool_call) is dict:
+            tool_call_id, function = tool_call['id'], tool_call['function']
+            name, arguments = function['name'], function.get('arguments') or ''
+        else:
+            tool_call_id, name, arguments = tool_call.id, tool_call.function.name, tool_call.function.arguments or ''
+
+        return ToolCallRecord(tool_call_id, sys.intern(name), pool.share(arguments) if pool else arguments)
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'type': 'function',
+            'function': {
+                'name': self.name,
+                'arguments': self.arguments,
+            }
+        }
+
+
+class MessageRecord:
+    __slots__ = ('role', 'content', 'tool_calls', 'tool_call_id', 'name', '_provider')
+
+    def __init__(self, role: str, content, tool_calls: tuple|None = None, tool_call_id: str|None = None, name: str|None = None):
+        self.role = role
+        self.content = content
+        self.tool_calls = tool_calls
+        self.tool_call_id = tool_call_id
+        self.name = name
+        self._provider = None
+
+    def to_dict(self) -> dict:
+        # records are immutable: provider dict is built once and shared by all requests and views
+        if self._provider is None:
+            message = {'role': self.role, 'content': self.content}
+            if self.tool_calls is not None:
+                message['tool_calls'] = [tool_call.to_dict() for tool_call in self.tool_calls]
+            if self.tool_call_id is not None:
+                message['tool_call_id'] = self.tool_call_id
+            if self.name is not None:
+                message['name'] = self.name
+            self._provider = message
+
+        return self._provider
+
+
+class ConversationView:
+    """
+    Read-only view of a conversation: records are not copied, filtering keeps indexes only
+    """
+    __slots__ = ('_records', '_indexes')
+
+    def __init__(self, records: list, indexes):
+        self._records = records
+        self._indexes = indexes
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def __iter__(self):
+        for i in self._indexes:
+            yield self._records[i]
+
+    def filter(self, predicate) -> 'ConversationView':
+        return ConversationView(self._records, [i for i in self._indexes if predicate(self._records[i])])
+
+    def to_provider(self) -> list[dict]:
+        return [self._records[i].to_dict() for i in self._indexes]
+
+
+class Conversation:
+    """
+    Append-only conversation of `__slots__` records with contents shared through ContentPool.
+    Messages are appended as provider dicts; indexing returns provider dicts (plain, JSON serializable).
+    """
+    def __init__(self, pool: ContentPool|None = None):
+        self.pool = pool if pool is not None else ContentPool()
+        self._records = []
+
+    @classmethod
+    def from_messages(cls, messages, pool: ContentPool|None = None) -> 'Conversation':
+        conversation = cls(pool)
+        for message in messages:
+            conversation.append(message)
+
+        return conversation
+
+    def append(self, message: dict):
+        tool_calls = message.get('tool_calls', None)
+        if tool_calls is not None:
+            tool_calls = tuple(ToolCallRecord.create(tool_call, self.pool) for tool_call in tool_calls)
+
+        self._records.append(MessageRecord(
+            sys.intern(message['role']),
+            self.pool.share(message.get('content', None)),
+            tool_calls,
+            message.get('tool_call_id', None),
+            message.get('name', None),
+        ))
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self):
+        for record in self._records:
+            yield record.to_dict()
+
+    def __getitem__(self, index):
+        if type(index) is slice:
+            return [record.to_dict() for record in self._records[index]]
+
+        return self._records[index].to_dict()
+
+    def records(self) -> list[MessageRecord]:
+        return self._records
+
+    def view(self, start: int = 0) -> ConversationView:
+        return ConversationView(self._records, range(start, len(self._records)))
+
+    def to_provider(self) -> list[dict]:
+        return [record.to_dict() for record in self._records]
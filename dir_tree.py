@@ -0,0 +1,124 @@
+import os
+import fnmatch
+import threading
+from collections import OrderedDict
+
+from config import CONFIG
+from metrics import REGISTRY
+
+# names of files and directories hidden from listings, `.gitignore` of the project root is applied too
+LIST_IGNORE = CONFIG.list_ignore
+
+DIR_CACHE_REQUESTS = REGISTRY.counter('dir_cache_requests_total', 'Directory scans served by the directory cache, result=hit|miss')
+
+
+class IgnoreRules:
+    """
+    Subset of gitignore: name patterns match at any level, patterns with `/` match the path from the root,
+    trailing `/` matches directories only; negations are not supported.
+    """
+    def __init__(self, patterns: list[str]):
+        self.rules = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern[0] in '#!':
+                continue
+
+            dir_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            anchored = '/' in pattern
+            self.rules.append((pattern.lstrip('/'), dir_only, anchored))
+
+    @classmethod
+    def for_project(cls, project_root: str) -> 'IgnoreRules':
+        patterns = LIST_IGNORE.split(',')
+        try:
+            with open(os.path.join(project_root, '.gitignore'), encoding='utf-8') as f:
+                patterns += f.read().split("\n")
+        except (OSError, UnicodeDecodeError):
+            pass
+
+        return cls(patterns)
+
+    def match(self, relative_path: str, name: str, is_dir: bool) -> bool:
+        for pattern, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+
+            if fnmatch.fnmatchcase(relative_path if anchored else name, pattern):
+                return True
+
+        return False
+
+
+class DirectoryCache:
+    """
+    Process-wide cache of directory entries [(name, is_dir, is_link)] validated by mtime of the directory:
+    creating, deleting or renaming of entries changes mtime of their directory.
+    Types are taken from d_type of `os.scandir`, stat is called for symlinks only.
+    """
+    MAX_DIRECTORIES = 4096
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def entries(self, path: str) -> list[tuple[str, bool, bool]]:
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._entries.move_to_end(path)
+                DIR_CACHE_REQUESTS.inc(result='hit')
+                return cached[1]
+
+        DIR_CACHE_REQUESTS.inc(result='miss')
+        with os.scandir(path) as it:
+            entries = [(entry.name, entry.is_dir(), entry.is_symlink()) for entry in it]
+        # directories first
+        entries.sort(key=lambda entry: (not entry[1], entry[0]))
+
+        with self._lock:
+            self._entries[path] = (mtime, entries)
+            self._entries.move_to_end(path)
+            if len(self._entries) > self.MAX_DIRECTORIES:
+                self._entries.popitem(last=False)
+
+        return entries
+
+
+DIRECTORY_CACHE = DirectoryCache()
+
+
+def render_tree(root: str, path: str, depth: int, max_entries: int, ignore: IgnoreRules, cache: DirectoryCache = DIRECTORY_CACHE) -> tuple[str, int]:
+    """
+    Indented tree of `path` (relative to `root`) down to `depth` levels, directories end with `/`.
+    Returns the tree and the number of entries not shown because of `max_entries`.
+    """
+    lines = []
+    skipped = 0
+
+    def walk(directory: str, level: int):
+        nonlocal skipped
+        try:
+            entries = cache.entries(os.path.join(root, directory))
+        except OSError:
+            return
+
+        for name, is_dir, is_link in entries:
+            relative_path = f"{directory}/{name}" if directory != '.' else name
+            if ignore.match(relative_path, name, is_dir):
+                continue
+
+            if len(lines) >= max_entries:
+                # count the rest of this level only, deeper levels are not scanned
+                skipped += 1
+                continue
+
+            lines.append('  ' * level + name + ('/' if is_dir else ''))
+            # symlinks to directories are shown, but not walked into
+            if is_dir and not is_link and level + 1 < depth:
+                walk(relative_path, level + 1)
+
+    walk(path, 0)
+    return "\n".join(lines), skipped
@@ -0,0 +1,110 @@
+import os
+import threading
+
+from metrics import REGISTRY
+
+FILE_CACHE_REQUESTS = REGISTRY.counter('file_cache_requests_total', 'Reads served by the run-scoped file cache, result=hit|miss')
+
+
+class FileEntry:
+    __slots__ = ('path', 'version', 'content', 'facts')
+
+    def __init__(self, path: str, version: tuple, content: str):
+        self.path = path
+        self.version = version
+        self.content = content
+        self.facts = {}
+
+
+class FileKnowledgeCache:
+    """
+    Run-scoped store of file contents and derived facts shared by the supervisor and all sub-agents of one task.
+    Entries are keyed by path and validated by content version (mtime, size) on every access,
+    writes of agents invalidate entries. Readers take `read_stamp` before reading a file and pass it to `put`:
+    content read while the file was changed or invalidated is not stored.
+    """
+    def __init__(self, project_root: str):
+        self.project_root = project_root
+        self._entries = {}
+        self._invalidations = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normpath(path.replace('\\', '/')).lstrip('/')
+
+    def _version(self, path: str) -> tuple|None:
+        try:
+            stat = os.stat(os.path.join(self.project_root, path))
+        except OSError:
+            return None
+
+        return stat.st_mtime_ns, stat.st_size
+
+    def _get_entry(self, path: str) -> FileEntry|None:
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        if entry.version != self._version(key):
+            self.invalidate(path)
+            return None
+
+        return entry
+
+    def get(self, path: str) -> str|None:
+        entry = self._get_entry(path)
+        FILE_CACHE_REQUESTS.inc(result='hit' if entry else 'miss')
+
+        return entry.content if entry else None
+
+    def peek(self, path: str) -> str|None:
+        # same as get() but not counted in metrics: for internal lookups
+        entry = self._get_entry(path)
+        return entry.content if entry else None
+
+    def read_stamp(self, path: str) -> tuple:
+        key = self._key(path)
+        with self._lock:
+            invalidations = self._invalidations.get(key, 0)
+
+        return self._version(key), invalidations
+
+    def put(self, path: str, content: str, stamp: tuple|None = None, **facts) -> bool:
+        key = self._key(path)
+        version = self._version(key)
+        if version is None or (stamp is not None and stamp[0] != version):
+            return False
+
+        entry = FileEntry(key, version, content)
+        entry.facts.update(facts)
+        with self._lock:
+            if stamp is not None and self._invalidations.get(key, 0) != stamp[1]:
+                # the file was written while it was being read
+                return False
+
+            self._entries[key] = entry
+
+        return True
+
+    def invalidate(self, path: str):
+        key = self._key(path)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._invalidations[key] = self._invalidations.get(key, 0) + 1
+
+    def set_fact(self, path: str, name: str, value):
+        entry = self._get_entry(path)
+        if entry:
+            entry.facts[name] = value
+
+    def get_facts(self, path: str) -> dict:
+        entry = self._get_entry(path)
+        return dict(entry.facts) if entry else {}
+
+    def loaded_files(self) -> list[FileEntry]:
+        with self._lock:
+            return list(self._entries.values())
@@ -0,0 +1,169 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+
+from conversation_store import ToolCallRecord
+
+JOURNAL_PATH = './journal'
+
+
+def _dump_tool_call(tool_call) -> dict:
+    return ToolCallRecord.create(tool_call).to_dict()
+
+
+def _load_tool_call(data: dict) -> ToolCallRecord:
+    return ToolCallRecord.create(data)
+
+
+def dump_message(message: dict) -> dict:
+    if 'tool_calls' not in message:
+        return message
+
+    message = dict(message)
+    message['tool_calls'] = [_dump_tool_call(tool_call) for tool_call in message['tool_calls']]
+    return message
+
+
+def load_message(message: dict) -> dict:
+    if 'tool_calls' in message:
+        message['tool_calls'] = [_load_tool_call(tool_call) for tool_call in message['tool_calls']]
+
+    return message
+
+
+def dump_llm_output(output: dict) -> dict:
+    return {
+        '_output': output.get('_output', ''),
+        '_tool_calls': [_dump_tool_call(tool_call) for tool_call in output.get('_tool_calls', None) or []],
+    }
+
+
+def load_llm_output(output: dict) -> dict:
+    return {
+        '_output': output['_output'],
+        '_tool_calls': [_load_tool_call(tool_call) for tool_call in output['_tool_calls']],
+    }
+
+
+class TaskJournal:
+    """
+    Append-only journal of one Copilot task, every record is fsync-ed.
+
+    Records (field `kind`):
+    - task: task header (instruction, project, task_id)
+    - scope: sub-agent started (scope, role, instruction)
+    - llm_output: LLM answered, tool call is pending (scope, step, output)
+    - messages: messages were appended to the conversation of scope (scope, step, messages)
+    - snapshot: conversation of scope was rewritten (scope, step, conversation)
+    - scope_end: sub-agent finished (scope, report)
+    - finished: task is completed
+    """
+    SUPERVISOR_SCOPE = 'SUPERVISOR'
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._persisted = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_path(project_base_path: str, task_id: str) -> str:
+        return os.path.join(JOURNAL_PATH, hashlib.sha256(project_base_path.encode()).hexdigest(), task_id + '.jsonl')
+
+    def append(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            dir_path = os.path.dirname(self.file_path)
+            if dir_path:
+                os.makedirs(dir_path, exist_ok=True)
+
+            with open(self.file_path, 'a', encoding='utf8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def start(self, task_id: str, project_base_path: str, instruction: str):
+        self.append({'kind': 'task', 'task_id': task_id, 'project_base_path': project_base_path, 'instruction': instruction})
+
+    def start_scope(self, scope: str, role: str, instruction: str):
+        self.append({'kind': 'scope', 'scope': scope, 'role': role, 'instruction': instruction})
+
+    def end_scope(self, scope: str, report: str):
+        self.append({'kind': 'scope_end', 'scope': scope, 'report': report})
+
+    def llm_output(self, scope: str, step: int, output: dict):
+        self.append({'kind': 'llm_output', 'scope': scope, 'step': step, 'output': dump_llm_output(output)})
+
+    def checkpoint(self, scope: str, step: int, conversation: list[dict]):
+        count, last_message = self._persisted.get(scope, (0, None))
+
+        # conversation filters can rewrite the tail of conversation: then save the whole conversation
+        is_appended = count <= len(conversation) and (count == 0 or conversation[count - 1] is last_message)
+        if is_appended:
+            self.append({'kind': 'messages', 'scope': scope, 'step': step, 'messages': [dump_message(m) for m in conversation[count:]]})
+        else:
+            self.append({'kind': 'snapshot', 'scope': scope, 'step': step, 'conversation': [dump_message(m) for m in conversation]})
+
+        self._persisted[scope] = (len(conversation), conversation[-1] if conversation else None)
+
+    def restore(self, scope: str, conversation: list[dict]):
+        self._persisted[scope] = (len(conversation), conversation[-1] if conversation else None)
+
+    def finish(self):
+        self.append({'kind': 'finished'})
+
+    @staticmethod
+    def load(file_path: str) -> dict:
+        state = {'task': None, 'scopes': {}, 'finished': False}
+        with open(file_path, 'r', encoding='utf8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.decoder.JSONDecodeError:
+                    # torn write of the last record
+                    break
+
+                kind = record['kind']
+                if kind == 'task':
+                    state['task'] = record
+                    continue
+                elif kind == 'finished':
+                    state['finished'] = True
+                    continue
+
+                scope = state['scopes'].setdefault(record['scope'], {
+                    'role': None, 'instruction': None, 'conversation': [], 'step': 1, 'pending': None, 'report': None,
+                })
+                if kind == 'scope':
+                    scope['role'] = record['role']
+                    scope['instruction'] = record['instruction']
+                elif kind == 'scope_end':
+                    scope['report'] = record['report']
+                elif kind == 'llm_output':
+                    scope['pending'] = record['output']
+                    scope['step'] = record['step']
+                elif kind == 'messages':
+                    scope['conversation'] += record['messages']
+                    scope['step'] = record['step']
+                    scope['pending'] = None
+                elif kind == 'snapshot':
+                    scope['conversation'] = record['conversation']
+                    scope['step'] = record['step']
+                    scope['pending'] = None
+
+        for scope in state['scopes'].values():
+            scope['conversation'] = [load_message(m) for m in scope['conversation']]
+            if scope['pending']:
+                scope['pending'] = load_llm_output(scope['pending'])
+
+        return state
+
+    @staticmethod
+    def find_unfinished(project_base_path: str) -> str|None:
+        journals = glob.glob(os.path.join(JOURNAL_PATH, hashlib.sha256(project_base_path.encode()).hexdigest(), '*.jsonl'))
+        for file_path in sorted(journals, reverse=True):
+            if not TaskJournal.load(file_path)['finished']:
+                return file_path
+
+        return None
@@ -1,17 +1,17 @@
 import json
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
 import time
+from config import CONFIG
 from llm_parser import parse_tags
+from cancellation import CancellationToken, TaskCancelledError, run_cancellable, raise_if_cancelled
+from tracing import span
+from metrics import LLM_QUERY_DURATION, LLM_QUERY_ATTEMPTS, LLM_QUERY_RETRIES, LLM_QUERY_FAILURES
+from model_router import ROUTER
+from task_budget import TaskBudget
 
 import logging
 
-# Load environment variables from .env file
-load_dotenv()
-
 # setup logger
-IS_DEBUG = int(os.environ.get('DEBUG', 0)) == 1
+IS_DEBUG = CONFIG.debug
 if IS_DEBUG:
     logger = logging.getLogger('llm_api')
     logger.setLevel(logging.DEBUG)
@@ -32,20 +32,53 @@ else:
     logger = logging.getLogger('APP')
 
 # Constants for OpenAI API configuration
-API_URL = os.getenv('OPENAI_API_URL')
-API_KEY = os.getenv('OPENAI_API_KEY')
-API_TIMEOUT = int(os.getenv('OPENAI_API_TIMEOUT'))
-MODEL = os.getenv('MODEL')
-REASONING_EFFORT = os.getenv('REASONING_EFFORT')
-
-MAX_PROMPT_OUTPUT = os.getenv('MAX_PROMPT_OUTPUT', '')
-if MAX_PROMPT_OUTPUT:
-    MAX_PROMPT_OUTPUT = int(MAX_PROMPT_OUTPUT)
-else:
-    MAX_PROMPT_OUTPUT = None
+API_URL = CONFIG.openai_api_url
+API_KEY = CONFIG.openai_api_key
+API_TIMEOUT = CONFIG.required('openai_api_timeout')
+MODEL = CONFIG.model
+REASONING_EFFORT = CONFIG.reasoning_effort
+
+MAX_PROMPT_OUTPUT = CONFIG.max_prompt_output
+
+
+def llm_query(messages, tags=None, tools=None, model_name=None, cancel_token: CancellationToken|None=None, purpose: str|None=None, budget: TaskBudget|None=None) -> dict|None:
+    # usage of every completed call is debited from the task budget, escalated cheap calls too
+    model = model_name if model_name else MODEL
+
+    cheap_model = ROUTER.route(purpose, messages, model)
+    if cheap_model:
+        start_time = time.perf_counter()
+        try:
+            output = _llm_query(messages, tags, tools, cheap_model, cancel_token, ROUTER.CHEAP_ATTEMPTS)
+        except TaskCancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Cheap model `{cheap_model}` failed ({purpose}): {e}")
+            output = None
+
+        duration = time.perf_counter() - start_time
+        if budget and output:
+            budget.debit(cheap_model, output.get('_usage'))
+
+        if ROUTER.validate(purpose, output, tags):
+            ROUTER.on_accepted(purpose, model, duration, output.get('_usage'))
+            return output
 
+        logger.info(f"Escalation of `{purpose}` call to `{model}`")
+        ROUTER.on_escalated(purpose, duration, output.get('_usage') if output else None)
 
-def llm_query(messages, tags=None, tools=None, model_name=None) -> dict|None:
+    start_time = time.perf_counter()
+    output = _llm_query(messages, tags, tools, model, cancel_token)
+    ROUTER.observe(purpose, model, time.perf_counter() - start_time)
+    if budget and output:
+        budget.debit(model, output.get('_usage'))
+
+    return output
+
+
+def _llm_query(messages, tags, tools, model: str, cancel_token: CancellationToken|None, attempts: int = 5) -> dict|None:
+    # imported on the first query: openai SDK takes a quarter of the startup time
+    from openai import OpenAI
     client = OpenAI(
         api_key=API_KEY,
         base_url=API_URL,
@@ -64,13 +97,12 @@ def llm_query(messages, tags=None, tools=None, model_name=None) -> dict|None:
     for m in messages:
         logger.debug(m)
 
-    attempts = 5
     response = None
     error = None
 
     options = {
         'messages': messages,
-        'model': model_name if model_name else MODEL,
+        'model': model,
         'max_tokens': MAX_PROMPT_OUTPUT,
         'tools': tools,
     }
@@ -78,37 +110,68 @@ def llm_query(messages, tags=None, tools=None, model_name=None) -> dict|None:
     if REASONING_EFFORT:
         options['reasoning_effort'] = REASONING_EFFORT
 
-    for attempt in range(attempts):
-        try:
-            response = client.chat.completions.create(**options)
-            content = response.choices[0].message.content.strip() if response.choices[0].message.content else ''
-
-            if len(content) == 0 and tools and not response.choices[0].message.tool_calls:
-                raise Exception("Empty response")
-
-            if tags:
-                output = parse_tags(content, tags)
+    start_time = time.perf_counter()
+    with span('llm_query', model=model, messages=len(messages), tools=len(tools) if tools else 0) as query_span:
+        for attempt in range(attempts):
+            raise_if_cancelled(cancel_token)
+            LLM_QUERY_ATTEMPTS.inc(model=model)
+            with span('llm_query.attempt', model=model, attempt=attempt + 1) as attempt_span:
+                try:
+                    response = run_cancellable(lambda: client.chat.completions.create(**options), cancel_token, client.close)
+                    if response.usage:
+                        attempt_span.set(prompt_tokens=response.usage.prompt_tokens, completion_tokens=response.usage.completion_tokens)
+
+                    content = response.choices[0].message.content.strip() if response.choices[0].message.content else ''
+
+                    if len(content) == 0 and tools and not response.choices[0].message.tool_calls:
+                        raise Exception("Empty response")
+
+                    if tags:
+                        output = parse_tags(content, tags)
+                    else:
+                        output = {}
+
+                    output['_output'] = content
+                    if response.usage:
+                        output['_usage'] = {
+                            'prompt_tokens': response.usage.prompt_tokens,
+                            'completion_tokens': response.usage.completion_tokens,
+                        }
+                    # native reasoning of providers which return it (reasoning_content / reasoning fields)
+                    reasoning = getattr(response.choices[0].message, 'reasoning_content', None) or getattr(response.choices[0].message, 'reasoning', None)
+                    if reasoning and type(reasoning) is str:
+                        output['_reasoning'] = reasoning.strip()
+                    if tools:
+                        output['_tool_calls'] = response.choices[0].message.tool_calls
+                        output['_message'] = response.choices[0].message
+
+                        if not output['_tool_calls']:
+                            output['_tool_calls'] = []
+
+                    logger.debug("OUTPUT:")
+                    logger.debug(output)
+
+                    LLM_QUERY_DURATION.observe(time.perf_counter() - start_time, model=model)
+                    query_span.set(attempts=attempt + 1)
+                    return output
+                except TaskCancelledError:
+                    raise
+                except Exception as e:
+                    error = e
+                    attempt_span.set(error=str(e))
+                    LLM_QUERY_RETRIES.inc(model=model)
+                    logger.warning(f"Attempt {attempt + 1}: Unexpected error: {e}")
+                    if response:
+                        logger.warning(response)
+
+            if cancel_token:
+                if cancel_token.wait(1):
+                    raise TaskCancelledError("Task was cancelled")
             else:
-                output = {}
+                time.sleep(1)
 
-            output['_output'] = content
-            if tools:
-                output['_tool_calls'] = response.choices[0].message.tool_calls
-                output['_message'] = response.choices[0].message
-
-                if not output['_tool_calls']:
-                    output['_tool_calls'] = []
-
-            logger.debug("OUTPUT:")
-            logger.debug(output)
-
-            return output
-        except Exception as e:
-            error = e
-            logger.warning(f"Attempt {attempt + 1}: Unexpected error: {e}")
-            if response:
-                logger.warning(response)
-            time.sleep(1)
-
-    if error:
-        raise error
\ No newline at end of file
+        if error:
+            LLM_QUERY_DURATION.observe(time.perf_counter() - start_time, model=model)
+            LLM_QUERY_FAILURES.inc(model=model)
+            query_span.set(attempts=attempts)
+            raise error
@@ -2,22 +2,26 @@ from flask import Flask, render_template, request, Response
 import json
 import time
 import os
-from dotenv import load_dotenv
 import hashlib
 import signal
 
 import logging
 logger = logging.getLogger('APP')
 
+from config import CONFIG
 from algorythm import Copilot
+from agents import BaseAgent
+from change_tracker import GIT_OBJECT_PREFIX, materialize_source, storage_path_of
+from cancellation import CancellationToken, TaskCancelledError
+from metrics import REGISTRY, TASK_DURATION, TASKS
+from journal import TaskJournal
 from conversation import get_terminal, agent_result_tpl, agent_result_of_all_active_tpl
 
 app = Flask(__name__)
 
-load_dotenv()
-HTTP_PORT = int(os.getenv('HTTP_PORT', 5000))
-MODEL = os.getenv('MODEL')
-IS_DEBUG = int(os.environ.get('DEBUG', 0)) == 1
+HTTP_PORT = CONFIG.http_port
+MODEL = CONFIG.model
+IS_DEBUG = CONFIG.debug
 VERSION_TAG = 1
 
 if IS_DEBUG:
@@ -30,14 +34,17 @@ class SessionsManaged:
         self.sessions = {}
 
     def _init_session(self, session_id: str):
-        self.sessions[session_id] = {'message': None, 'command': None, 'data': {}}
+        self.sessions[session_id] = {'message': None, 'command': None, 'data': {}, 'cancel_token': None}
 
     def add_session_parameter(self, session_id: str, key: str, value):
-        if session_id in self.sessions:
+        if session_id not in self.sessions:
             self._init_session(session_id)
 
         self.sessions[session_id]['data'][key] = value
 
+    def pop_session_parameter(self, session_id: str, key: str):
+        return self.sessions.get(session_id, {}).get('data', {}).pop(key, None)
+
     def get_session_data(self, session_id: str) -> dict:
         return self.sessions.get(session_id, {}).get('data', {})
 
@@ -57,6 +64,18 @@ class SessionsManaged:
 
         self.sessions[session_id]['command'] = command
 
+        cancel_token = self.sessions[session_id]['cancel_token']
+        if command == 'stop' and cancel_token:
+            cancel_token.cancel()
+
+    def new_cancel_token(self, session_id: str) -> CancellationToken:
+        if session_id not in self.sessions:
+            self._init_session(session_id)
+
+        cancel_token = CancellationToken()
+        self.sessions[session_id]['cancel_token'] = cancel_token
+        return cancel_token
+
     def get_message(self, session_id: str):
         if session_id not in self.sessions:
             return None
@@ -83,30 +102,56 @@ class SessionsManaged:
 
     def destroy(self, session_id: str):
         if session_id in self.sessions:
+            cancel_token = self.sessions[session_id]['cancel_token']
+            if cancel_token:
+                cancel_token.cancel()
+
             del self.sessions[session_id]
 
 SESSION_MANAGER_INSTANCE = SessionsManaged()
 
 
 def process_task(user_request: str, session_id: str):
-    session = Copilot(user_request, SESSION_MANAGER_INSTANCE.get_session_data(session_id))
+    cancel_token = SESSION_MANAGER_INSTANCE.new_cancel_token(session_id)
+    resume_journal = SESSION_MANAGER_INSTANCE.pop_session_parameter(session_id, 'resume_journal')
+    if resume_journal:
+        session = Copilot.resume(resume_journal, SESSION_MANAGER_INSTANCE.get_session_data(session_id), cancel_token)
+    else:
+        session = Copilot(user_request, SESSION_MANAGER_INSTANCE.get_session_data(session_id), cancel_token)
 
     active_responses = []
     force_stop = False
-    for message in session.run():
-        command = SESSION_MANAGER_INSTANCE.get_command(session_id)
-        if command == 'stop':
-            force_stop = True
-            SESSION_MANAGER_INSTANCE.commit_command(session_id)
-            break
-
-        message['timestamp'] = time.time()
-
-        if 'tool_name' in message.get('result', {}):
-            active_responses.append({'type': 'files', 'message': message.copy()})
-            message = agent_result_tpl(message['result'], message['type'], message.get('message', ''))
-
-        yield f"data: {json.dumps(message)}\n\n"
+    start_time = time.perf_counter()
+    task_status = 'error'
+    try:
+        for message in session.run():
+            command = SESSION_MANAGER_INSTANCE.get_command(session_id)
+            if command == 'stop':
+                force_stop = True
+                SESSION_MANAGER_INSTANCE.commit_command(session_id)
+                break
+
+            message['timestamp'] = time.time()
+
+            if 'tool_name' in message.get('result', {}):
+                if message['result']['tool_name'] in ['write', 'write_diff']:
+                    # links of processed files only: results of reads are not kept until the end of the task
+                    active_responses.append({'type': 'files', 'message': {'result': {
+                        k: v for k, v in message['result'].items() if k != 'result'
+                    }}})
+                message = agent_result_tpl(message['result'], message['type'], message.get('message', ''))
+
+            yield f"data: {json.dumps(message)}\n\n"
+
+        task_status = 'stopped' if force_stop else 'completed'
+    except TaskCancelledError:
+        # stop command aborted in-flight LLM/tool call
+        force_stop = True
+        task_status = 'stopped'
+        SESSION_MANAGER_INSTANCE.commit_command(session_id)
+    finally:
+        TASK_DURATION.observe(time.perf_counter() - start_time)
+        TASKS.inc(status=task_status)
 
     if active_responses:
         msg = agent_result_of_all_active_tpl(active_responses)
@@ -170,9 +215,24 @@ def control_action():
     if not user_session_id:
         return json.dumps({'status': 'error', 'message': 'empty session'}), 400
 
-    if command not in ['stop']:
+    if command not in ['stop', 'resume']:
         return json.dumps({'status': 'error', 'message': 'invalid command'}), 400
 
+    if command == 'resume':
+        # continue the last unfinished task of the project from its journal
+        if SESSION_MANAGER_INSTANCE.get_message(user_session_id):
+            return json.dumps({'status': 'error', 'message': 'Session is locked'}), 400
+
+        project_base_path = SESSION_MANAGER_INSTANCE.get_session_data(user_session_id).get('project_base_path')
+        journal_path = TaskJournal.find_unfinished(project_base_path) if project_base_path else None
+        if not journal_path:
+            return json.dumps({'status': 'error', 'message': 'nothing to resume'}), 400
+
+        SESSION_MANAGER_INSTANCE.add_session_parameter(user_session_id, 'resume_journal', journal_path)
+        SESSION_MANAGER_INSTANCE.send_message(user_session_id, TaskJournal.load(journal_path)['task']['instruction'])
+
+        return json.dumps({'status': 'success'})
+
     SESSION_MANAGER_INSTANCE.send_command(user_session_id, command)
 
     return json.dumps({'status': 'success'})
@@ -242,6 +302,30 @@ def event_stream(session: dict):
             logging.exception("message")
             break
 
+@app.route('/source')
+def source_action():
+    # pre-edit source of diff link kept in git: written into the storage when the diff is opened
+    user_session_id = request.args.get('session_id', '').strip()
+    source = request.args.get('object', '').strip()
+    project_base_path = SESSION_MANAGER_INSTANCE.get_session_data(user_session_id).get('project_base_path')
+    if not project_base_path:
+        return json.dumps({'status': 'error', 'message': 'empty session'}), 400
+
+    if not source.startswith(GIT_OBJECT_PREFIX):
+        return json.dumps({'status': 'error', 'message': 'invalid object'}), 400
+
+    path = materialize_source(project_base_path, storage_path_of(BaseAgent.STORAGE_PATH, project_base_path), source)
+    if not path:
+        return json.dumps({'status': 'error', 'message': 'source not found in git'}), 404
+
+    return json.dumps({'status': 'success', 'path': path})
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8', headers={
+        'Cache-Control': 'no-cache',
+    })
+
 @app.route('/events')
 def events():
     session_id = request.args.get('session_id')
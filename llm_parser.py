@@ -1,19 +1,124 @@
 import re
+from functools import lru_cache
+
+
+@lru_cache(maxsize=64)
+def _compile(tags: tuple) -> re.Pattern:
+    # zero-width match at `<` of every opening tag: `<tag>` or `<tag attr=...>`
+    names = '|'.join(re.escape(tag) for tag in tags)
+    return re.compile(rf'<(?=({names})(>| [a-z]+=[^>]+>))')
+
+
+_ATTRS = re.compile(r'[a-z]+=[^>]+>')
+
+
+class TagParser:
+    """
+    Extracts bodies of `<tag>...</tag>` (or `<tag attr=...>...</tag>` when the tag has no plain form)
+    for all tags in one scan of the content. Content can be fed by chunks of streamed output:
+    feed() returns (tag, body) of tags closed by the chunk.
+    """
+    def __init__(self, tags: list):
+        self.tags = list(tags)
+        self._pattern = _compile(tuple(self.tags))
+        self._content = ''
+        self._scan_pos = 0
+        # keys: (tag, has attributes)
+        self._next_pos = {}
+        self._pending = {}
+        self._matches = {}
+
+    def _close(self, key: tuple, body_start: int, search_pos: int) -> tuple|None:
+        closing = f'</{key[0]}>'
+        close_pos = self._content.find(closing, search_pos)
+        if close_pos < 0:
+            # the closing tag can be split between chunks
+            self._pending[key] = (body_start, max(body_start, len(self._content) - len(closing) + 1))
+            return None
+
+        self._pending.pop(key, None)
+        self._next_pos[key] = close_pos + len(closing)
+
+        body = self._content[body_start:close_pos]
+        self._matches.setdefault(key, []).append(body)
+        return key[0], body
+
+    def feed(self, chunk: str) -> list[tuple]:
+        self._content += chunk
+
+        closed = []
+        for key, (body_start, search_pos) in list(self._pending.items()):
+            match = self._close(key, body_start, search_pos)
+            if match:
+                closed.append(match)
+
+        # opening tag is complete when `>` follows it: openings after the last `>` wait for the next chunk
+        last_gt = self._content.rfind('>')
+        if last_gt < self._scan_pos:
+            return closed
+
+        for m in self._pattern.finditer(self._content, self._scan_pos):
+            if m.start() > last_gt:
+                break
+
+            tag, suffix = m.group(1), m.group(2)
+            key = (tag, suffix != '>')
+            # openings inside of the body of the same tag are skipped
+            if key in self._pending or m.start() < self._next_pos.get(key, 0):
+                continue
+
+            body_start = m.start() + 1 + len(tag) + len(suffix)
+            match = self._close(key, body_start, body_start)
+            if match:
+                closed.append(match)
+
+        self._scan_pos = last_gt + 1
+        return closed
+
+    def result(self) -> dict:
+        output = {}
+        for tag in self.tags:
+            if (tag, False) in self._matches:
+                output[tag] = self._matches[(tag, False)]
+            elif (tag, True) in self._matches:
+                output[tag] = self._matches[(tag, True)]
+
+        return output
+
+
+def _find_bodies(content: str, tag: str, with_attrs: bool) -> list:
+    # literal search of `<tag>` (or `<tag ` + attributes) and the nearest `</tag>` after it
+    opening = f'<{tag} ' if with_attrs else f'<{tag}>'
+    closing = f'</{tag}>'
+    bodies = []
+    pos = 0
+    while True:
+        start = content.find(opening, pos)
+        if start < 0:
+            return bodies
+
+        body_start = start + len(opening)
+        if with_attrs:
+            m = _ATTRS.match(content, body_start)
+            if not m:
+                pos = start + 1
+                continue
+            body_start = m.end()
+
+        end = content.find(closing, body_start)
+        if end < 0:
+            return bodies
+
+        bodies.append(content[body_start:end])
+        pos = end + len(closing)
+
 
 def parse_tags(content: str, tags: list, support_tag_attr=False) -> dict:
     output = {}
     for tag in tags:
-        pattern1 = rf'<{tag}>(.*?)</{tag}>'
-        pattern2 = rf'<{tag} [a-z]+=[^>]+>(.*?)</{tag}>'
-
-        # Search for the pattern in the provided text
-        match = re.findall(pattern1, content, re.DOTALL)
-        match_with_attrs = re.findall(pattern2, content, re.DOTALL)
-
-        # If a match is found, return the content; otherwise, return None
-        if match:
-            output[tag] = match
-        elif match_with_attrs:
-            output[tag] = match_with_attrs
+        # the attribute form is used only when the tag has no plain form
+        bodies = _find_bodies(content, tag, False) or _find_bodies(content, tag, True)
+        if bodies:
+            output[tag] = bodies
 
-    return output
\ No newline at end of file
+    return output
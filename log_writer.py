@@ -0,0 +1,180 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from config import CONFIG
+from metrics import REGISTRY
+
+LOG_QUEUE_SIZE = CONFIG.log_queue_size
+LOG_MAX_BYTES = CONFIG.log_max_bytes
+LOG_BACKUP_COUNT = CONFIG.log_backup_count
+
+LOG_RECORDS_DROPPED = REGISTRY.counter('log_records_dropped_total', 'Log records dropped because writer queue is full')
+LOG_WRITE_ERRORS = REGISTRY.counter('log_write_errors_total', 'Log write failures, reason=io (records of the file in the batch are lost)|serialize (record is replaced by its repr)')
+
+logger = logging.getLogger('APP')
+
+
+def log_record(role: str, data) -> dict:
+    record = {'ts': time.time(), 'role': role}
+    if type(data) is dict:
+        # shallow copy: caller can change the dict before it's serialized
+        record.update(data)
+    elif type(data) is list:
+        record['data'] = list(data)
+    else:
+        record['message'] = data
+
+    return record
+
+
+class LogWriter:
+    """
+    Background JSONL writer: `write()` only puts a record to a bounded queue,
+    the writer thread drains the queue in batches, groups records by file, flushes each file once per batch
+    and rotates files by size (path -> path.1 -> ... -> path.N)
+    """
+    MAX_OPEN_FILES = 16
+    BATCH_SIZE = 500
+
+    def __init__(self, queue_size: int = LOG_QUEUE_SIZE, max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT):
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._queue = queue.Queue(queue_size)
+        self._files = OrderedDict()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='log-writer', daemon=True)
+                self._thread.start()
+
+    def write(self, path: str, record: dict) -> bool:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((path, record))
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+            return False
+
+        return True
+
+    def flush(self, timeout: float|None = None) -> bool:
+        if self._thread is None:
+            return True
+
+        done = threading.Event()
+        try:
+            self._queue.put((None, done), timeout=timeout)
+        except queue.Full:
+            return False
+
+        return done.wait(timeout)
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._write_batch(batch)
+            except Exception:
+                # the writer thread must survive any batch: flush() waiters and next records depend on it
+                logger.exception("Log writer failed")
+
+    @staticmethod
+    def _serialize(record) -> str:
+        try:
+            return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        except Exception as e:
+            # tuple keys, circular references etc: the record is kept as text
+            LOG_WRITE_ERRORS.inc(reason='serialize')
+            return json.dumps({'ts': time.time(), 'log_error': f"unserializable record: {e}", 'record': repr(record)}, ensure_ascii=False) + "\n"
+
+    def _write_batch(self, batch: list):
+        lines = OrderedDict()
+        flush_events = [record for path, record in batch if path is None]
+        try:
+            for path, record in batch:
+                if path is not None:
+                    lines.setdefault(path, []).append(self._serialize(record))
+
+            for path, path_lines in lines.items():
+                try:
+                    self._write_lines(path, path_lines)
+                except Exception as e:
+                    # disk full, log directory removed etc: other files of the batch are still written
+                    LOG_WRITE_ERRORS.inc(reason='io')
+                    logger.warning(f"Log write to {path} failed: {e}")
+                    self._close(path)
+        finally:
+            # waiters of flush() are released even when the batch is lost
+            for event in flush_events:
+                event.set()
+
+    def _write_lines(self, path: str, lines: list[str]):
+        f = self._open(path)
+        f.write(''.join(lines))
+        f.flush()
+
+        if self.max_bytes and f.tell() >= self.max_bytes:
+            self._rotate(path)
+
+    def _close(self, path: str):
+        f = self._files.pop(path, None)
+        if f is None:
+            return
+
+        try:
+            f.close()
+        except OSError:
+            pass
+
+    def _open(self, path: str):
+        if path in self._files:
+            self._files.move_to_end(path)
+            return self._files[path]
+
+        if len(self._files) >= self.MAX_OPEN_FILES:
+            _, f = self._files.popitem(last=False)
+            f.close()
+
+        dir_path = os.path.dirname(path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+        f = open(path, 'a', encoding='utf8')
+        self._files[path] = f
+        return f
+
+    def _rotate(self, path: str):
+        self._files.pop(path).close()
+
+        if self.backup_count <= 0:
+            os.remove(path)
+            return
+
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+
+        os.replace(path, f"{path}.1")
+
+
+LOG_WRITER = LogWriter()
+atexit.register(LOG_WRITER.flush, 2)
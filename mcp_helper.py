@@ -2,16 +2,18 @@ import asyncio
 import os
 import os.path
 
-from dotenv import load_dotenv
-load_dotenv()
-
-from mcp import ClientSession
-from mcp.client.sse import sse_client
+from config import CONFIG
+from cancellation import CancellationToken, TaskCancelledError, raise_if_cancelled
+from tracing import span
 
 # Load mode configuration - 'mcp' or 'pure'
-AGENT_FILE_TOOLS = os.getenv('AGENT_FILE_TOOLS', 'mcp')
+AGENT_FILE_TOOLS = CONFIG.agent_file_tools
 
 async def _tool_call_sse(path: str, name: str, args: dict = None):
+    # mcp is imported on the first call: it is not used in `pure` mode and slow to import
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+
     async with sse_client(path) as (
             read_stream,
             write_stream,
@@ -21,6 +23,22 @@ async def _tool_call_sse(path: str, name: str, args: dict = None):
             return await session.call_tool(name, args)
 
 
+async def _tool_call_sse_cancellable(path: str, name: str, args: dict, cancel_token: CancellationToken):
+    task = asyncio.create_task(_tool_call_sse(path, name, args))
+    while not task.done():
+        if cancel_token.is_cancelled:
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+            raise TaskCancelledError("Task was cancelled")
+
+        await asyncio.wait({task}, timeout=CancellationToken.POLL_INTERVAL)
+
+    return task.result()
+
+
 def _read_file_pure(project_path: str, path_in_project: str) -> dict:
     try:
         abs_path = os.path.normpath(os.path.join(project_path, path_in_project))
@@ -35,7 +53,7 @@ def _read_file_pure(project_path: str, path_in_project: str) -> dict:
 
         return {'status': content}
 
-    except FileNotFoundError | PermissionError | UnicodeDecodeError:
+    except (FileNotFoundError, PermissionError, UnicodeDecodeError):
         return {'error': f"File: {path_in_project} doesn't exist or can't be opened"}
 
 
@@ -53,7 +71,14 @@ def _write_file_pure(project_path: str, path_in_project: str, text: str) -> dict
 
     return {'status': 'File created successfully'}
 
-def tool_call(path: str, name: str, args: dict = None) -> dict:
+def tool_call(path: str, name: str, args: dict = None, cancel_token: CancellationToken|None = None) -> dict:
+    raise_if_cancelled(cancel_token)
+
+    with span('mcp.tool_call', tool=name, file_path=(args or {}).get('pathInProject'), mode=AGENT_FILE_TOOLS):
+        return _tool_call(path, name, args, cancel_token)
+
+
+def _tool_call(path: str, name: str, args: dict, cancel_token: CancellationToken|None) -> dict:
     if name == 'get_file_text_by_path':
         # jetbrains'mcp truncate big files
         return _read_file_pure(args['projectPath'], args['pathInProject'])
@@ -70,7 +95,11 @@ def tool_call(path: str, name: str, args: dict = None) -> dict:
             raise Exception(f"Unknown tool: {name}")
     
     # MCP mode: use existing MCP protocol implementation
-    result = asyncio.run(_tool_call_sse(path, name, args))
+    if cancel_token:
+        result = asyncio.run(_tool_call_sse_cancellable(path, name, args, cancel_token))
+    else:
+        result = asyncio.run(_tool_call_sse(path, name, args))
+
     if result.isError:
         return {
             'error': result.content[0].text
@@ -0,0 +1,220 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+STEPS_BUCKETS = (1, 2, 3, 5, 8, 13, 20, 30, 50, 100)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels_key: tuple, extra: tuple = ()) -> str:
+    labels_key = labels_key + extra
+    if not labels_key:
+        return ''
+
+    pairs = []
+    for name, value in labels_key:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+
+    if type(value) is float and value.is_integer():
+        return str(int(value))
+
+    return str(value)
+
+
+class _ShardedMetric(ABC):
+    """
+    Every thread writes only to its own shard (dict), so recording does not take any lock,
+    shards are merged on collect. Shards of finished threads are folded into `_retired`.
+    """
+    TYPE = ''
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+
+        return shard
+
+    @abstractmethod
+    def _new_value(self):
+        ...
+
+    @abstractmethod
+    def _merge_value(self, target, value):
+        ...
+
+    def _merge_shard(self, target: dict, shard: dict):
+        for key, value in shard.copy().items():
+            if key not in target:
+                target[key] = self._new_value()
+            target[key] = self._merge_value(target[key], value)
+
+    def collect(self) -> dict:
+        with self._lock:
+            alive_shards = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive_shards.append((thread, shard))
+                else:
+                    self._merge_shard(self._retired, shard)
+            self._shards = alive_shards
+
+            result = {}
+            self._merge_shard(result, self._retired)
+            for _, shard in self._shards:
+                self._merge_shard(result, shard)
+
+        return result
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.TYPE}",
+        ]
+
+
+class Counter(_ShardedMetric):
+    TYPE = 'counter'
+
+    def inc(self, value: float = 1, **labels):
+        shard = self._shard()
+        key = _labels_key(labels)
+        shard[key] = shard.get(key, 0) + value
+
+    def _new_value(self):
+        return 0
+
+    def _merge_value(self, target, value):
+        return target + value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+
+        return lines
+
+
+class Histogram(_ShardedMetric):
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = _labels_key(labels)
+        state = shard.get(key)
+        if state is None:
+            state = self._new_value()
+            shard[key] = state
+
+        # state: [per bucket counts..., +Inf count, sum]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[i] += 1
+                break
+        else:
+            state[len(self.buckets)] += 1
+
+        state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+    def _new_value(self):
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def _merge_value(self, target, value):
+        return [a + b for a, b in zip(target, list(value))]
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, state in sorted(self.collect().items()):
+            cumulative = 0
+            for i, bound in enumerate(self.buckets + (float('inf'),)):
+                cumulative += state[i]
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', _format_value(float(bound))),))} {cumulative}")
+
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name: str, *args):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = metric_class(name, *args)
+
+            metric = self._metrics[name]
+
+        assert type(metric) is metric_class, f'metric `{name}` already registered as {metric.TYPE}'
+        return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+LLM_QUERY_DURATION = REGISTRY.histogram('llm_query_duration_seconds', 'Duration of llm_query including retries')
+LLM_QUERY_ATTEMPTS = REGISTRY.counter('llm_query_attempts_total', 'Completion requests sent to the LLM API')
+LLM_QUERY_RETRIES = REGISTRY.counter('llm_query_retries_total', 'Failed completion attempts that were retried or raised')
+LLM_QUERY_FAILURES = REGISTRY.counter('llm_query_failures_total', 'llm_query calls failed after all attempts')
+
+TOOL_EXECUTE_DURATION = REGISTRY.histogram('tool_execute_duration_seconds', 'Duration of CommandInterpreter.execute per opcode')
+TOOL_EXECUTE_ERRORS = REGISTRY.counter('tool_execute_errors_total', 'Tool executions returned an error per opcode')
+
+AGENT_STEPS = REGISTRY.histogram('agent_steps', 'Steps made by an agent run per role', STEPS_BUCKETS)
+
+TASK_DURATION = REGISTRY.histogram('task_duration_seconds', 'Duration of process_task')
+TASKS = REGISTRY.counter('tasks_total', 'Processed tasks per final status')
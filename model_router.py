@@ -0,0 +1,172 @@
+import json
+import threading
+
+from config import CONFIG
+from metrics import REGISTRY
+
+# cheap model for simple calls, empty - routing is disabled
+MODEL_CHEAP = CONFIG.model_cheap
+MODEL_ROUTING = CONFIG.model_routing
+# price per 1M tokens: `model=prompt:completion,...`
+MODEL_PRICES = CONFIG.model_prices
+
+ROUTED_CALLS = REGISTRY.counter('llm_routing_calls_total', 'Calls answered by the cheap model per purpose, result=accepted|escalated')
+ROUTING_SAVED_SECONDS = REGISTRY.counter('llm_routing_saved_seconds_total', 'Estimated latency saved by the cheap model (accepted calls)')
+ROUTING_WASTED_SECONDS = REGISTRY.counter('llm_routing_wasted_seconds_total', 'Latency spent on the cheap model before escalation')
+ROUTING_SAVED_COST = REGISTRY.counter('llm_routing_saved_cost_total', 'Estimated cost saved by the cheap model (accepted calls), MODEL_PRICES units')
+ROUTING_WASTED_COST = REGISTRY.counter('llm_routing_wasted_cost_total', 'Cost spent on the cheap model before escalation, MODEL_PRICES units')
+
+
+def parse_prices(prices: str) -> dict:
+    result = {}
+    for item in prices.split(','):
+        if '=' not in item:
+            continue
+
+        model, price = item.rsplit('=', 1)
+        prompt_price, completion_price = price.split(':')
+        result[model.strip()] = (float(prompt_price), float(completion_price))
+
+    return result
+
+
+def _is_json(data: str|None) -> bool:
+    if not data:
+        return True
+
+    try:
+        json.loads(data)
+    except json.decoder.JSONDecodeError:
+        return False
+
+    return True
+
+
+class ModelRouter:
+    """
+    Picks the model per llm_query call by call purpose and conversation features.
+    Routed calls go to the cheap model first and are escalated to the main model
+    when the answer fails validation (error, empty answer, bad tool arguments, hard decision).
+
+    Purposes:
+    - json_repair: fix of broken tool arguments
+    - report: the last steps of an agent, when it has to report
+    - supervisor: supervisor turn after tool results, cheap answer is accepted only for `message`/`exit`
+    - agent, plan: always the main model
+    """
+    CHEAP_ATTEMPTS = 2
+    # stop routing of the purpose when cheap answers are mostly escalated
+    MIN_SAMPLES = 10
+    MIN_ACCEPT_RATE = 0.3
+    EWMA_ALPHA = 0.2
+
+    SUPERVISOR_CHEAP_TOOLS = ['message', 'exit']
+
+    def __init__(self, cheap_model: str, purposes: list[str], prices: dict):
+        self.cheap_model = cheap_model
+        self.purposes = purposes
+        self.prices = prices
+
+        self._accepted = {}
+        self._escalated = {}
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def route(self, purpose: str|None, messages, model: str) -> str|None:
+        # returns the cheap model to try first or None
+        if not self.cheap_model or self.cheap_model == model or purpose not in self.purposes:
+            return None
+
+        with self._lock:
+            accepted = self._accepted.get(purpose, 0)
+            total = accepted + self._escalated.get(purpose, 0)
+        if total >= self.MIN_SAMPLES and accepted / total < self.MIN_ACCEPT_RATE:
+            return None
+
+        if purpose == 'supervisor':
+            # agents reports are read: the supervisor likely answers user or exits
+            return self.cheap_model if type(messages) is list and messages[-1].get('role') == 'tool' else None
+
+        return self.cheap_model
+
+    def validate(self, purpose: str, output: dict|None, tags=None) -> bool:
+        if not output:
+            return False
+
+        for tag in tags or []:
+            if not output.get(tag) or not output[tag][0]:
+                return False
+
+        if purpose == 'json_repair':
+            return _is_json(output['RESULT'][0]) if 'RESULT' in output else False
+
+        if '_tool_calls' not in output:
+            return bool(output.get('_output'))
+
+        tool_calls = output['_tool_calls'] or []
+        if not tool_calls and not output.get('_output'):
+            return False
+
+        for tool_call in tool_calls:
+            if not _is_json(tool_call.function.arguments):
+                return False
+
+        tool_names = [tool_call.function.name for tool_call in tool_calls]
+        if purpose == 'supervisor':
+            return all(name in self.SUPERVISOR_CHEAP_TOOLS for name in tool_names)
+        if purpose == 'report':
+            return tool_names == ['report']
+
+        return True
+
+    def cost(self, model: str, usage: dict|None) -> float|None:
+        if model not in self.prices or not usage:
+            return None
+
+        prompt_price, completion_price = self.prices[model]
+        return (usage['prompt_tokens'] * prompt_price + usage['completion_tokens'] * completion_price) / 1e6
+
+    def observe(self, purpose: str|None, model: str, duration: float):
+        with self._lock:
+            key = (purpose, model)
+            if key in self._latency:
+                self._latency[key] += self.EWMA_ALPHA * (duration - self._latency[key])
+            else:
+                self._latency[key] = duration
+
+    def on_accepted(self, purpose: str, model: str, duration: float, usage: dict|None):
+        with self._lock:
+            self._accepted[purpose] = self._accepted.get(purpose, 0) + 1
+            main_latency = self._latency.get((purpose, model))
+
+        ROUTED_CALLS.inc(purpose=purpose, result='accepted')
+        if main_latency is not None and main_latency > duration:
+            ROUTING_SAVED_SECONDS.inc(main_latency - duration, purpose=purpose)
+
+        main_cost, cheap_cost = self.cost(model, usage), self.cost(self.cheap_model, usage)
+        if main_cost is not None and cheap_cost is not None and main_cost > cheap_cost:
+            ROUTING_SAVED_COST.inc(main_cost - cheap_cost, purpose=purpose)
+
+    def on_escalated(self, purpose: str, duration: float, usage: dict|None):
+        with self._lock:
+            self._escalated[purpose] = self._escalated.get(purpose, 0) + 1
+
+        ROUTED_CALLS.inc(purpose=purpose, result='escalated')
+        ROUTING_WASTED_SECONDS.inc(duration, purpose=purpose)
+
+        cheap_cost = self.cost(self.cheap_model, usage)
+        if cheap_cost:
+            ROUTING_WASTED_COST.inc(cheap_cost, purpose=purpose)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                purpose: {
+                    'accepted': self._accepted.get(purpose, 0),
+                    'escalated': self._escalated.get(purpose, 0),
+                }
+                for purpose in self.purposes
+            }
+
+
+ROUTER = ModelRouter(MODEL_CHEAP, MODEL_ROUTING, parse_prices(MODEL_PRICES))
@@ -0,0 +1,181 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from mcp_helper import tool_call
+from metrics import REGISTRY
+
+PREFETCH_FILES = REGISTRY.counter('prefetch_files_total', 'Files loaded into the file cache by the prefetcher')
+PREFETCH_READS = REGISTRY.counter('prefetch_reads_total', 'read_file calls of agents, result=hit|miss of prefetch')
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='prefetch')
+
+_PATH_PATTERN = re.compile(r'(?<![\w/.-])((?:[\w.-]+/)*[\w-][\w.-]*\.[A-Za-z0-9]{1,8})(?![\w/])')
+_PY_FROM_IMPORT_PATTERN = re.compile(r'^\s*from\s+(\.*)([\w.]*)\s+import\s+([\w, ]+)', re.MULTILINE)
+_PY_IMPORT_PATTERN = re.compile(r'^\s*import\s+([\w.]+)', re.MULTILINE)
+_JS_IMPORT_PATTERN = re.compile(r'''(?:from\s+|require\(\s*|import\s*\(\s*|import\s+)['"](\.{1,2}/[^'"]+)['"]''')
+_JS_EXTENSIONS = ['', '.js', '.ts', '.jsx', '.tsx', '.mjs', '/index.js', '/index.ts']
+
+
+class FilePrefetcher:
+    """
+    Predicts files the agent is going to read and loads them into the run-scoped file cache
+    on a background thread while the LLM call is in flight.
+    Predictions: paths mentioned in the instruction and tool results, imports of recently read files, siblings of edited files.
+    """
+    MAX_PREDICTIONS = 8
+    MAX_FILE_SIZE = 512 * 1024
+    MAX_SIBLINGS = 5
+
+    def __init__(self, project_root: str, file_cache):
+        self.project_root = project_root
+        self.file_cache = file_cache
+
+        self.read_files = []
+        self.edited_files = []
+        self.prefetched = set()
+        self.hits = 0
+        self.reads = 0
+
+        self._future = None
+        self._lock = threading.Lock()
+
+    def _normalize(self, path: str) -> str|None:
+        path = os.path.normpath(path.replace('\\', '/')).replace('\\', '/')
+        if path.startswith('..') or os.path.isabs(path):
+            return None
+
+        abs_path = os.path.join(self.project_root, path)
+        try:
+            if not os.path.isfile(abs_path) or os.path.getsize(abs_path) > self.MAX_FILE_SIZE:
+                return None
+        except OSError:
+            return None
+
+        return path
+
+    def _mentioned_paths(self, text: str) -> list[str]:
+        return _PATH_PATTERN.findall(text or '')
+
+    def _imported_paths(self, file_path: str) -> list[str]:
+        content = self.file_cache.peek(file_path)
+        if not content:
+            return []
+
+        file_dir = os.path.dirname(file_path)
+        result = []
+        if file_path.endswith('.py'):
+            for dots, module, names in _PY_FROM_IMPORT_PATTERN.findall(content):
+                base_dir = file_dir
+                for _ in range(len(dots) - 1):
+                    base_dir = os.path.dirname(base_dir)
+
+                module_path = os.path.join(base_dir if dots else '', *module.split('.')) if module else base_dir
+                result += [module_path + '.py', os.path.join(module_path, '__init__.py')]
+                result += [os.path.join(module_path, name.strip() + '.py') for name in names.split(',') if name.strip()]
+
+            for module in _PY_IMPORT_PATTERN.findall(content):
+                result.append(os.path.join(*module.split('.')) + '.py')
+        else:
+            for module in _JS_IMPORT_PATTERN.findall(content):
+                module_path = os.path.join(file_dir, module)
+                result += [module_path + extension for extension in _JS_EXTENSIONS]
+
+        return result
+
+    def _sibling_paths(self, file_path: str) -> list[str]:
+        file_dir = os.path.dirname(file_path)
+        extension = os.path.splitext(file_path)[1]
+        try:
+            entries = sorted(os.scandir(os.path.join(self.project_root, file_dir)), key=lambda e: e.name)
+        except OSError:
+            return []
+
+        result = []
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(extension) and entry.name != os.path.basename(file_path):
+                result.append(os.path.join(file_dir, entry.name))
+                if len(result) >= self.MAX_SIBLINGS:
+                    break
+
+        return result
+
+    def predict(self, text: str, read_files: list[str], edited_files: list[str]) -> list[str]:
+        candidates = self._mentioned_paths(text)
+        for file_path in reversed(read_files):
+            candidates += self._imported_paths(file_path)
+        for file_path in reversed(edited_files):
+            candidates += self._sibling_paths(file_path)
+
+        result = []
+        for candidate in candidates:
+            path = self._normalize(candidate)
+            if path and path not in result and path not in read_files:
+                result.append(path)
+                if len(result) >= self.MAX_PREDICTIONS:
+                    break
+
+        return result
+
+    def _prefetch(self, text: str, read_files: list[str], edited_files: list[str]):
+        for path in self.predict(text, read_files, edited_files):
+            if self.file_cache.peek(path) is not None:
+                continue
+
+            stamp = self.file_cache.read_stamp(path)
+            content = tool_call('', 'get_file_text_by_path', {
+                'pathInProject': path,
+                'projectPath': self.project_root,
+            })
+            if 'status' not in content:
+                continue
+
+            if not self.file_cache.put(path, content['status'], stamp, lines=content['status'].count("\n") + 1):
+                continue
+
+            with self._lock:
+                self.prefetched.add(path)
+            PREFETCH_FILES.inc()
+
+    def schedule(self, text: str):
+        # one prefetch at a time: skip when the previous one is still running
+        if self._future and not self._future.done():
+            return
+
+        self._future = _EXECUTOR.submit(self._prefetch, text, self.read_files[-3:], self.edited_files[-3:])
+
+    def wait(self):
+        # before writes of the agent: the file being edited must not be read by the prefetch at the same time
+        future = self._future
+        if future and not future.cancel():
+            try:
+                future.result()
+            except Exception:
+                pass
+
+    def on_result(self, result: dict):
+        tool_name = result.get('tool_name', '')
+        if tool_name == 'read':
+            self.read_files.append(os.path.normpath(result['file_path']).replace('\\', '/'))
+        elif tool_name in ['write', 'write_diff']:
+            self.edited_files.append(os.path.normpath(result['file_name']).replace('\\', '/'))
+
+    def on_read(self, file_path: str) -> bool:
+        path = os.path.normpath(file_path.replace('\\', '/')).replace('\\', '/')
+        with self._lock:
+            is_hit = path in self.prefetched and self.file_cache.peek(path) is not None
+            self.reads += 1
+            if is_hit:
+                self.hits += 1
+                self.prefetched.discard(path)
+
+        PREFETCH_READS.inc(result='hit' if is_hit else 'miss')
+        return is_hit
+
+    def get_stats(self) -> dict:
+        return {
+            'prefetch_reads': self.reads,
+            'prefetch_hits': self.hits,
+            'prefetch_hit_rate': round(self.hits / self.reads, 3) if self.reads else 0.0,
+        }
@@ -0,0 +1,85 @@
+import os
+import threading
+from collections import OrderedDict
+
+from jinja2 import Environment, BaseLoader
+
+
+class _PromptFile:
+    __slots__ = ('mtime', 'text', 'template', 'rendered')
+
+    def __init__(self, mtime: int, text: str):
+        self.mtime = mtime
+        self.text = text
+        self.template = None
+        self.rendered = {}
+
+
+class PromptRegistry:
+    """
+    Process-wide cache of prompt files: text is re-read only when file's mtime changes,
+    jinja templates are compiled once and rendered variants are cached per parameters set.
+    """
+    MAX_MANIFEST_VARIANTS = 64
+
+    def __init__(self):
+        self._environment = Environment(loader=BaseLoader)
+        self._files = {}
+        self._manifests = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, path: str) -> _PromptFile:
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            prompt_file = self._files.get(path)
+            if prompt_file and prompt_file.mtime == mtime:
+                return prompt_file
+
+        with open(path, 'r', encoding='utf8') as f:
+            prompt_file = _PromptFile(mtime, f.read())
+
+        with self._lock:
+            self._files[path] = prompt_file
+
+        return prompt_file
+
+    def get(self, path: str) -> str:
+        return self._load(path).text
+
+    def render(self, path: str, **params) -> str:
+        prompt_file = self._load(path)
+        # params can contain dicts: key by repr
+        key = repr(sorted(params.items()))
+
+        rendered = prompt_file.rendered.get(key)
+        if rendered is None:
+            if prompt_file.template is None:
+                prompt_file.template = self._environment.from_string(prompt_file.text)
+
+            rendered = prompt_file.template.render(**params)
+            prompt_file.rendered[key] = rendered
+
+        return rendered
+
+    def render_manifest(self, step_prompt: str, description: str, files_structure: list) -> str:
+        key = (step_prompt, description, tuple(files_structure))
+        with self._lock:
+            rendered = self._manifests.get(key)
+            if rendered is not None:
+                self._manifests.move_to_end(key)
+                return rendered
+
+        rendered = step_prompt.format(
+            project_description=description,
+            project_structure="\n".join([f"- {path}" for path in files_structure]),
+        )
+
+        with self._lock:
+            self._manifests[key] = rendered
+            if len(self._manifests) > self.MAX_MANIFEST_VARIANTS:
+                self._manifests.popitem(last=False)
+
+        return rendered
+
+
+PROMPTS = PromptRegistry()
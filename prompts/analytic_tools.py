@@ -33,6 +33,48 @@ tools = [
             }
         }
     },
+    {
+        "type":"function",
+        "function":{
+            "name": "list_tree",
+            "description": "Show tree of files and directories from path down to several levels, one entry per line, nested entries are indented, for directory name end of symbol `/`.\nIgnored files (VCS, dependencies, caches, .gitignore) are not shown",
+            "parameters": {
+                "type": "object",
+                "required": ["path"],
+                "properties": {
+                    "path": {
+                        "type": "string",
+                        "description": 'path, for root of project use `.`'
+                    },
+                    "depth": {
+                        "type": "integer",
+                        "description": "levels to show, default 3"
+                    },
+                    "max_entries": {
+                        "type": "integer",
+                        "description": "max entries in result, default 300"
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type":"function",
+        "function":{
+            "name": "read_more",
+            "description": "Read the next part of long result of read_file, list_in_directory or list_tree.\nLong results are cut, the cursor of the next part is at the end of result",
+            "parameters": {
+                "type": "object",
+                "required": ["cursor"],
+                "properties": {
+                    "cursor": {
+                        "type": "string",
+                        "description": "cursor from the end of the cut result"
+                    }
+                }
+            }
+        }
+    },
     {
         "type":"function",
         "function":{
@@ -76,6 +76,23 @@ example:
             }
         }
     },
+    {
+        "type":"function",
+        "function":{
+            "name": "read_more",
+            "description": "Read the next part of long result of read_file, list_in_directory or list_tree.\nLong results are cut, the cursor of the next part is at the end of result",
+            "parameters": {
+                "type": "object",
+                "required": ["cursor"],
+                "properties": {
+                    "cursor": {
+                        "type": "string",
+                        "description": "cursor from the end of the cut result"
+                    }
+                }
+            }
+        }
+    },
     {
         "type":"function",
         "function":{
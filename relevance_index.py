@@ -0,0 +1,247 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from config import CONFIG
+from dir_tree import DIRECTORY_CACHE, IgnoreRules
+from metrics import REGISTRY
+
+RELEVANCE_TOP_K = CONFIG.relevance_top_k
+RELEVANCE_MAX_FILES = CONFIG.relevance_max_files
+
+RELEVANCE_REFRESH_DURATION = REGISTRY.histogram('relevance_index_refresh_seconds', 'Incremental refresh of the project relevance index')
+RELEVANCE_INDEXED_FILES = REGISTRY.counter('relevance_index_files_total', 'Files (re)tokenized by the relevance index')
+
+_IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]{1,}')
+_SUBWORD_PATTERN = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+')
+_OUTLINE_PATTERN = re.compile(
+    r'^[ \t]{0,4}(?:export\s+)?(?:default\s+)?(?:(?:public|private|protected|static|abstract|final|async|pub)\s+)*'
+    r'(class|def|function|interface|struct|enum|trait|fn|func|module)\s+([A-Za-z_][\w]*)',
+    re.MULTILINE
+)
+
+STOP_WORDS = frozenset((
+    'the', 'and', 'for', 'with', 'from', 'this', 'that', 'into', 'are', 'was', 'not', 'but', 'all', 'any', 'can',
+    'use', 'new', 'add', 'get', 'set', 'file', 'files', 'code', 'make', 'should', 'must', 'need', 'want', 'when',
+    'def', 'class', 'return', 'import', 'self', 'none', 'true', 'false', 'null', 'var', 'let', 'const', 'function',
+    'public', 'private', 'static', 'void', 'int', 'str', 'string', 'else', 'elif', 'while', 'pass', 'raise', 'try',
+    'except', 'async', 'await', 'yield', 'lambda', 'export', 'default', 'type', 'value', 'data', 'result',
+))
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Identifiers and their parts: `parseTags` and `parse_tags` give `parsetags`/`parse_tags`, `parse` and `tags`
+    """
+    tokens = []
+    for identifier in _IDENTIFIER_PATTERN.findall(text):
+        word = identifier.lower()
+        if word not in STOP_WORDS:
+            tokens.append(word)
+
+        parts = _SUBWORD_PATTERN.findall(identifier)
+        if len(parts) > 1:
+            for part in parts:
+                part = part.lower()
+                if len(part) > 2 and part not in STOP_WORDS:
+                    tokens.append(part)
+
+    return tokens
+
+
+def outline(content: str, limit: int = 8) -> str:
+    names = []
+    for kind, name in _OUTLINE_PATTERN.findall(content):
+        if name.startswith('__'):
+            continue
+
+        names.append(f"{kind} {name}")
+        if len(names) >= limit:
+            names.append('...')
+            break
+
+    return ', '.join(names)
+
+
+class _Document:
+    __slots__ = ('version', 'terms', 'length', 'outline')
+
+    def __init__(self, version: tuple, terms: dict, length: int, outline: str):
+        self.version = version
+        self.terms = terms
+        self.length = length
+        self.outline = outline
+
+
+class RelevanceIndex:
+    """
+    BM25 index of project files by identifiers of paths and contents (code and comments).
+    `refresh` walks the project and re-tokenizes only files with changed (mtime, size), postings are updated in place.
+    """
+    K1 = 1.2
+    B = 0.75
+    PATH_WEIGHT = 3
+    MAX_TERMS_PER_FILE = 256
+    MAX_FILE_SIZE = 256 * 1024
+    EXTENSIONS = frozenset((
+        '.py', '.pyi', '.js', '.jsx', '.ts', '.tsx', '.mjs', '.vue', '.java', '.kt', '.kts', '.scala', '.go', '.rs',
+        '.c', '.h', '.cc', '.cpp', '.hpp', '.cs', '.php', '.rb', '.swift', '.m', '.sql', '.sh', '.lua', '.dart',
+        '.html', '.css', '.scss', '.md', '.rst', '.txt', '.json', '.yaml', '.yml', '.toml', '.ini', '.cfg', '.xml',
+    ))
+
+    def __init__(self, project_root: str, max_files: int = RELEVANCE_MAX_FILES):
+        self.project_root = project_root
+        self.max_files = max_files
+        self.ignore_rules = IgnoreRules.for_project(project_root)
+
+        self._documents = {}
+        self._postings = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def _walk(self) -> list[str]:
+        files = []
+        directories = ['.']
+        while directories and len(files) < self.max_files:
+            directory = directories.pop()
+            try:
+                entries = DIRECTORY_CACHE.entries(os.path.join(self.project_root, directory))
+            except OSError:
+                continue
+
+            for name, is_dir, is_link in entries:
+                relative_path = f"{directory}/{name}" if directory != '.' else name
+                if self.ignore_rules.match(relative_path, name, is_dir) or name.startswith('.'):
+                    continue
+
+                if is_dir:
+                    if not is_link:
+                        directories.append(relative_path)
+                elif os.path.splitext(name)[1].lower() in self.EXTENSIONS:
+                    files.append(relative_path)
+
+        return files[:self.max_files]
+
+    def _tokenize_file(self, path: str, version: tuple) -> _Document|None:
+        try:
+            with open(os.path.join(self.project_root, path), 'r', encoding='utf-8') as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError):
+            return None
+
+        counts = Counter(tokenize(content))
+        for token in tokenize(path):
+            counts[token] += self.PATH_WEIGHT
+
+        terms = dict(counts.most_common(self.MAX_TERMS_PER_FILE))
+        return _Document(version, terms, sum(terms.values()), outline(content))
+
+    def _remove(self, path: str):
+        document = self._documents.pop(path)
+        self._total_length -= document.length
+        for term in document.terms:
+            postings = self._postings[term]
+            del postings[path]
+            if not postings:
+                del self._postings[term]
+
+    def _add(self, path: str, document: _Document):
+        self._documents[path] = document
+        self._total_length += document.length
+        for term, count in document.terms.items():
+            self._postings.setdefault(term, {})[path] = count
+
+    def refresh(self) -> int:
+        """
+        Brings the index up to date with the project, returns the number of (re)tokenized files
+        """
+        start_time = time.perf_counter()
+        changed = 0
+        with self._lock:
+            paths = self._walk()
+            for path in set(self._documents) - set(paths):
+                self._remove(path)
+
+            for path in paths:
+                try:
+                    stat = os.stat(os.path.join(self.project_root, path))
+                except OSError:
+                    continue
+
+                version = (stat.st_mtime_ns, stat.st_size)
+                document = self._documents.get(path)
+                if document is not None and document.version == version:
+                    continue
+
+                if document is not None:
+                    self._remove(path)
+
+                if stat.st_size > self.MAX_FILE_SIZE:
+                    continue
+
+                document = self._tokenize_file(path, version)
+                if document is not None:
+                    self._add(path, document)
+                    changed += 1
+
+        RELEVANCE_INDEXED_FILES.inc(changed)
+        RELEVANCE_REFRESH_DURATION.observe(time.perf_counter() - start_time)
+        return changed
+
+    def search(self, query: str, top_k: int) -> list[tuple[str, float, str]]:
+        """
+        Top files for the query: [(path, score, outline)]
+        """
+        with self._lock:
+            documents_count = len(self._documents)
+            if not documents_count:
+                return []
+
+            average_length = self._total_length / documents_count
+            scores = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+
+                idf = math.log(1 + (documents_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for path, count in postings.items():
+                    norm = self.K1 * (1 - self.B + self.B * self._documents[path].length / average_length)
+                    scores[path] = scores.get(path, 0.0) + idf * count * (self.K1 + 1) / (count + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+            return [(path, score, self._documents[path].outline) for path, score in ranked]
+
+    def prompt(self, query: str, top_k: int = RELEVANCE_TOP_K) -> str:
+        if top_k <= 0:
+            return ''
+
+        files = self.search(query, top_k)
+        if not files:
+            return ''
+
+        lines = [f"- {path}" + (f" ({file_outline})" if file_outline else '') for path, _, file_outline in files]
+        return "\n\n## Files relevant to the task by keywords (ranked, verify by reading):\n" + "\n".join(lines)
+
+
+class RelevanceIndexes:
+    """
+    Process-wide indexes per project root: built on the first task, refreshed incrementally on the next ones
+    """
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, project_root: str) -> RelevanceIndex:
+        with self._lock:
+            index = self._indexes.get(project_root)
+            if index is None:
+                index = self._indexes[project_root] = RelevanceIndex(project_root)
+
+        return index
+
+
+RELEVANCE_INDEXES = RelevanceIndexes()
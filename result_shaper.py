@@ -0,0 +1,105 @@
+from config import CONFIG
+
+# per tool limits of result: `opcode=bytes:tokens,...`
+TOOL_RESULT_LIMITS = CONFIG.tool_result_limits
+
+
+def parse_limits(limits: str) -> dict:
+    result = {}
+    for item in limits.split(','):
+        if '=' not in item:
+            continue
+
+        opcode, limit = item.split('=', 1)
+        max_bytes, max_tokens = limit.split(':')
+        result[opcode.strip()] = (int(max_bytes), int(max_tokens))
+
+    return result
+
+
+class ResultShaper:
+    """
+    Limits size of tool results: long result is cut at line (entry) boundary by bytes and estimated tokens,
+    the rest is returned page by page by `read_more` with the continuation cursor.
+    Cursor keeps the call and the offset: the next page is taken from the fresh result of the same call.
+    """
+    CHARS_PER_TOKEN = 4
+    DEFAULT_LIMITS = {
+        'read_file': (49152, 12000),
+        'list_in_directory': (16384, 4000),
+        'list_tree': (16384, 4000),
+    }
+    UNITS = {
+        'read_file': 'lines',
+        'list_in_directory': 'entries',
+        'list_tree': 'entries',
+    }
+
+    def __init__(self, limits: dict|None = None):
+        self.limits = dict(self.DEFAULT_LIMITS)
+        self.limits.update(parse_limits(TOOL_RESULT_LIMITS) if limits is None else limits)
+        self._cursors = {}
+
+    def _cut(self, text: str, offset: int, max_bytes: int, max_chars: int) -> int:
+        end = offset
+        size = 0
+        while end < len(text):
+            line_end = text.find("\n", end) + 1 or len(text)
+            line_size = len(text[end:line_end].encode('utf-8'))
+            if size + line_size > max_bytes or line_end - offset > max_chars:
+                break
+
+            size += line_size
+            end = line_end
+
+        if end == offset:
+            # one line is longer than the limit
+            end = min(len(text), offset + min(max_chars, max_bytes // 4))
+
+        return end
+
+    def _page(self, opcode: str, args: list, result: dict, offset: int, first_unit: int) -> dict:
+        text = result['result']
+        max_bytes, max_tokens = self.limits[opcode]
+        max_chars = max_tokens * self.CHARS_PER_TOKEN
+
+        is_small = len(text) <= min(max_chars, max_bytes // 4) or (len(text) <= max_chars and len(text.encode('utf-8')) <= max_bytes)
+        if offset == 0 and is_small:
+            return result
+
+        end = self._cut(text, offset, max_bytes, max_chars)
+        total = text.count("\n", 0, len(text) - 1) + 1
+        last_unit = first_unit + text.count("\n", offset, max(offset, end - 1))
+
+        unit = self.UNITS.get(opcode, 'lines')
+        if end < len(text):
+            cursor = f"c{len(self._cursors) + 1}"
+            self._cursors[cursor] = (opcode, list(args), end, first_unit + text.count("\n", offset, end))
+            footer = f"\n\n[{unit} {first_unit}-{last_unit} of {total} are shown, call `read_more` with cursor `{cursor}` for the next part]"
+        else:
+            footer = f"\n\n[{unit} {first_unit}-{last_unit} of {total}, end of result]"
+
+        shaped = dict(result)
+        shaped['result'] = text[offset:end] + footer
+        shaped['truncated'] = end < len(text)
+        return shaped
+
+    def shape(self, opcode: str, args: list, result: dict) -> dict:
+        if opcode not in self.limits or result.get('error', False) or type(result.get('result')) is not str:
+            return result
+
+        return self._page(opcode, args, result, 0, 1)
+
+    def next_page(self, cursor: str, execute) -> dict:
+        if cursor not in self._cursors:
+            return {'result': f"ERROR: unknown cursor `{cursor}`, call the tool again", 'error': True}
+
+        opcode, args, offset, first_unit = self._cursors[cursor]
+        result = execute(opcode, args)
+        if result.get('error', False) or type(result.get('result')) is not str:
+            return result
+
+        if offset >= len(result['result']):
+            return {'result': "ERROR: result was changed and has no more parts, call the tool again", 'error': True}
+
+        return self._page(opcode, args, result, offset, first_unit)
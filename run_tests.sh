@@ -1,2 +1,2 @@
 export AGENT_FILE_TOOLS=pure
-python -m unittest discover ./tests/
\ No newline at end of file
+python -m unittest discover -s ./tests/ -p 'Test*.py'
\ No newline at end of file
@@ -0,0 +1,95 @@
+import threading
+import time
+
+from config import CONFIG
+from metrics import REGISTRY
+from model_router import ROUTER
+
+TASK_MAX_PROMPT_TOKENS = CONFIG.task_max_prompt_tokens
+TASK_MAX_COMPLETION_TOKENS = CONFIG.task_max_completion_tokens
+TASK_MAX_SECONDS = CONFIG.task_max_seconds
+TASK_MAX_COST = CONFIG.task_max_cost
+
+TASK_BUDGET_EXHAUSTED = REGISTRY.counter('task_budget_exhausted_total', 'Tasks ended by the budget, limit=prompt_tokens|completion_tokens|seconds|cost')
+TASK_COST = REGISTRY.counter('task_cost_total', 'Estimated cost of LLM calls debited from task budgets, MODEL_PRICES units')
+
+
+class TaskBudget:
+    """
+    Limits of one task shared by the supervisor and all its sub-agents: prompt and completion tokens,
+    wall time and estimated cost (by MODEL_PRICES). Limit 0 is disabled.
+    `llm_query` debits usage of every call, agents check the budget before the next step:
+    after WARNING_RATIO of any limit the model is asked to finish, when a limit is exhausted the work stops
+    with a partial report.
+    """
+    WARNING_RATIO = 0.8
+
+    def __init__(self, max_prompt_tokens: int = 0, max_completion_tokens: int = 0, max_seconds: float = 0, max_cost: float = 0):
+        self.limits = {
+            'prompt_tokens': max_prompt_tokens,
+            'completion_tokens': max_completion_tokens,
+            'seconds': max_seconds,
+            'cost': max_cost,
+        }
+        self.start_time = time.monotonic()
+        self._spent = {'prompt_tokens': 0, 'completion_tokens': 0, 'cost': 0.0}
+        self._calls = 0
+        self._exhausted_reported = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> 'TaskBudget':
+        return cls(TASK_MAX_PROMPT_TOKENS, TASK_MAX_COMPLETION_TOKENS, TASK_MAX_SECONDS, TASK_MAX_COST)
+
+    def debit(self, model: str, usage: dict|None):
+        if not usage:
+            return
+
+        cost = ROUTER.cost(model, usage)
+        with self._lock:
+            self._calls += 1
+            self._spent['prompt_tokens'] += usage['prompt_tokens']
+            self._spent['completion_tokens'] += usage['completion_tokens']
+            if cost:
+                self._spent['cost'] += cost
+
+        if cost:
+            TASK_COST.inc(cost)
+
+    def spent(self) -> dict:
+        with self._lock:
+            spent = dict(self._spent, calls=self._calls)
+
+        spent['seconds'] = round(time.monotonic() - self.start_time, 1)
+        spent['cost'] = round(spent['cost'], 4)
+        return spent
+
+    def _ratios(self) -> dict:
+        spent = self.spent()
+        return {name: spent[name] / limit for name, limit in self.limits.items() if limit}
+
+    def exhausted(self) -> str|None:
+        """
+        Name of the first exhausted limit or None
+        """
+        for name, ratio in self._ratios().items():
+            if ratio >= 1:
+                with self._lock:
+                    is_first = not self._exhausted_reported
+                    self._exhausted_reported = True
+
+                if is_first:
+                    TASK_BUDGET_EXHAUSTED.inc(limit=name)
+                return name
+
+        return None
+
+    def is_low(self) -> bool:
+        return any(ratio >= self.WARNING_RATIO for ratio in self._ratios().values())
+
+    def describe(self) -> str:
+        spent = self.spent()
+        return ', '.join(
+            f"{name} {spent[name]:g}/{limit:g} ({spent[name] / limit:.0%})"
+            for name, limit in self.limits.items() if limit
+        )
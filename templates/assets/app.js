@@ -26,6 +26,200 @@ function JIDETransport(request, onSuccessCb, onFailureCb) {
 }
 
 const ON_USER_SCROLL_SEMAPHORE_TTL = 30; // seconds
+const FRAME_BUDGET = 8; // ms of DOM updates per animation frame, the rest of messages waits for the next frame
+const VIRTUAL_MARGIN = 3000; // px, contents of messages farther from the viewport are detached
+
+class MarkdownStream {
+    // A message is parsed at once. Once text is appended to it (streamed output), completed blocks are parsed once
+    // and appended text re-parses only the open block at the end. A block is completed by a blank line outside
+    // of code fences followed by a new top-level block: list items and indented continuations stay in the open block.
+    // Reference-style link definitions resolve across the whole message: streams with them are not split.
+    constructor(element, text) {
+        this.source = text;
+        this.stableLength = 0;
+        this.scanPosition = 0;
+        this.inFence = false;
+        this.afterBlankLine = false;
+        this.hasReferences = false;
+
+        this.stableElement = document.createElement('div');
+        this.tailElement = document.createElement('div');
+        element.appendChild(this.stableElement);
+        element.appendChild(this.tailElement);
+
+        this.tailElement.innerHTML = marked.parse(text);
+    }
+
+    append(text) {
+        this.source += text;
+
+        const boundary = this.scanBoundary();
+        if (boundary > this.stableLength) {
+            this.stableElement.insertAdjacentHTML('beforeend', marked.parse(this.source.slice(this.stableLength, boundary)));
+            this.stableLength = boundary;
+        }
+
+        this.tailElement.innerHTML = marked.parse(this.source.slice(this.stableLength));
+    }
+
+    scanBoundary() {
+        // complete lines are scanned once
+        let boundary = this.stableLength;
+        let lineEnd;
+        while (!this.hasReferences && (lineEnd = this.source.indexOf('\n', this.scanPosition)) !== -1) {
+            const line = this.source.slice(this.scanPosition, lineEnd);
+            const isBlank = line.trim() === '';
+            if (!this.inFence && /^ {0,3}\[[^\]]+\]:/.test(line)) {
+                // the whole message is parsed as one document from now on
+                this.hasReferences = true;
+                this.stableElement.innerHTML = '';
+                this.stableLength = 0;
+                return 0;
+            }
+
+            if (!this.inFence && this.afterBlankLine && MarkdownStream.isTopLevelBlock(line)) {
+                boundary = this.scanPosition;
+            }
+
+            if (/^ {0,3}(```|~~~)/.test(line)) {
+                this.inFence = !this.inFence;
+            }
+            this.afterBlankLine = !this.inFence && isBlank;
+            this.scanPosition = lineEnd + 1;
+        }
+
+        return boundary;
+    }
+
+    static isTopLevelBlock(line) {
+        return /^\S/.test(line) && !/^([-*+]|\d{1,9}[.)])(\s|$)/.test(line);
+    }
+}
+
+class MessageList {
+    // Messages are rendered on animation frames in batches, contents of messages far from the viewport
+    // are detached from the document (the message keeps its height) and attached back on scroll
+    constructor(container, onRender) {
+        this.container = container;
+        this.onRender = onRender;
+        this.queue = [];
+        this.lastMessage = null;
+        this.isFrameRequested = false;
+        this.detached = new WeakMap();
+
+        this.observer = new IntersectionObserver(
+            (entries) => this.onVisibilityChange(entries),
+            { rootMargin: `${VIRTUAL_MARGIN}px 0px` }
+        );
+    }
+
+    push(message, type, timestamp, append) {
+        this.queue.push({ message, type, timestamp, append });
+        this.requestFrame();
+    }
+
+    clear() {
+        this.queue = [];
+        this.lastMessage = null;
+        this.observer.disconnect();
+        this.container.innerHTML = '';
+    }
+
+    requestFrame() {
+        if (this.isFrameRequested) {
+            return;
+        }
+
+        this.isFrameRequested = true;
+        requestAnimationFrame(() => this.flush());
+    }
+
+    flush() {
+        this.isFrameRequested = false;
+
+        const startTime = performance.now();
+        const fragment = document.createDocumentFragment();
+        let count = 0;
+        while (count < this.queue.length && (count === 0 || performance.now() - startTime < FRAME_BUDGET)) {
+            this.render(this.queue[count], fragment);
+            count++;
+        }
+        this.queue.splice(0, count);
+
+        this.container.appendChild(fragment);
+        if (this.queue.length) {
+            this.requestFrame();
+        }
+
+        this.onRender();
+    }
+
+    render(item, fragment) {
+        // appended text of markdown message goes to the last message
+        if (item.append && this.lastMessage && this.lastMessage.stream) {
+            this.lastMessage.stream.append(item.message);
+            return;
+        }
+
+        let type = item.type;
+        let message = item.message;
+        let messageDivClassName = `message ${type}-message`;
+
+        if (type === 'user') {
+            type = 'html';
+            message = `<pre>${message}</pre>`;
+            messageDivClassName = "message html-message user-message";
+        }
+
+        const messageDiv = document.createElement('div');
+        messageDiv.className = messageDivClassName;
+
+        const messageContent = document.createElement('div');
+        let stream = null;
+        if (type === 'markdown') {
+            stream = new MarkdownStream(messageContent, message);
+        }
+        else if (type === 'html') {
+            messageContent.innerHTML = message;
+        }
+        else {
+            messageContent.textContent = message;
+        }
+        messageDiv.appendChild(messageContent);
+
+        if (item.timestamp) {
+            const timestampDiv = document.createElement('div');
+            timestampDiv.className = 'timestamp';
+            timestampDiv.textContent = new Date(item.timestamp * 1000).toLocaleTimeString();
+            messageDiv.appendChild(timestampDiv);
+        }
+
+        fragment.appendChild(messageDiv);
+        this.observer.observe(messageDiv);
+        this.lastMessage = { element: messageDiv, stream: stream };
+    }
+
+    onVisibilityChange(entries) {
+        for (const entry of entries) {
+            const messageDiv = entry.target;
+            const content = this.detached.get(messageDiv);
+
+            if (entry.isIntersecting && content) {
+                messageDiv.appendChild(content);
+                messageDiv.style.height = '';
+                this.detached.delete(messageDiv);
+            }
+            else if (!entry.isIntersecting && !content && entry.boundingClientRect.height > 0) {
+                const detachedContent = document.createDocumentFragment();
+                messageDiv.style.height = entry.boundingClientRect.height + 'px';
+                while (messageDiv.firstChild) {
+                    detachedContent.appendChild(messageDiv.firstChild);
+                }
+                this.detached.set(messageDiv, detachedContent);
+            }
+        }
+    }
+}
 
 class SimpleChat {
     constructor() {
@@ -39,6 +233,12 @@ class SimpleChat {
 
         this.IS_LAST_MESSAGE_SUCCESS = false;
 
+        this.messageList = new MessageList(this.messagesContainer, () => {
+            if (!this.ON_USER_SCROLL_SEMAPHORE) {
+                window.scrollTo(0, document.body.scrollHeight);
+            }
+        });
+
         this.init();
     }
 
@@ -113,13 +313,7 @@ class SimpleChat {
                         command[0] = 'jide_open_diff_file';
                     }
 
-                    JIDETransport(
-                        command.join('//'),
-                        null,
-                         (errorCode, errorMessage) => {
-                            this.addMessage("Java error:" + errorMessage, 'error');
-                        }
-                    );
+                    this.openFile(command);
                 } catch (e) {
                     this.addMessage("JS error:" + e, 'error');
                 }
@@ -206,7 +400,7 @@ class SimpleChat {
             case 'heartbeat':
                 break;
             case 'markdown':
-                this.addMessage(data.message, 'markdown', data.timestamp);
+                this.addMessage(data.message, 'markdown', data.timestamp, data.append);
                 this.IS_LAST_MESSAGE_SUCCESS = true;
                 break;
             case 'html':
@@ -246,7 +440,7 @@ class SimpleChat {
         }
 
         // clear response container
-        this.messagesContainer.innerHTML = '';
+        this.messageList.clear();
 
         // Add user message to chat
         this.addMessage(message, 'user');
@@ -273,42 +467,38 @@ class SimpleChat {
         }
     }
 
-    addMessage(message, type, timestamp) {
-        let messageDivClassName = `message ${type}-message`;
-
-        if (type === 'user') {
-            type = 'html';
-            message = `<pre>${message}</pre>`;
-            messageDivClassName = "message html-message user-message";
-        }
+    addMessage(message, type, timestamp, append) {
+        // `append`: text is added to the last markdown message (streamed output)
+        this.messageList.push(message, type, timestamp, append);
+    }
 
-        const messageDiv = document.createElement('div');
-        messageDiv.className = messageDivClassName;
+    async openFile(command) {
+        // pre-edit source kept in git (`git:<hash>`) is written into a file by the server first
+        if (command.length > 2 && command[2].startsWith('git:')) {
+            try {
+                const response = await fetch(APP_HOST + '/source?session_id=' + SESSION_ID + '&object=' + command[2]);
+                const result = await response.json();
 
-        const messageContent = document.createElement('div');
-        if (type === 'markdown') {
-            messageContent.innerHTML = marked.parse(message);
-        }
-        else if (type === 'html') {
-            messageContent.innerHTML = message;
-        }
-        else {
-            messageContent.textContent = message;
-        }
-        messageDiv.appendChild(messageContent);
+                if (result.status !== 'success') {
+                    this.addMessage(`Error: ${result.message}`, 'error');
+                    return;
+                }
 
-        if (timestamp) {
-            const timestampDiv = document.createElement('div');
-            timestampDiv.className = 'timestamp';
-            timestampDiv.textContent = new Date(timestamp * 1000).toLocaleTimeString();
-            messageDiv.appendChild(timestampDiv);
+                // the same encoding as of paths in links
+                command[2] = result.path.replace(/[ "<>`]/g, encodeURIComponent);
+            } catch (error) {
+                this.addMessage('Error: Failed to load source, [' + error.message + ']', 'error');
+                return;
+            }
         }
 
-        this.messagesContainer.appendChild(messageDiv);
-
-        if (!this.ON_USER_SCROLL_SEMAPHORE) {
-            window.scrollTo(0, document.body.scrollHeight);
-        }
+        JIDETransport(
+            command.join('//'),
+            null,
+            (errorCode, errorMessage) => {
+                this.addMessage("Java error:" + errorMessage, 'error');
+            }
+        );
     }
 
     updateStatus(message, className) {
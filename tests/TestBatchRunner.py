@@ -0,0 +1,130 @@
+import unittest
+import os
+import json
+import time
+import tempfile
+import shutil
+import threading
+from unittest import mock
+
+from cancellation import CancellationToken
+from batch_runner import BatchRunner, load_jobs, summarize, _percentile
+
+
+class _FakeBatchRunner(BatchRunner):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.running = {}
+        self.max_running = 0
+        self.is_overlapped = False
+        self._state_lock = threading.Lock()
+
+    def _run_job(self, job, cancel_token):
+        with self._state_lock:
+            if self.running.get(job['project_base_path']):
+                self.is_overlapped = True
+            self.running[job['project_base_path']] = True
+            self.max_running = max(self.max_running, sum(self.running.values()))
+
+        time.sleep(0.05)
+
+        with self._state_lock:
+            self.running[job['project_base_path']] = False
+
+        return {'id': job['id'], 'project_base_path': job['project_base_path'], 'status': 'completed', 'seconds': 0.05}
+
+
+class TestBatchRunner(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_batch_runner_')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_load_jobs(self):
+        jobs_path = os.path.join(self.test_dir, 'jobs.jsonl')
+        with open(jobs_path, 'w', encoding='utf8') as f:
+            f.write(json.dumps({'project_base_path': self.test_dir, 'instruction': 'task 1'}) + "\n\n")
+            f.write(json.dumps({'project_base_path': self.test_dir, 'instruction': 'task 2', 'id': 'custom'}) + "\n")
+
+        jobs = load_jobs(jobs_path)
+        self.assertEqual(['00001', 'custom'], [job['id'] for job in jobs])
+
+    def test_load_jobs_bad_id(self):
+        jobs_path = os.path.join(self.test_dir, 'jobs.jsonl')
+        for ids in [['../escape'], ['a/b'], ['..'], ['.hidden'], ['same', 'same']]:
+            with open(jobs_path, 'w', encoding='utf8') as f:
+                for job_id in ids:
+                    f.write(json.dumps({'project_base_path': self.test_dir, 'instruction': 'task', 'id': job_id}) + "\n")
+
+            with self.assertRaises(AssertionError):
+                load_jobs(jobs_path)
+
+    def test_project_exclusivity(self):
+        jobs = [
+            {'id': str(i), 'project_base_path': f'/project_{i % 2}', 'instruction': 'task'}
+            for i in range(6)
+        ]
+        runner = _FakeBatchRunner(jobs, self.test_dir, workers=4)
+        results = runner.run()
+
+        self.assertEqual(sorted(job['id'] for job in jobs), sorted(result['id'] for result in results))
+        self.assertFalse(runner.is_overlapped)
+        self.assertEqual(2, runner.max_running)
+
+    def test_summarize(self):
+        results = [
+            {'status': 'completed', 'seconds': 1.0},
+            {'status': 'completed', 'seconds': 3.0},
+            {'status': 'failed', 'seconds': 2.0},
+            {'status': 'completed_with_errors', 'seconds': 2.0},
+            {'status': 'skipped'},
+        ]
+        summary = summarize(results, 10.0)
+
+        self.assertEqual({'completed': 2, 'failed': 1, 'completed_with_errors': 1, 'skipped': 1}, summary['statuses'])
+        self.assertEqual(720.0, summary['throughput_per_hour'])
+        self.assertEqual(2.0, summary['latency_seconds']['p50'])
+        self.assertEqual(3.0, summary['latency_seconds']['max'])
+
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 11)]
+        self.assertEqual(1.0, _percentile(values, 0))
+        self.assertEqual(1.0, _percentile(values, 10))
+        self.assertEqual(5.0, _percentile(values, 50))
+        self.assertEqual(9.0, _percentile(values, 90))
+        self.assertEqual(10.0, _percentile(values, 99))
+        self.assertEqual(10.0, _percentile(values, 100))
+        self.assertEqual(7.0, _percentile([7.0], 50))
+
+    def test_job_with_error_events(self):
+        runner = BatchRunner([], self.test_dir)
+        job = {'id': 'job', 'project_base_path': self.test_dir, 'instruction': 'task'}
+        with mock.patch('batch_runner.Copilot') as copilot:
+            copilot.return_value.run.return_value = iter([{'type': 'info', 'message': 'start'}, {'type': 'error', 'message': 'MAX_STEP exceed!'}])
+            copilot.return_value.task_id = 'task'
+            result = runner._run_job(job, CancellationToken())
+
+        self.assertEqual('completed_with_errors', result['status'])
+        self.assertEqual(1, result['errors'])
+
+    def test_job_events_file_error(self):
+        # the events file can not be created: the job fails, the run goes on
+        jobs = [
+            {'id': 'missing_dir/job', 'project_base_path': '/project_1', 'instruction': 'task'},
+            {'id': 'job', 'project_base_path': '/project_2', 'instruction': 'task'},
+        ]
+        runner = BatchRunner(jobs, self.test_dir, workers=1)
+        with mock.patch('batch_runner.Copilot') as copilot:
+            copilot.return_value.run.return_value = iter([{'type': 'info', 'message': 'start'}])
+            copilot.return_value.task_id = 'task'
+            results = runner.run()
+
+        self.assertEqual(['failed', 'completed'], [result['status'] for result in results])
+        self.assertIsNone(results[0]['task_id'])
+        self.assertIn('missing_dir', results[0]['error'])
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'job.jsonl')))
+
+
+if __name__ == '__main__':
+    unittest.main()
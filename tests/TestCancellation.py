@@ -0,0 +1,47 @@
+import unittest
+import threading
+import time
+
+from cancellation import CancellationToken, TaskCancelledError, run_cancellable
+
+
+class TestCancellation(unittest.TestCase):
+    def test_without_token(self):
+        self.assertEqual(42, run_cancellable(lambda: 42, None))
+
+    def test_result(self):
+        token = CancellationToken()
+        self.assertEqual(42, run_cancellable(lambda: 42, token))
+
+    def test_error(self):
+        def _fail():
+            raise ValueError('fail')
+
+        with self.assertRaises(ValueError):
+            run_cancellable(_fail, CancellationToken())
+
+    def test_cancel_in_flight(self):
+        token = CancellationToken()
+        aborted = []
+        threading.Timer(0.2, token.cancel).start()
+
+        start_time = time.time()
+        with self.assertRaises(TaskCancelledError):
+            run_cancellable(lambda: time.sleep(5), token, lambda: aborted.append(True))
+
+        self.assertLess(time.time() - start_time, 0.5)
+        self.assertEqual([True], aborted)
+
+    def test_cancelled_before_start(self):
+        token = CancellationToken()
+        token.cancel()
+
+        called = []
+        with self.assertRaises(TaskCancelledError):
+            run_cancellable(lambda: called.append(True), token)
+
+        self.assertEqual([], called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import os
+import shutil
+import subprocess
+import tempfile
+
+from change_tracker import ChangeTracker, materialize_source, git_blob_hash
+from conversation import agent_result_of_all_active_tpl
+
+
+@unittest.skipIf(shutil.which('git') is None, 'git is not installed')
+class TestChangeTracker(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_change_tracker_')
+        self.project_root = os.path.join(self.test_dir, 'project')
+        self.storage_path = os.path.join(self.test_dir, 'storage')
+        os.makedirs(os.path.join(self.project_root, 'src'))
+
+        self.write('src/tracked.py', 'x = 1\n')
+        self.write('src/staged.py', 'y = 1\n')
+        self.git('init', '-q')
+        self.git('add', 'src/tracked.py')
+        self.git('-c', 'user.name=test', '-c', 'user.email=test@test', 'commit', '-q', '-m', 'init')
+        self.write('src/staged.py', 'y = 2\n')
+        self.git('add', 'src/staged.py')
+        self.write('src/untracked.py', 'z = 1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, path: str, content: str):
+        with open(os.path.join(self.project_root, path), 'w', encoding='utf8') as f:
+            f.write(content)
+
+    def git(self, *args):
+        subprocess.run(['git', *args], cwd=self.project_root, check=True, capture_output=True)
+
+    def test_sources(self):
+        tracker = ChangeTracker(self.project_root, self.storage_path)
+
+        self.assertEqual('git:' + git_blob_hash(b'x = 1\n'), tracker.source('src/tracked.py', 'x = 1\n'))
+        self.assertEqual('git:' + git_blob_hash(b'y = 2\n'), tracker.source('src/staged.py', 'y = 2\n'))
+        self.assertFalse(os.path.exists(self.storage_path))
+
+        # changed in the working tree and untracked files are copied
+        modified = tracker.source('src/untracked.py', 'z = 1\n')
+        self.assertTrue(os.path.isfile(modified))
+        self.assertEqual(modified, tracker.source('src/untracked.py', 'z = 2\n'))
+        self.assertTrue(os.path.isfile(ChangeTracker(self.project_root, self.storage_path).source('src/tracked.py', 'x = 3\n')))
+
+    def test_materialize(self):
+        source = ChangeTracker(self.project_root, self.storage_path).source('src/tracked.py', 'x = 1\n')
+        path = materialize_source(self.project_root, self.storage_path, source)
+        with open(path, encoding='utf8') as f:
+            self.assertEqual('x = 1\n', f.read())
+
+        self.assertIsNone(materialize_source(self.project_root, self.storage_path, 'git:' + '0' * 40))
+        self.assertIsNone(materialize_source(self.project_root, self.storage_path, 'git:../../etc/passwd'))
+
+    def test_not_repository(self):
+        shutil.rmtree(os.path.join(self.project_root, '.git'))
+        source = ChangeTracker(self.project_root, self.storage_path).source('src/tracked.py', 'x = 1\n')
+        self.assertTrue(os.path.isfile(source))
+
+
+class TestProcessedFiles(unittest.TestCase):
+    def test_dedupe(self):
+        def change(name):
+            return {'type': 'files', 'message': {'result': {'tool_name': 'write_diff', 'file_edit': True, 'file_name': name, 'file_path': '/p/' + name, 'source_file_path': 'git:' + name}}}
+
+        message = agent_result_of_all_active_tpl([change('b.py'), change('a.py'), change('b.py')])
+        self.assertEqual(2, message['message'].count('<li>'))
+        self.assertLess(message['message'].index('b.py'), message['message'].index('a.py'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import os
+import sys
+import subprocess
+
+from config import Config, ConfigError
+
+
+class TestConfig(unittest.TestCase):
+    def test_values(self):
+        config = Config({'MAX_ITERATION': '7', 'MAX_PROMPT_OUTPUT': '', 'DEBUG': '1', 'MODEL_ROUTING': 'report, supervisor,'})
+        self.assertEqual(7, config.required('max_iteration'))
+        self.assertIsNone(config.max_prompt_output)
+        self.assertTrue(config.debug)
+        self.assertEqual(['report', 'supervisor'], config.model_routing)
+        self.assertEqual(5000, config.http_port)
+        self.assertEqual('mcp', config.agent_file_tools)
+
+    def test_required(self):
+        with self.assertRaises(ConfigError):
+            Config({}).required('openai_api_timeout')
+
+    def test_thinking_frequency(self):
+        self.assertEqual(1, Config({}).thinking_frequency)
+        self.assertEqual(3, Config({'THINKING_FREQUENCY': '3'}).thinking_frequency)
+        self.assertEqual('error', Config({'THINKING_FREQUENCY': 'error'}).thinking_frequency)
+
+        for value in ['errors', '0', '-1', '1.5']:
+            with self.assertRaises(ConfigError):
+                Config({'THINKING_FREQUENCY': value})
+
+    def test_lazy_imports(self):
+        root_path = os.path.join(os.path.dirname(__file__), '..')
+        output = subprocess.run(
+            [sys.executable, '-c', "import sys, llm_api_server; print([m for m in ('openai', 'mcp') if m in sys.modules])"],
+            cwd=root_path, env=dict(os.environ, OPENAI_API_TIMEOUT='60', MAX_ITERATION='20', TRACE_FILE=''), capture_output=True, text=True, check=True,
+        ).stdout
+
+        self.assertEqual('[]', output.strip().split("\n")[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
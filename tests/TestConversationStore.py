@@ -0,0 +1,54 @@
+import unittest
+import json
+from types import SimpleNamespace
+
+from conversation_store import Conversation, ContentPool, ToolCallRecord
+
+
+class TestConversationStore(unittest.TestCase):
+    def test_append(self):
+        sdk_tool_call = SimpleNamespace(id='c1', function=SimpleNamespace(name='read_file', arguments='{"path": "a.py"}'))
+
+        conversation = Conversation()
+        conversation.append({'role': 'user', 'content': 'do it'})
+        conversation.append({'role': 'assistant', 'content': '', 'tool_calls': [sdk_tool_call]})
+        conversation.append({'role': 'tool', 'tool_call_id': 'c1', 'name': 'read_file', 'content': 'x = 1'})
+
+        self.assertEqual(3, len(conversation))
+        self.assertIs(conversation[1], conversation[1])
+        self.assertEqual('read_file', conversation.records()[1].tool_calls[0].function.name)
+
+        provider = conversation.to_provider()
+        self.assertEqual({'role': 'tool', 'content': 'x = 1', 'tool_call_id': 'c1', 'name': 'read_file'}, provider[2])
+        self.assertEqual(provider, json.loads(json.dumps(provider)))
+
+        restored = Conversation.from_messages(provider)
+        self.assertEqual(provider, restored.to_provider())
+
+    def test_shared_content(self):
+        pool = ContentPool()
+        content = 'x' * 1000
+
+        first, second = Conversation(pool), Conversation(pool)
+        first.append({'role': 'tool', 'content': ''.join(['x' * 500, 'x' * 500])})
+        second.append({'role': 'tool', 'content': content})
+
+        self.assertIs(first.records()[0].content, second.records()[0].content)
+        self.assertEqual(1000, pool.size())
+
+    def test_view(self):
+        conversation = Conversation.from_messages([{'role': 'user', 'content': str(i)} for i in range(10)])
+        view = conversation.view(5).filter(lambda record: int(record.content) % 2 == 0)
+        conversation.append({'role': 'user', 'content': '10'})
+
+        self.assertEqual(['6', '8'], [m['content'] for m in view.to_provider()])
+        self.assertEqual(11, len(conversation.view()))
+
+    def test_tool_call_record(self):
+        record = ToolCallRecord.create({'id': 'c1', 'type': 'function', 'function': {'name': 'exit', 'arguments': None}})
+        self.assertEqual('', record.arguments)
+        self.assertIs(record, ToolCallRecord.create(record))
+
+
+if __name__ == '__main__':
+    unittest.main()
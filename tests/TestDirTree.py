@@ -0,0 +1,107 @@
+import unittest
+import os
+import tempfile
+import shutil
+
+from agents import _bind_tool_arguments
+from command_interpreter import CommandInterpreter
+from prompts.analytic_tools import tools as analytic_tools
+from dir_tree import DirectoryCache, IgnoreRules, DIR_CACHE_REQUESTS
+
+
+class TestDirTree(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_dir_tree_')
+        for path in ['src/app/models/user.py', 'src/app/main.py', 'src/util.py', 'README.md', 'node_modules/lib/index.js', 'build/out.bin', 'docs/build/index.md']:
+            os.makedirs(os.path.dirname(os.path.join(self.test_dir, path)), exist_ok=True)
+            with open(os.path.join(self.test_dir, path), 'w') as f:
+                f.write('x')
+        with open(os.path.join(self.test_dir, '.gitignore'), 'w') as f:
+            f.write("# build output\n/build/\n*.bin\n")
+
+        self.interpreter = CommandInterpreter('', self.test_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_tree(self):
+        result = self.interpreter.execute('list_tree', ['.', 3])
+        self.assertEqual("\n".join([
+            'docs/',
+            '  build/',
+            '    index.md',
+            'src/',
+            '  app/',
+            '    models/',
+            '    main.py',
+            '  util.py',
+            '.gitignore',
+            'README.md',
+        ]), result['result'])
+
+        result = self.interpreter.execute('list_tree', ['src/', 1])
+        self.assertEqual("app/\nutil.py", result['result'])
+
+    def test_max_entries(self):
+        result = self.interpreter.execute('list_tree', ['.', 5, 3])
+        self.assertEqual("docs/\n  build/\n    index.md\n... 3 more entries are not shown, list subdirectories separately", result['result'])
+
+    def test_named_arguments(self):
+        def list_tree(arguments: dict) -> dict:
+            return self.interpreter.execute('list_tree', _bind_tool_arguments(arguments, analytic_tools, 'list_tree'))
+
+        self.assertEqual(['.', None, 3], _bind_tool_arguments({'path': '.', 'max_entries': 3}, analytic_tools, 'list_tree'))
+        self.assertEqual(
+            "docs/\n  build/\n    index.md\n... 3 more entries are not shown, list subdirectories separately",
+            list_tree({'path': '.', 'max_entries': 3})['result']
+        )
+        self.assertEqual("app/\nutil.py", list_tree({'depth': 1, 'path': 'src/'})['result'])
+        self.assertEqual("app/\nutil.py", list_tree({'max_entries': 10, 'depth': 1, 'path': 'src/'})['result'])
+        self.assertIn('    user.py', list_tree({'path': 'src'})['result'])
+        self.assertTrue(list_tree({'depth': 1})['error'])
+
+        # unknown keys fill missing parameters: misnamed `path` still works
+        self.assertEqual(['README.md'], _bind_tool_arguments({'file_path': 'README.md'}, analytic_tools, 'read_file'))
+
+    def test_errors(self):
+        self.assertTrue(self.interpreter.execute('list_tree', ['../']).get('error'))
+        self.assertTrue(self.interpreter.execute('list_tree', ['README.md']).get('error'))
+        self.assertTrue(self.interpreter.execute('list_tree', ['.', 'deep']).get('error'))
+
+    def test_cache(self):
+        cache = DirectoryCache()
+        path = os.path.join(self.test_dir, 'src')
+
+        def misses():
+            return DIR_CACHE_REQUESTS.collect().get((('result', 'miss'),), 0)
+
+        before = misses()
+        self.assertEqual([('app', True, False), ('util.py', False, False)], cache.entries(path))
+        cache.entries(path)
+        self.assertEqual(before + 1, misses())
+
+        os.mkdir(os.path.join(path, 'lib'))
+        os.utime(path, ns=(0, 10 ** 18))
+        self.assertEqual(['app', 'lib', 'util.py'], [name for name, _, _ in cache.entries(path)])
+
+    def test_list_in_directory(self):
+        cwd = os.getcwd()
+        os.chdir(tempfile.gettempdir())
+        try:
+            result = self.interpreter.execute('list_in_directory', ['src'])
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual("- app/\n- util.py", result['result'])
+
+    def test_ignore_rules(self):
+        rules = IgnoreRules(['/build/', 'docs/*.md', '!keep', '*.pyc'])
+        self.assertTrue(rules.match('build', 'build', True))
+        self.assertFalse(rules.match('build', 'build', False))
+        self.assertFalse(rules.match('src/build', 'build', True))
+        self.assertTrue(rules.match('docs/a.md', 'a.md', False))
+        self.assertTrue(rules.match('src/a.pyc', 'a.pyc', False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import os
+import tempfile
+import shutil
+
+from file_cache import FileKnowledgeCache
+from command_interpreter import CommandInterpreter
+
+
+class TestFileCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_file_cache_')
+        self.file_path = os.path.join(self.test_dir, 'a.py')
+        with open(self.file_path, 'w', encoding='utf8') as f:
+            f.write('x = 1')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_put_get(self):
+        cache = FileKnowledgeCache(self.test_dir)
+        self.assertIsNone(cache.get('a.py'))
+
+        cache.put('./a.py', 'x = 1', lines=1)
+        self.assertEqual('x = 1', cache.get('a.py'))
+        self.assertEqual({'lines': 1}, cache.get_facts('a.py'))
+
+        cache.invalidate('a.py')
+        self.assertIsNone(cache.get('a.py'))
+
+    def test_version_changed(self):
+        cache = FileKnowledgeCache(self.test_dir)
+        cache.put('a.py', 'x = 1')
+
+        with open(self.file_path, 'w', encoding='utf8') as f:
+            f.write('x = 100')
+
+        self.assertIsNone(cache.get('a.py'))
+        self.assertEqual([], cache.loaded_files())
+
+    def test_stale_read(self):
+        cache = FileKnowledgeCache(self.test_dir)
+
+        stamp = cache.read_stamp('a.py')
+        with open(self.file_path, 'w', encoding='utf8') as f:
+            f.write('x = 100')
+        self.assertFalse(cache.put('a.py', 'x = 1', stamp))
+        self.assertIsNone(cache.get('a.py'))
+
+        # invalidated by a write with the same (mtime, size)
+        stamp = cache.read_stamp('a.py')
+        cache.invalidate('a.py')
+        self.assertFalse(cache.put('a.py', 'x = 100', stamp))
+        self.assertIsNone(cache.get('a.py'))
+
+        self.assertTrue(cache.put('a.py', 'x = 100', cache.read_stamp('a.py')))
+        self.assertEqual('x = 100', cache.get('a.py'))
+
+    def test_interpreter_shared_cache(self):
+        cache = FileKnowledgeCache(self.test_dir)
+        reader = CommandInterpreter('', self.test_dir, file_cache=cache)
+        writer = CommandInterpreter('', self.test_dir, file_cache=cache)
+
+        self.assertEqual('x = 1', reader.execute('read_file', ['a.py'])['result'])
+        self.assertEqual('x = 1', cache.get('a.py'))
+
+        writer.execute('replace_code_in_file', ['a.py', 'x = 1', 'x = 2'])
+        self.assertIsNone(cache.get('a.py'))
+        self.assertEqual('x = 2', reader.execute('read_file', ['a.py'])['result'])
+
+
+if __name__ == '__main__':
+    unittest.main()
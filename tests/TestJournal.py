@@ -0,0 +1,171 @@
+import unittest
+import os
+import tempfile
+import shutil
+from unittest import mock
+
+from journal import TaskJournal
+from algorythm import Copilot
+from command_interpreter import CommandInterpreter
+from tests.scripted_llm import tool_call, CopilotTestCase
+
+
+class _Function:
+    def __init__(self, name, arguments):
+        self.name = name
+        self.arguments = arguments
+
+
+class _ToolCall:
+    def __init__(self, id, name, arguments):
+        self.id = id
+        self.function = _Function(name, arguments)
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_journal_')
+        self.path = os.path.join(self.test_dir, 'task.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_checkpoint_and_load(self):
+        journal = TaskJournal(self.path)
+        journal.start('task1', '/project', 'do it')
+
+        conversation = [{'role': 'system', 'content': 'system'}, {'role': 'user', 'content': 'do it'}]
+        journal.checkpoint('SUPERVISOR', 1, conversation)
+
+        tool_call = _ToolCall('c1', 'read_file', '{"path": "a.py"}')
+        journal.llm_output('SUPERVISOR', 1, {'_output': '', '_tool_calls': [tool_call]})
+
+        state = TaskJournal.load(self.path)
+        scope = state['scopes']['SUPERVISOR']
+        self.assertEqual('do it', state['task']['instruction'])
+        self.assertFalse(state['finished'])
+        self.assertEqual(2, len(scope['conversation']))
+        self.assertEqual('read_file', scope['pending']['_tool_calls'][0].function.name)
+
+        conversation.append({'role': 'assistant', 'content': '', 'tool_calls': [tool_call]})
+        conversation.append({'role': 'tool', 'tool_call_id': 'c1', 'name': 'read_file', 'content': 'x = 1'})
+        journal.checkpoint('SUPERVISOR', 2, conversation)
+        journal.finish()
+
+        state = TaskJournal.load(self.path)
+        scope = state['scopes']['SUPERVISOR']
+        self.assertTrue(state['finished'])
+        self.assertIsNone(scope['pending'])
+        self.assertEqual(2, scope['step'])
+        self.assertEqual(4, len(scope['conversation']))
+        self.assertEqual('c1', scope['conversation'][2]['tool_calls'][0].id)
+
+    def test_rewritten_conversation(self):
+        journal = TaskJournal(self.path)
+        conversation = [{'role': 'user', 'content': '1'}, {'role': 'tool', 'content': 'real'}]
+        journal.checkpoint('CODER:1', 1, conversation)
+
+        conversation = conversation[:1] + [{'role': 'tool', 'content': 'filtered'}]
+        journal.checkpoint('CODER:1', 2, conversation)
+
+        state = TaskJournal.load(self.path)
+        self.assertEqual(['1', 'filtered'], [m['content'] for m in state['scopes']['CODER:1']['conversation']])
+
+    def test_torn_write(self):
+        journal = TaskJournal(self.path)
+        journal.start('task1', '/project', 'do it')
+        journal.checkpoint('SUPERVISOR', 1, [{'role': 'user', 'content': 'do it'}])
+        with open(self.path, 'a', encoding='utf8') as f:
+            f.write('{"kind": "messa')
+
+        state = TaskJournal.load(self.path)
+        self.assertEqual(1, len(state['scopes']['SUPERVISOR']['conversation']))
+
+
+class TestResume(CopilotTestCase):
+    def setUp(self):
+        super().setUp()
+        self.executed = []
+        self.fail_execute = False
+        execute = CommandInterpreter.execute
+
+        def _execute(interpreter, name, args):
+            if self.fail_execute:
+                raise RuntimeError('process killed')
+
+            self.executed.append(name)
+            return execute(interpreter, name, args)
+
+        patch = mock.patch.object(CommandInterpreter, 'execute', _execute)
+        patch.start()
+        self.patches.append(patch)
+
+    def _interrupt(self, script: dict):
+        self._scripted(script)
+        with self.assertRaises(RuntimeError):
+            for _ in Copilot('change x', {'project_base_path': self.project_dir}).run():
+                pass
+
+        self.executed = []
+        self.fail_execute = False
+        self.patches.pop().stop()
+        self.patches.pop().stop()
+
+    def _resume(self, script: dict):
+        journal_path = TaskJournal.find_unfinished(self.project_dir)
+        self.assertIsNotNone(journal_path)
+
+        llm = self._scripted(script)
+        events = [event for event in Copilot.resume(journal_path, {'project_base_path': self.project_dir}).run() if event['type'] != 'nope']
+
+        self.assertTrue(TaskJournal.load(journal_path)['finished'])
+        self.assertIsNone(TaskJournal.find_unfinished(self.project_dir))
+        return llm, events
+
+    def test_completed_agent(self):
+        self._interrupt({
+            'SUPERVISOR': [tool_call('call_agent', {'agent_name': 'ANALYTIC', 'instruction': 'study a.py'}), RuntimeError('connection lost')],
+            'ANALYTIC': [tool_call('read_file', {'path': 'a.py'}), tool_call('report', {'text': 'report of a'}, 'call_2')],
+        })
+
+        # the agent reported before the interruption: only the supervisor goes on
+        llm, events = self._resume({'SUPERVISOR': [tool_call('exit', {}, 'call_3')]})
+        self.assertEqual(['SUPERVISOR'], [call['role'] for call in llm.calls])
+        self.assertEqual([], self.executed)
+        self.assertEqual('report of a', llm.calls[0]['messages'][-1]['content'])
+
+    def test_interrupted_agent(self):
+        self._interrupt({
+            'SUPERVISOR': [tool_call('call_agent', {'agent_name': 'ANALYTIC', 'instruction': 'study a.py'})],
+            'ANALYTIC': [tool_call('read_file', {'path': 'a.py'}), RuntimeError('connection lost')],
+        })
+
+        # the agent goes on from its second step: the file read is not repeated
+        llm, events = self._resume({
+            'SUPERVISOR': [tool_call('exit', {}, 'call_3')],
+            'ANALYTIC': [tool_call('report', {'text': 'report of a'}, 'call_2')],
+        })
+        self.assertEqual(['ANALYTIC', 'SUPERVISOR'], [call['role'] for call in llm.calls])
+        self.assertEqual([], self.executed)
+        self.assertIn('x = 1', llm.calls[0]['messages'][-1]['content'])
+        self.assertEqual('report of a', llm.calls[1]['messages'][-1]['content'])
+
+    def test_pending_tool_call(self):
+        self.fail_execute = True
+        self._interrupt({
+            'SUPERVISOR': [tool_call('call_agent', {'agent_name': 'ANALYTIC', 'instruction': 'study a.py'})],
+            'ANALYTIC': [tool_call('read_file', {'path': 'a.py'})],
+        })
+
+        # LLM answered before the interruption: its tool call is executed without a new LLM call
+        llm, events = self._resume({
+            'SUPERVISOR': [tool_call('exit', {}, 'call_3')],
+            'ANALYTIC': [tool_call('report', {'text': 'report of a'}, 'call_2')],
+        })
+        self.assertEqual(['read_file'], self.executed)
+        self.assertEqual(['ANALYTIC', 'SUPERVISOR'], [call['role'] for call in llm.calls])
+        self.assertIn('x = 1', llm.calls[0]['messages'][-1]['content'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from llm_parser import parse_tags
+from llm_parser import parse_tags, TagParser
 
 class TestLLMParser(unittest.TestCase):
     def test_1(self):
@@ -31,5 +31,23 @@ class TestLLMParser(unittest.TestCase):
         args = parse_tags(command['COMMAND'][0], ['ARG'], True)
         self.assertEqual(2, len(args['ARG']))
 
+    def test_attr_fallback(self):
+        output = '<ARG name="a">1</ARG> <RESULT>x</RESULT> <RESULT>y</RESULT> <ARG>2</ARG>'
+        self.assertEqual({'ARG': ['2'], 'RESULT': ['x', 'y']}, parse_tags(output, ['ARG', 'RESULT', 'MISSING']))
+        self.assertEqual({'ARG': ['1']}, parse_tags('<ARG name="a">1</ARG>', ['ARG']))
+
+    def test_incremental(self):
+        output = '<work_plan>- [ ] read</work_plan> text <RESULT>{"a": 1}</RESULT>'
+        parser = TagParser(['work_plan', 'RESULT'])
+
+        # tag is emitted by the chunk with the last char of its closing tag
+        closed = []
+        for i in range(0, len(output), 3):
+            for tag, body in parser.feed(output[i:i + 3]):
+                closed.append((i, tag, body))
+
+        self.assertEqual([(30, 'work_plan', '- [ ] read'), (63, 'RESULT', '{"a": 1}')], closed)
+        self.assertEqual(parse_tags(output, ['work_plan', 'RESULT']), parser.result())
+
 if __name__ == "__main__":
   unittest.main()
\ No newline at end of file
@@ -0,0 +1,88 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+
+from log_writer import LogWriter, log_record, LOG_WRITE_ERRORS
+
+
+class TestLogWriter(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_log_writer_')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _read(self, path: str) -> list[dict]:
+        with open(path, 'r', encoding='utf8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_write(self):
+        writer = LogWriter()
+        path_task1 = os.path.join(self.test_dir, 'session', 'task1.jsonl')
+        path_task2 = os.path.join(self.test_dir, 'session', 'task2.jsonl')
+
+        for i in range(10):
+            writer.write(path_task1, log_record('CODER', {'event': 'tool_call', 'step': i}))
+        writer.write(path_task2, log_record('SUPERVISOR', 'RUN'))
+        self.assertTrue(writer.flush(5))
+
+        records = self._read(path_task1)
+        self.assertEqual(list(range(10)), [r['step'] for r in records])
+        self.assertEqual('CODER', records[0]['role'])
+        self.assertEqual('RUN', self._read(path_task2)[0]['message'])
+
+    def test_rotation(self):
+        writer = LogWriter(max_bytes=200, backup_count=2)
+        path = os.path.join(self.test_dir, 'task.jsonl')
+
+        for i in range(20):
+            writer.write(path, log_record('CODER', {'data': 'x' * 100, 'step': i}))
+            writer.flush(5)
+
+        self.assertTrue(os.path.exists(path + '.1'))
+        self.assertTrue(os.path.exists(path + '.2'))
+        self.assertFalse(os.path.exists(path + '.3'))
+        self.assertEqual(19, self._read(path + '.1')[-1]['step'])
+
+    def test_queue_full(self):
+        writer = LogWriter(queue_size=1)
+        writer._ensure_started = lambda: None
+        path = os.path.join(self.test_dir, 'task.jsonl')
+
+        self.assertTrue(writer.write(path, log_record('CODER', 'first')))
+        self.assertFalse(writer.write(path, log_record('CODER', 'second')))
+
+    def test_write_error(self):
+        writer = LogWriter()
+        with open(os.path.join(self.test_dir, 'file'), 'w', encoding='utf8') as f:
+            f.write('not a directory')
+        broken_path = os.path.join(self.test_dir, 'file', 'task.jsonl')
+        path = os.path.join(self.test_dir, 'task.jsonl')
+        errors = LOG_WRITE_ERRORS.collect().get((('reason', 'io'),), 0)
+
+        writer.write(broken_path, log_record('CODER', 'lost'))
+        writer.write(path, log_record('CODER', 'written'))
+        self.assertTrue(writer.flush(5))
+
+        self.assertEqual('written', self._read(path)[0]['message'])
+        self.assertEqual(errors + 1, LOG_WRITE_ERRORS.collect()[(('reason', 'io'),)])
+
+    def test_unserializable_record(self):
+        writer = LogWriter()
+        path = os.path.join(self.test_dir, 'task.jsonl')
+
+        writer.write(path, {('tool', 1): 'x'})
+        writer.write(path, log_record('CODER', 'next'))
+        self.assertTrue(writer.flush(2))
+        self.assertTrue(writer._thread.is_alive())
+
+        records = self._read(path)
+        self.assertIn('unserializable record', records[0]['log_error'])
+        self.assertEqual("{('tool', 1): 'x'}", records[0]['record'])
+        self.assertEqual('next', records[1]['message'])
+
+
+if __name__ == '__main__':
+    unittest.main()
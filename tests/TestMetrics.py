@@ -0,0 +1,67 @@
+import unittest
+import threading
+
+from metrics import MetricsRegistry, _ShardedMetric
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('test_total', 'test counter')
+
+        counter.inc(model='a')
+        counter.inc(2, model='a')
+        counter.inc(model='b')
+
+        output = registry.render()
+        self.assertIn('# TYPE test_total counter\n', output)
+        self.assertIn('test_total{model="a"} 3\n', output)
+        self.assertIn('test_total{model="b"} 1\n', output)
+
+    def test_counter_threads(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('test_total', 'test counter')
+
+        def _worker():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=_worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        counter.inc()
+        self.assertEqual({(): 8001}, counter.collect())
+
+    def test_histogram(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram('test_seconds', 'test histogram', (1, 5))
+
+        histogram.observe(0.5, opcode='read_file')
+        histogram.observe(3, opcode='read_file')
+        histogram.observe(10, opcode='read_file')
+
+        output = registry.render()
+        self.assertIn('test_seconds_bucket{opcode="read_file",le="1"} 1\n', output)
+        self.assertIn('test_seconds_bucket{opcode="read_file",le="5"} 2\n', output)
+        self.assertIn('test_seconds_bucket{opcode="read_file",le="+Inf"} 3\n', output)
+        self.assertIn('test_seconds_sum{opcode="read_file"} 13.5\n', output)
+        self.assertIn('test_seconds_count{opcode="read_file"} 3\n', output)
+
+    def test_register_twice(self):
+        registry = MetricsRegistry()
+        self.assertIs(registry.counter('test_total', ''), registry.counter('test_total', ''))
+
+    def test_incomplete_metric(self):
+        class Gauge(_ShardedMetric):
+            def _new_value(self):
+                return 0
+
+        with self.assertRaises(TypeError):
+            Gauge('test_gauge', 'metric without merge')
+
+
+if __name__ == '__main__':
+    unittest.main()
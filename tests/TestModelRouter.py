@@ -0,0 +1,53 @@
+import unittest
+from types import SimpleNamespace
+
+from model_router import ModelRouter, parse_prices
+
+
+def _tool_call(name, arguments='{}'):
+    return SimpleNamespace(function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class TestModelRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = ModelRouter('cheap', ['json_repair', 'report', 'supervisor'], parse_prices('main=3:15,cheap=1:5'))
+
+    def test_route(self):
+        self.assertEqual('cheap', self.router.route('json_repair', 'fix', 'main'))
+        self.assertIsNone(self.router.route('agent', [], 'main'))
+        self.assertIsNone(self.router.route('json_repair', 'fix', 'cheap'))
+        self.assertIsNone(ModelRouter('', ['json_repair'], {}).route('json_repair', 'fix', 'main'))
+
+        self.assertIsNone(self.router.route('supervisor', [{'role': 'user', 'content': 'task'}], 'main'))
+        self.assertEqual('cheap', self.router.route('supervisor', [{'role': 'tool', 'content': 'report'}], 'main'))
+
+    def test_validate(self):
+        self.assertTrue(self.router.validate('json_repair', {'RESULT': ['{"a": 1}'], '_output': ''}, ['RESULT']))
+        self.assertFalse(self.router.validate('json_repair', {'RESULT': ['{"a": 1'], '_output': ''}, ['RESULT']))
+        self.assertFalse(self.router.validate('json_repair', {'_output': ''}, ['RESULT']))
+        self.assertFalse(self.router.validate('json_repair', None, ['RESULT']))
+
+        self.assertTrue(self.router.validate('supervisor', {'_output': '', '_tool_calls': [_tool_call('exit')]}))
+        self.assertFalse(self.router.validate('supervisor', {'_output': '', '_tool_calls': [_tool_call('call_agent')]}))
+        self.assertFalse(self.router.validate('supervisor', {'_output': '', '_tool_calls': []}))
+
+        self.assertTrue(self.router.validate('report', {'_output': '', '_tool_calls': [_tool_call('report', '{"message": "done"}')]}))
+        self.assertFalse(self.router.validate('report', {'_output': '', '_tool_calls': [_tool_call('report', '{"message": ')]}))
+        self.assertFalse(self.router.validate('report', {'_output': '', '_tool_calls': [_tool_call('read_file')]}))
+
+    def test_stop_routing(self):
+        for _ in range(ModelRouter.MIN_SAMPLES):
+            self.router.on_escalated('report', 0.1, None)
+
+        self.assertIsNone(self.router.route('report', [], 'main'))
+        self.assertEqual({'accepted': 0, 'escalated': ModelRouter.MIN_SAMPLES}, self.router.get_stats()['report'])
+
+    def test_cost(self):
+        usage = {'prompt_tokens': 1000, 'completion_tokens': 100}
+        self.assertAlmostEqual(0.0045, self.router.cost('main', usage))
+        self.assertAlmostEqual(0.0015, self.router.cost('cheap', usage))
+        self.assertIsNone(self.router.cost('unknown', usage))
+
+
+if __name__ == '__main__':
+    unittest.main()
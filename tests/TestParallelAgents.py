@@ -0,0 +1,139 @@
+import unittest
+import threading
+
+from algorythm import Copilot
+from cancellation import CancellationToken, TaskCancelledError
+from tests.scripted_llm import tool_call, CopilotTestCase
+
+
+class TestParallelAgents(CopilotTestCase):
+    def _call_agents(self, *calls, with_exit=False):
+        tool_calls = [
+            tool_call('call_agent', {'agent_name': agent_name, 'instruction': instruction}, f'call_{n + 1}')
+            for n, (agent_name, instruction) in enumerate(calls)
+        ]
+        if with_exit:
+            tool_calls.append(tool_call('exit', {}, f'call_{len(calls) + 1}'))
+
+        return {'_tool_calls': tool_calls}
+
+    def test_group_agent_calls(self):
+        agent_calls = [(0, 'ANALYTIC', 'a'), (1, 'ANALYTIC', 'b'), (2, 'CODER', 'c'), (3, 'CODER', 'd'), (4, 'ANALYTIC', 'e'), (5, 'ANALYTIC', 'f')]
+        groups = Copilot._group_agent_calls(agent_calls)
+        self.assertEqual([[0, 1], [2], [3], [4, 5]], [[agent_call[0] for agent_call in group] for group in groups])
+        self.assertEqual([], Copilot._group_agent_calls([]))
+
+    def test_results_in_call_order(self):
+        # the first agent reports only after the second one: results still follow the order of calls
+        second_reported = threading.Event()
+
+        def _second_report(cancel_token):
+            second_reported.set()
+            return tool_call('report', {'text': 'report of b'})
+
+        llm = self._scripted({
+            'SUPERVISOR': [
+                self._call_agents(('ANALYTIC', 'study a.py'), ('ANALYTIC', 'study b.py'), with_exit=True),
+                tool_call('exit', {}),
+            ],
+            'ANALYTIC:study a.py': [lambda cancel_token: second_reported.wait(5) and tool_call('report', {'text': 'report of a'})],
+            'ANALYTIC:study b.py': [_second_report],
+        })
+
+        events = [event for event in Copilot('change x', {'project_base_path': self.project_dir}).run() if event['type'] != 'nope']
+
+        reports = [event for event in events if event['type'] == 'markdown']
+        self.assertEqual(['[ANALYTIC #2] report of b', '[ANALYTIC #1] report of a'], [event['message'] for event in reports])
+        self.assertEqual(['ANALYTIC #2', 'ANALYTIC #1'], [event['agent'] for event in reports])
+
+        # `exit` in the turn with agent calls is ignored: the supervisor reads reports and exits by the next call
+        self.assertEqual(['SUPERVISOR', 'SUPERVISOR'], [call['role'] for call in llm.calls if call['role'] == 'SUPERVISOR'])
+        tool_messages = [m for m in llm.calls[-1]['messages'] if m['role'] == 'tool']
+        self.assertEqual(['call_1', 'call_2', 'call_3'], [m['tool_call_id'] for m in tool_messages])
+        self.assertEqual(['report of a', 'report of b', 'exit ignored: read reports of agents and call exit again'], [m['content'] for m in tool_messages])
+
+    def test_agent_error_result(self):
+        llm = self._scripted({
+            'SUPERVISOR': [
+                self._call_agents(('ANALYTIC', 'study a.py'), ('ANALYTIC', 'study b.py')),
+                tool_call('exit', {}),
+            ],
+            'ANALYTIC:study a.py': [tool_call('report', {'text': 'report of a'})],
+            'ANALYTIC:study b.py': [{'_output': ''}],
+        })
+
+        events = [event for event in Copilot('change x', {'project_base_path': self.project_dir}).run() if event['type'] != 'nope']
+
+        self.assertIn('[ANALYTIC #2] Not commands (1), early stop', [event['message'] for event in events if event['type'] == 'error'])
+        tool_messages = [m for m in llm.calls[-1]['messages'] if m['role'] == 'tool']
+        self.assertEqual('report of a', tool_messages[0]['content'])
+        self.assertTrue(tool_messages[1]['content'].startswith('Agent cant complete a work'))
+
+    def test_cancel_group(self):
+        started = threading.Semaphore(0)
+        agent_tokens = []
+
+        def _wait_cancel(cancel_token):
+            agent_tokens.append(cancel_token)
+            started.release()
+            cancel_token.wait(5)
+            return TaskCancelledError("Task was cancelled")
+
+        self._scripted({
+            'SUPERVISOR': [self._call_agents(('ANALYTIC', 'study a.py'), ('ANALYTIC', 'study b.py'))],
+            'ANALYTIC': [_wait_cancel, _wait_cancel],
+        })
+
+        cancel_token = CancellationToken()
+        copilot = Copilot('change x', {'project_base_path': self.project_dir}, cancel_token)
+
+        def _cancel():
+            started.acquire(timeout=5)
+            started.acquire(timeout=5)
+            cancel_token.cancel()
+
+        canceller = threading.Thread(target=_cancel)
+        canceller.start()
+        with self.assertRaises(TaskCancelledError):
+            for _ in copilot.run():
+                pass
+        canceller.join()
+
+        # agents of the group share their own token, cancelled by the token of the task
+        self.assertEqual(2, len(agent_tokens))
+        self.assertIs(agent_tokens[0], agent_tokens[1])
+        self.assertIsNot(cancel_token, agent_tokens[0])
+        self.assertTrue(agent_tokens[0].is_cancelled)
+
+    def test_close_group(self):
+        # consumer closes the stream: running agents of the group are cancelled
+        started = threading.Semaphore(0)
+        agent_tokens = []
+
+        def _wait_cancel(cancel_token):
+            agent_tokens.append(cancel_token)
+            started.release()
+            cancel_token.wait(5)
+            return TaskCancelledError("Task was cancelled")
+
+        self._scripted({
+            'SUPERVISOR': [self._call_agents(('ANALYTIC', 'study a.py'), ('ANALYTIC', 'study b.py'))],
+            'ANALYTIC': [_wait_cancel, _wait_cancel],
+        })
+
+        cancel_token = CancellationToken()
+        run = Copilot('change x', {'project_base_path': self.project_dir}, cancel_token).run()
+        for event in run:
+            if event.get('agent'):
+                break
+
+        self.assertTrue(started.acquire(timeout=5) and started.acquire(timeout=5))
+        run.close()
+
+        self.assertTrue(agent_tokens[0].is_cancelled)
+        self.assertFalse(cancel_token.is_cancelled)
+        self.assertEqual([], cancel_token._callbacks)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import os
+import tempfile
+import shutil
+import threading
+import time
+from unittest import mock
+
+from file_cache import FileKnowledgeCache
+from prefetch import FilePrefetcher
+from command_interpreter import CommandInterpreter
+from mcp_helper import tool_call
+
+
+class TestPrefetch(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_prefetch_')
+        files = {
+            'main.py': 'from utils.helpers import run\nimport config\n',
+            'config.py': 'DEBUG = 1\n',
+            'utils/__init__.py': '',
+            'utils/helpers.py': 'def run(): pass\n',
+            'docs/readme.md': '# docs\n',
+            'web/app.js': "import { x } from './lib';\n",
+            'web/lib.js': 'export const x = 1;\n',
+        }
+        for path, content in files.items():
+            abs_path = os.path.join(self.test_dir, path)
+            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+            with open(abs_path, 'w', encoding='utf8') as f:
+                f.write(content)
+
+        self.cache = FileKnowledgeCache(self.test_dir)
+        self.prefetcher = FilePrefetcher(self.test_dir, self.cache)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_mentioned_paths(self):
+        predictions = self.prefetcher.predict('update docs/readme.md and ./config.py, not missing.py', [], [])
+        self.assertEqual(['docs/readme.md', 'config.py'], predictions)
+
+    def test_imports(self):
+        self.cache.put('main.py', 'from utils.helpers import run\nimport config\n')
+        self.cache.put('web/app.js', "import { x } from './lib';\n")
+
+        predictions = self.prefetcher.predict('', ['main.py'], [])
+        self.assertIn('utils/helpers.py', predictions)
+        self.assertIn('config.py', predictions)
+
+        self.assertEqual(['web/lib.js'], self.prefetcher.predict('', ['web/app.js'], []))
+
+    def test_siblings(self):
+        self.assertEqual(['utils/helpers.py'], self.prefetcher.predict('', [], ['utils/__init__.py']))
+
+    def test_hit_rate(self):
+        self.prefetcher._prefetch('read config.py', [], [])
+        self.assertEqual('DEBUG = 1\n', self.cache.peek('config.py'))
+
+        self.assertTrue(self.prefetcher.on_read('./config.py'))
+        self.assertFalse(self.prefetcher.on_read('main.py'))
+        self.assertEqual(0.5, self.prefetcher.get_stats()['prefetch_hit_rate'])
+
+    def test_edit_during_prefetch(self):
+        writer = CommandInterpreter('', self.test_dir, file_cache=self.cache)
+
+        def read_then_edit(*args, **kwargs):
+            content = tool_call(*args, **kwargs)
+            writer.execute('replace_code_in_file', ['config.py', 'DEBUG = 1', 'DEBUG = 0'])
+            return content
+
+        with mock.patch('prefetch.tool_call', side_effect=read_then_edit):
+            self.prefetcher._prefetch('read config.py', [], [])
+
+        self.assertIsNone(self.cache.peek('config.py'))
+        self.assertEqual('DEBUG = 0', writer.execute('read_file', ['config.py'])['result'].strip())
+
+    def test_wait(self):
+        started = threading.Event()
+
+        def slow_read(*args, **kwargs):
+            started.set()
+            time.sleep(0.1)
+            return tool_call(*args, **kwargs)
+
+        # the running prefetch is waited for
+        with mock.patch('prefetch.tool_call', side_effect=slow_read):
+            self.prefetcher.schedule('read config.py and main.py')
+            self.assertTrue(started.wait(5))
+            self.prefetcher.wait()
+
+        self.assertTrue(self.prefetcher._future.done())
+        self.assertEqual('DEBUG = 1\n', self.cache.peek('config.py'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import os
+import tempfile
+import shutil
+
+from prompt_registry import PromptRegistry
+
+
+class TestPromptRegistry(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_prompts_')
+        self.path = os.path.join(self.test_dir, 'system.txt')
+        self._write('Hello{% if params.thinking %} thinking{% endif %}')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _write(self, text: str, mtime: int = 1_000_000_000):
+        with open(self.path, 'w', encoding='utf8') as f:
+            f.write(text)
+        os.utime(self.path, ns=(mtime, mtime))
+
+    def test_render(self):
+        registry = PromptRegistry()
+        self.assertEqual('Hello thinking', registry.render(self.path, params={'thinking': True}))
+        self.assertEqual('Hello', registry.render(self.path, params={'thinking': False}))
+        self.assertIs(registry.render(self.path, params={'thinking': True}), registry.render(self.path, params={'thinking': True}))
+
+    def test_reload_on_mtime(self):
+        registry = PromptRegistry()
+        self.assertEqual('Hello', registry.render(self.path, params={}))
+
+        self._write('Bye', 2_000_000_000)
+        self.assertEqual('Bye', registry.get(self.path))
+        self.assertEqual('Bye', registry.render(self.path, params={}))
+
+    def test_render_manifest(self):
+        registry = PromptRegistry()
+        step_prompt = "{project_description}\n{project_structure}"
+
+        rendered = registry.render_manifest(step_prompt, 'project', ['a.py', 'tests/'])
+        self.assertEqual("project\n- a.py\n- tests/", rendered)
+        self.assertIs(rendered, registry.render_manifest(step_prompt, 'project', ['a.py', 'tests/']))
+
+
+if __name__ == '__main__':
+    unittest.main()
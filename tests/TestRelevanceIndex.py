@@ -0,0 +1,61 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from relevance_index import RelevanceIndex, tokenize, outline
+
+
+class TestRelevanceIndex(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_relevance_index_')
+        self.write('billing/invoice.py', "class InvoiceRenderer:\n    def render_pdf(self, invoice):\n        # totals with taxes\n        return invoice.total\n")
+        self.write('users/auth.py', "def check_password(user, password):\n    return user.password_hash == password\n")
+        self.write('users/profile.py', "class Profile:\n    def avatar_url(self):\n        return ''\n")
+        self.write('node_modules/lib/invoice.js', "function invoice() {}\n")
+        self.write('image.png', "invoice")
+        self.index = RelevanceIndex(self.test_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def write(self, path: str, content: str):
+        os.makedirs(os.path.dirname(os.path.join(self.test_dir, path)), exist_ok=True)
+        with open(os.path.join(self.test_dir, path), 'w', encoding='utf8') as f:
+            f.write(content)
+
+    def test_tokenize(self):
+        self.assertEqual(['parsetags', 'parse', 'tags', 'parse_tags', 'parse', 'tags'], tokenize('parseTags(parse_tags)'))
+        self.assertEqual(['httpserver', 'http', 'server'], tokenize('HTTPServer'))
+
+    def test_outline(self):
+        self.assertEqual('class InvoiceRenderer, def render_pdf', outline("class InvoiceRenderer:\n    def __init__(self):\n    def render_pdf(self):\n"))
+
+    def test_search(self):
+        self.assertEqual(3, self.index.refresh())
+
+        result = self.index.search('Taxes are missing in the PDF of an invoice', 2)
+        self.assertEqual('billing/invoice.py', result[0][0])
+        self.assertEqual('class InvoiceRenderer, def render_pdf', result[0][2])
+        self.assertEqual('users/auth.py', self.index.search('wrong password check', 1)[0][0])
+        self.assertEqual([], self.index.search('unknown words', 3))
+
+        prompt = self.index.prompt('invoice taxes', 3)
+        self.assertIn('- billing/invoice.py (class InvoiceRenderer, def render_pdf)', prompt)
+        self.assertEqual('', self.index.prompt('invoice taxes', 0))
+
+    def test_refresh(self):
+        self.index.refresh()
+        self.assertEqual(0, self.index.refresh())
+
+        self.write('users/profile.py', "class Profile:\n    def invoice_history(self):\n        return []\n")
+        os.utime(os.path.join(self.test_dir, 'users/profile.py'), ns=(0, 10 ** 18))
+        os.remove(os.path.join(self.test_dir, 'users/auth.py'))
+
+        self.assertEqual(1, self.index.refresh())
+        self.assertEqual([], self.index.search('password', 3))
+        self.assertEqual({'billing/invoice.py', 'users/profile.py'}, {path for path, _, _ in self.index.search('invoice', 3)})
+
+
+if __name__ == '__main__':
+    unittest.main()
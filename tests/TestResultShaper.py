@@ -0,0 +1,62 @@
+import unittest
+import os
+import re
+import tempfile
+import shutil
+
+from result_shaper import ResultShaper, parse_limits
+from command_interpreter import CommandInterpreter
+
+
+class TestResultShaper(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_result_shaper_')
+        self.content = "\n".join(f"line {i}" for i in range(1, 1001))
+        with open(os.path.join(self.test_dir, 'big.py'), 'w', encoding='utf-8') as f:
+            f.write(self.content)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_small_result(self):
+        shaper = ResultShaper({'read_file': (1000, 1000)})
+        result = {'result': 'x = 1', 'tool_name': 'read'}
+        self.assertIs(result, shaper.shape('read_file', ['a.py'], result))
+        self.assertIs(result, shaper.shape('write_file', ['a.py'], result))
+
+    def test_pages(self):
+        interpreter = CommandInterpreter('', self.test_dir)
+        interpreter.shaper = ResultShaper({'read_file': (1024, 10000)})
+
+        result = interpreter.execute('read_file', ['big.py'])
+        self.assertTrue(result['truncated'])
+        self.assertLessEqual(len(result['result'].split("\n\n[")[0].encode()), 1024)
+        self.assertIn('[lines 1-', result['result'])
+
+        pages = []
+        while True:
+            text, footer = result['result'].rsplit("\n\n[", 1)
+            pages.append(text)
+            if not result.get('truncated'):
+                self.assertIn('of 1000, end of result]', footer)
+                break
+
+            cursor = re.search(r'cursor `(\w+)`', footer).group(1)
+            result = interpreter.execute('read_more', [cursor])
+
+        self.assertEqual(self.content, ''.join(pages))
+        self.assertGreater(len(pages), 5)
+
+        self.assertTrue(interpreter.execute('read_more', ['unknown']).get('error'))
+
+    def test_long_line(self):
+        shaper = ResultShaper({'read_file': (100, 10)})
+        result = shaper.shape('read_file', ['a.py'], {'result': 'x' * 500})
+        self.assertEqual('x' * 25, result['result'].split("\n\n[")[0])
+
+    def test_parse_limits(self):
+        self.assertEqual({'read_file': (100, 20)}, parse_limits('read_file=100:20,'))
+
+
+if __name__ == '__main__':
+    unittest.main()
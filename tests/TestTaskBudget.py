@@ -0,0 +1,143 @@
+import unittest
+import os
+import threading
+from unittest import mock
+
+import task_budget
+from task_budget import TaskBudget
+from agents import Agent
+from algorythm import Copilot
+from conversation_store import Conversation
+from tests.scripted_llm import tool_call, CopilotTestCase
+
+
+class TestTaskBudget(unittest.TestCase):
+    USAGE = {'prompt_tokens': 1000, 'completion_tokens': 100}
+
+    def test_unlimited(self):
+        budget = TaskBudget()
+        for _ in range(100):
+            budget.debit('main', self.USAGE)
+
+        self.assertIsNone(budget.exhausted())
+        self.assertFalse(budget.is_low())
+        self.assertEqual('', budget.describe())
+        self.assertEqual(100000, budget.spent()['prompt_tokens'])
+
+    def test_tokens(self):
+        budget = TaskBudget(max_prompt_tokens=5000, max_completion_tokens=1000)
+        budget.debit('main', None)
+        for _ in range(3):
+            budget.debit('main', self.USAGE)
+
+        self.assertFalse(budget.is_low())
+
+        budget.debit('main', self.USAGE)
+        self.assertTrue(budget.is_low())
+        self.assertIsNone(budget.exhausted())
+        self.assertIn('prompt_tokens 4000/5000 (80%)', budget.describe())
+
+        budget.debit('main', self.USAGE)
+        self.assertEqual('prompt_tokens', budget.exhausted())
+        self.assertEqual(5, budget.spent()['calls'])
+
+    def test_cost(self):
+        prices = {'main': (3.0, 15.0)}
+        with mock.patch.object(task_budget.ROUTER, 'prices', prices):
+            budget = TaskBudget(max_cost=0.01)
+            budget.debit('main', self.USAGE)
+            budget.debit('free', self.USAGE)
+
+        self.assertAlmostEqual(0.0045, budget.spent()['cost'])
+        self.assertIsNone(budget.exhausted())
+
+        with mock.patch.object(task_budget.ROUTER, 'prices', prices):
+            budget.debit('main', self.USAGE)
+            budget.debit('main', self.USAGE)
+        self.assertEqual('cost', budget.exhausted())
+
+    def test_seconds(self):
+        budget = TaskBudget(max_seconds=10)
+        self.assertIsNone(budget.exhausted())
+
+        budget.start_time -= 9
+        self.assertTrue(budget.is_low())
+
+        budget.start_time -= 1
+        self.assertEqual('seconds', budget.exhausted())
+
+    def test_parallel_debit(self):
+        budget = TaskBudget(max_prompt_tokens=10 ** 9)
+        threads = [threading.Thread(target=lambda: [budget.debit('main', self.USAGE) for _ in range(1000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(4000, budget.spent()['calls'])
+        self.assertEqual(4000000, budget.spent()['prompt_tokens'])
+
+
+class TestBudgetEnforcement(CopilotTestCase):
+    def test_agent_stop(self):
+        llm = self._scripted({'ANALYTIC': [
+            tool_call('list_in_directory', {'path': '.'}),
+            tool_call('read_file', {'path': 'a.py'}),
+            tool_call('list_tree', {'path': '.'}),
+            tool_call('read_file', {'path': 'b.py'}),
+        ]})
+
+        agent = Agent.fabric('ANALYTIC')
+        agent.init('study', {'base_path': self.project_dir, 'description': '', 'files_structure': []}, os.path.join(self.test_dir, 'agent.jsonl'))
+        events = [event for event in agent.run(TaskBudget(max_prompt_tokens=3500)) if event['type'] != 'nope']
+
+        # warned after 3000 tokens: the next call is the report one, the budget is over after it
+        self.assertEqual(['agent', 'agent', 'agent', 'report'], [call['purpose'] for call in llm.calls])
+        warnings = [m for m in llm.calls[-1]['messages'] if 'task budget is almost spent' in str(m['content'])]
+        self.assertEqual(1, len(warnings))
+        self.assertEqual('tool', warnings[0]['role'])
+
+        self.assertEqual('report', events[-1]['type'])
+        self.assertIn('task budget is exhausted (prompt_tokens)', events[-1]['message'])
+        self.assertIn('read_file {"path": "b.py"}', events[-1]['message'])
+
+    def test_supervisor_stop(self):
+        llm = self._scripted({
+            'SUPERVISOR': [tool_call('call_agent', {'agent_name': 'ANALYTIC', 'instruction': 'study a.py'})],
+            'ANALYTIC': [tool_call('list_in_directory', {'path': '.'}), tool_call('read_file', {'path': 'a.py'})],
+        })
+
+        copilot = Copilot('change x', {'project_base_path': self.project_dir})
+        with mock.patch('task_budget.TASK_MAX_PROMPT_TOKENS', 2500):
+            events = [event for event in copilot.run() if event['type'] != 'nope']
+
+        self.assertEqual(['SUPERVISOR', 'ANALYTIC', 'ANALYTIC'], [call['role'] for call in llm.calls])
+        self.assertEqual('report', llm.calls[-1]['purpose'])
+
+        supervisor_warnings = [e for e in events if e['type'] == 'info' and 'Do not call agents' in e['message']]
+        self.assertEqual(1, len(supervisor_warnings))
+
+        self.assertEqual('error', events[-2]['type'])
+        self.assertIn('Task budget exhausted: prompt_tokens 3000/2500', events[-2]['message'])
+        self.assertEqual('markdown', events[-1]['type'])
+        self.assertIn('### ANALYTIC\nThe work is stopped', events[-1]['message'])
+
+    def test_supervisor_partial_report(self):
+        conversation = Conversation.from_messages([
+            {'role': 'user', 'content': 'task'},
+            {'role': 'assistant', 'content': '', 'tool_calls': [
+                tool_call('call_agent', '{"agent_name": "CODER", "instruction": "edit"', 'call_1'),
+                tool_call('call_agent', {'agent_name': 'ANALYTIC', 'instruction': 'study'}, 'call_2'),
+            ]},
+            {'role': 'tool', 'tool_call_id': 'call_1', 'name': 'call_agent', 'content': 'edited'},
+            {'role': 'tool', 'tool_call_id': 'call_2', 'name': 'call_agent', 'content': 'studied'},
+        ])
+
+        report = Copilot._partial_report(conversation)
+        self.assertIn('### AGENT\nedited', report)
+        self.assertIn('### ANALYTIC\nstudied', report)
+        self.assertEqual('The task is stopped before any agent reported.', Copilot._partial_report(Conversation()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import os
+from unittest import mock
+
+from agents import Agent, BaseAgent
+from tests.scripted_llm import tool_call, CopilotTestCase
+
+
+class TestThinking(CopilotTestCase):
+    def _agent(self, mode: str, frequency, thinking: bool = True) -> BaseAgent:
+        for patch in [
+            mock.patch('agents.DEEPTHINKING_AGENTS', ['ANALYTIC'] if thinking else []),
+            mock.patch('agents.THINKING_MODE', mode),
+            mock.patch('agents.THINKING_FREQUENCY', frequency),
+        ]:
+            patch.start()
+            self.patches.append(patch)
+
+        agent = Agent.fabric('ANALYTIC')
+        agent.init('study', {'base_path': self.project_dir, 'description': '', 'files_structure': []}, os.path.join(self.test_dir, 'agent.jsonl'))
+        return agent
+
+    @staticmethod
+    def _plan_requests(call: dict) -> int:
+        return sum(1 for m in call['messages'] if m['content'] == BaseAgent.PLAN_REQUEST)
+
+    def test_planning_step(self):
+        agent = self._agent('single', 2)
+        steps = []
+        for step in range(1, 6):
+            agent.agent_step = step
+            steps.append(agent._is_planning_step(False))
+        self.assertEqual([True, False, True, False, True], steps)
+
+        agent = self._agent('single', 'error')
+        self.assertFalse(agent._is_planning_step(False))
+        self.assertTrue(agent._is_planning_step(True))
+
+        agent = self._agent('single', 1, thinking=False)
+        self.assertFalse(agent._is_planning_step(True))
+
+    def test_extract_plan(self):
+        agent = self._agent('single', 1)
+        self.assertEqual('- [ ] read a.py', agent._extract_plan({'_output': 'text <work_plan>\n- [ ] read a.py\n</work_plan>'}))
+        self.assertEqual('', agent._extract_plan({'_output': 'no plan'}))
+        self.assertFalse(agent.native_reasoning)
+
+        self.assertEqual('native plan', agent._extract_plan({'_output': '<work_plan>tag plan</work_plan>', '_reasoning': 'native plan'}))
+        self.assertTrue(agent.native_reasoning)
+
+    def test_single(self):
+        llm = self._scripted({'ANALYTIC': [
+            {'_output': '<work_plan>- [ ] read a.py</work_plan>', '_tool_calls': [tool_call('read_file', {'path': 'a.py'})]},
+            {'_output': '<work_plan>- [x] read a.py</work_plan>', '_tool_calls': [tool_call('report', {'text': 'x = 1'}, 'call_2')]},
+        ]})
+
+        events = [event for event in self._agent('single', 1).run() if event['type'] != 'nope']
+
+        # plan is requested in the same call as the tool: no separate calls, the request is not kept in the conversation
+        self.assertEqual(['agent', 'agent'], [call['purpose'] for call in llm.calls])
+        self.assertEqual([1, 1], [self._plan_requests(call) for call in llm.calls])
+        self.assertEqual(BaseAgent.PLAN_REQUEST, llm.calls[0]['messages'][-1]['content'])
+
+        plans = [event['message'] for event in events if event['type'] == 'markdown']
+        self.assertEqual(['- [ ] read a.py', '- [x] read a.py'], plans)
+        self.assertEqual('report', events[-1]['type'])
+
+    def test_single_frequency(self):
+        llm = self._scripted({'ANALYTIC': [
+            tool_call('list_in_directory', {'path': '.'}),
+            tool_call('read_file', {'path': 'missing.py'}, 'call_2'),
+            tool_call('read_file', {'path': 'a.py'}, 'call_3'),
+            tool_call('report', {'text': 'x = 1'}, 'call_4'),
+        ]})
+
+        list(self._agent('single', 2).run())
+        self.assertEqual([1, 0, 1, 0], [self._plan_requests(call) for call in llm.calls])
+
+    def test_single_on_error(self):
+        llm = self._scripted({'ANALYTIC': [
+            tool_call('read_file', {'path': 'missing.py'}),
+            tool_call('read_file', {'path': 'a.py'}, 'call_2'),
+            tool_call('report', {'text': 'x = 1'}, 'call_3'),
+        ]})
+
+        list(self._agent('single', 'error').run())
+        self.assertEqual([0, 1, 0], [self._plan_requests(call) for call in llm.calls])
+
+    def test_native_reasoning(self):
+        llm = self._scripted({'ANALYTIC': [
+            {'_reasoning': 'read a.py first', '_tool_calls': [tool_call('read_file', {'path': 'a.py'})]},
+            tool_call('report', {'text': 'x = 1'}, 'call_2'),
+        ]})
+
+        events = [event for event in self._agent('single', 1).run() if event['type'] != 'nope']
+
+        # the provider plans by itself: the plan is not requested after its first reasoning
+        self.assertEqual([1, 0], [self._plan_requests(call) for call in llm.calls])
+        self.assertEqual(['read a.py first'], [event['message'] for event in events if event['type'] == 'markdown'])
+
+    def test_separate(self):
+        llm = self._scripted({'ANALYTIC': [
+            {'_output': '<work_plan>- [ ] read a.py</work_plan>'},
+            tool_call('read_file', {'path': 'a.py'}),
+            {'_output': '<work_plan>- [x] read a.py</work_plan>'},
+            tool_call('report', {'text': 'x = 1'}, 'call_2'),
+        ]})
+
+        events = [event for event in self._agent('separate', 1).run() if event['type'] != 'nope']
+
+        # plan call before every tool call, the plan is kept in the conversation
+        self.assertEqual(['plan', 'agent', 'plan', 'agent'], [call['purpose'] for call in llm.calls])
+        self.assertEqual([0, 0, 0, 0], [self._plan_requests(call) for call in llm.calls])
+        self.assertEqual({'role': 'assistant', 'content': '<work_plan>- [ ] read a.py</work_plan>'}, llm.calls[1]['messages'][-1])
+        self.assertEqual(['- [ ] read a.py', '- [x] read a.py'], [event['message'] for event in events if event['type'] == 'markdown'])
+
+    def test_no_thinking(self):
+        llm = self._scripted({'ANALYTIC': [
+            tool_call('read_file', {'path': 'a.py'}),
+            tool_call('report', {'text': 'x = 1'}, 'call_2'),
+        ]})
+
+        list(self._agent('separate', 1, thinking=False).run())
+        self.assertEqual(['agent', 'agent'], [call['purpose'] for call in llm.calls])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+import os
+import time
+import tempfile
+import shutil
+import threading
+
+from cancellation import CancellationToken, TaskCancelledError
+from tool_executor import ToolExecutor, parse_timeouts, TOOL_EXECUTE_TIMEOUTS
+from command_interpreter import CommandInterpreter
+import command_interpreter
+
+
+class TestToolExecutor(unittest.TestCase):
+    def setUp(self):
+        self.executor = ToolExecutor(2, {'read_file': 0.2})
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def test_result(self):
+        self.assertEqual({'result': 'ok'}, self.executor.run('read_file', lambda: {'result': 'ok'}))
+
+    def test_timeout(self):
+        before = TOOL_EXECUTE_TIMEOUTS.collect().get((('opcode', 'read_file'),), 0)
+        start_time = time.monotonic()
+        result = self.executor.run('read_file', lambda: self.release.wait(5) and {'result': 'late'})
+
+        self.assertLess(time.monotonic() - start_time, 2)
+        self.assertTrue(result['error'])
+        self.assertTrue(result['timeout'])
+        self.assertEqual(before + 1, TOOL_EXECUTE_TIMEOUTS.collect().get((('opcode', 'read_file'),), 0))
+        self.assertEqual(1, self.executor.abandoned)
+
+        self.release.set()
+        time.sleep(0.1)
+        self.assertEqual(0, self.executor.abandoned)
+
+    def test_exception(self):
+        def fail():
+            raise OSError("disk is gone")
+
+        result = self.executor.run('write_file', fail)
+        self.assertTrue(result['error'])
+        self.assertIn('disk is gone', result['result'])
+
+    def test_cancel(self):
+        token = CancellationToken()
+        threading.Timer(0.05, token.cancel).start()
+        with self.assertRaises(TaskCancelledError):
+            self.executor.run('write_file', lambda: self.release.wait(5), token)
+
+    def test_queued_call_timeout(self):
+        executor = ToolExecutor(1, {'read_file': 0.2, 'write_file': 0.2})
+        written = threading.Event()
+        executor.run('read_file', lambda: self.release.wait(5))
+
+        # the only worker is taken by the abandoned call: the write is dropped from the queue, not run later
+        result = executor.run('write_file', written.set)
+        self.assertTrue(result['timeout'])
+        self.assertIn('not started', result['result'])
+
+        self.release.set()
+        time.sleep(0.3)
+        self.assertFalse(written.is_set())
+
+    def test_timeout_from_start(self):
+        executor = ToolExecutor(1, {'read_file': 0.3})
+        busy = threading.Thread(target=executor.run, args=('read_file', lambda: time.sleep(0.2)))
+        busy.start()
+        time.sleep(0.05)
+
+        # waits 0.15s for the worker and runs 0.2s: in the timeout of the call
+        result = executor.run('read_file', lambda: time.sleep(0.2) or {'result': 'ok'})
+        busy.join()
+        self.assertEqual({'result': 'ok'}, result)
+
+    def test_cancel_queued(self):
+        executor = ToolExecutor(1, {'read_file': 5})
+        written = threading.Event()
+        busy = threading.Thread(target=executor.run, args=('read_file', lambda: self.release.wait(5)))
+        busy.start()
+        time.sleep(0.05)
+
+        token = CancellationToken()
+        threading.Timer(0.05, token.cancel).start()
+        with self.assertRaises(TaskCancelledError):
+            executor.run('write_file', written.set, token)
+
+        self.release.set()
+        busy.join()
+        time.sleep(0.1)
+        self.assertFalse(written.is_set())
+
+    def test_parse_timeouts(self):
+        self.assertEqual({'read_file': 1.5}, parse_timeouts('read_file=1.5,'))
+
+
+class TestToolLimits(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_tool_executor_')
+        with open(os.path.join(self.test_dir, 'big.py'), 'w', encoding='utf-8') as f:
+            f.write('x = 1\n' * 100)
+        with open(os.path.join(self.test_dir, 'binary.bin'), 'wb') as f:
+            f.write(b'\xff\xfe\x00\x80' * 10)
+
+        self.max_file_bytes = command_interpreter.TOOL_MAX_FILE_BYTES
+        command_interpreter.TOOL_MAX_FILE_BYTES = 100
+
+    def tearDown(self):
+        command_interpreter.TOOL_MAX_FILE_BYTES = self.max_file_bytes
+        shutil.rmtree(self.test_dir)
+
+    def test_large_file(self):
+        interpreter = CommandInterpreter('', self.test_dir)
+        for opcode, arguments in [('read_file', ['big.py']), ('write_file', ['big.py', 'y = 2']), ('replace_code_in_file', ['big.py', 'x = 1', 'y = 2'])]:
+            result = interpreter.execute(opcode, arguments)
+            self.assertTrue(result['error'])
+            self.assertIn('larger than 100 bytes', result['result'])
+
+        with open(os.path.join(self.test_dir, 'big.py'), encoding='utf-8') as f:
+            self.assertEqual('x = 1\n' * 100, f.read())
+
+    def test_binary_file(self):
+        result = CommandInterpreter('', self.test_dir).execute('read_file', ['binary.bin'])
+        self.assertTrue(result['error'])
+        self.assertIn("can't be opened", result['result'])
+
+
+if __name__ == '__main__':
+    unittest.main()
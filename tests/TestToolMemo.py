@@ -0,0 +1,55 @@
+import unittest
+import os
+import tempfile
+import shutil
+
+from tool_memo import ToolMemo, LoopDetector
+
+
+class TestToolMemo(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_tool_memo_')
+        self.file_path = os.path.join(self.test_dir, 'a.py')
+        with open(self.file_path, 'w', encoding='utf8') as f:
+            f.write('x = 1')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_memo(self):
+        memo = ToolMemo(self.test_dir)
+        self.assertIsNone(memo.lookup('read_file', ['a.py']))
+
+        memo.store('read_file', ['a.py'], 'call_2', {'result': 'x = 1', 'tool_name': 'read', 'file_path': 'a.py'})
+        result = memo.lookup('read_file', ['./a.py'])
+        self.assertIn('unchanged since your earlier read_file call (tool_call_id `call_2`)', result['result'])
+        self.assertEqual('read', result['tool_name'])
+
+        with open(self.file_path, 'w', encoding='utf8') as f:
+            f.write('x = 100')
+        self.assertIsNone(memo.lookup('read_file', ['a.py']))
+
+    def test_not_read_only(self):
+        memo = ToolMemo(self.test_dir)
+        memo.store('write_file', ['a.py', 'x = 2'], 'call_1', {'result': 'True'})
+        self.assertIsNone(memo.lookup('write_file', ['a.py', 'x = 2']))
+
+    def test_loop_detector(self):
+        detector = LoopDetector()
+        self.assertFalse(detector.add('read:a'))
+        self.assertFalse(detector.add('read:a'))
+        self.assertTrue(detector.add('read:a'))
+
+        detector = LoopDetector()
+        sequence = ['read:a', 'write:a', 'read:b'] * 3
+        results = [detector.add(signature) for signature in sequence]
+        self.assertEqual([False] * 8 + [True], results)
+
+    def test_no_loop(self):
+        detector = LoopDetector()
+        results = [detector.add(f'read:{i % 5}') for i in range(12)]
+        self.assertFalse(any(results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import tracing
+from tracing import span
+
+
+class _MemoryExporter:
+    def __init__(self):
+        self.events = []
+
+    def export(self, event: dict):
+        self.events.append(event)
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.exporter = _MemoryExporter()
+        tracing.set_exporter(self.exporter)
+
+    def tearDown(self):
+        tracing.set_exporter(None)
+
+    def test_nested(self):
+        with span('copilot.run') as parent:
+            with span('llm_query', model='test') as child:
+                child.set(prompt_tokens=10)
+
+        self.assertEqual(['llm_query', 'copilot.run'], [e['name'] for e in self.exporter.events])
+
+        child_event, parent_event = self.exporter.events
+        self.assertEqual('X', child_event['ph'])
+        self.assertEqual(parent.span_id, child_event['args']['parent_id'])
+        self.assertEqual('test', child_event['args']['model'])
+        self.assertEqual(10, child_event['args']['prompt_tokens'])
+        self.assertIsNone(parent_event['args']['parent_id'])
+        self.assertIsNone(tracing.current_span())
+
+    def test_generator(self):
+        def _agent():
+            with span('agent.run'):
+                yield 1
+                yield 2
+
+        with span('copilot.run') as parent:
+            for _ in _agent():
+                break
+
+            self.assertIs(parent, tracing.current_span())
+
+        self.assertEqual(['agent.run', 'copilot.run'], [e['name'] for e in self.exporter.events])
+        self.assertNotIn('error', self.exporter.events[0]['args'])
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            with span('tool.execute'):
+                raise ValueError()
+
+        self.assertEqual('ValueError', self.exporter.events[0]['args']['error'])
+
+    def test_disabled(self):
+        tracing.set_exporter(None)
+        with span('llm_query') as s:
+            s.set(model='test')
+
+        self.assertEqual([], self.exporter.events)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from agents import BaseAgent
+from algorythm import Copilot
+from log_writer import LOG_WRITER
+
+
+def tool_call(name, arguments, id='call_1'):
+    return SimpleNamespace(id=id, type='function', function=SimpleNamespace(name=name, arguments=arguments if type(arguments) is str else json.dumps(arguments)))
+
+
+class ScriptedLLM:
+    """
+    llm_query of the supervisor and agents: answers by the script of `ROLE:instruction` or of `ROLE`,
+    debits the same usage every call.
+    Script item: tool call, LLM output dict, exception to raise or callable(cancel_token) returning one of them.
+    """
+    USAGE = {'prompt_tokens': 1000, 'completion_tokens': 10}
+
+    def __init__(self, script: dict):
+        self.script = script
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, messages, tags=None, tools=None, model_name=None, cancel_token=None, purpose=None, budget=None):
+        names = [tool['function']['name'] for tool in tools or []]
+        role = 'SUPERVISOR' if 'call_agent' in names else ('CODER' if 'write_file' in names else 'ANALYTIC')
+        instruction = messages[1]['content'] if len(messages) > 1 else ''
+        key = f"{role}:{instruction}" if f"{role}:{instruction}" in self.script else role
+        with self._lock:
+            self.calls.append({'role': role, 'instruction': instruction, 'purpose': purpose, 'messages': messages})
+            item = self.script[key].pop(0)
+
+        if budget:
+            budget.debit('main', self.USAGE)
+
+        if callable(item):
+            item = item(cancel_token)
+        if isinstance(item, BaseException):
+            raise item
+        if type(item) is dict:
+            return {'_output': '', '_tool_calls': [], **item}
+
+        return {'_output': '', '_tool_calls': [item]}
+
+
+class CopilotTestCase(unittest.TestCase):
+    """
+    Project of two files, journal, logs and storage in a temp dir; `_scripted` patches llm_query
+    """
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix='test_copilot_')
+        self.project_dir = os.path.join(self.test_dir, 'project')
+        os.makedirs(self.project_dir)
+        for name in ['a.py', 'b.py']:
+            with open(os.path.join(self.project_dir, name), 'w', encoding='utf8') as f:
+                f.write('x = 1\n')
+
+        self.patches = [
+            mock.patch('agents.DEEPTHINKING_AGENTS', []),
+            mock.patch('journal.JOURNAL_PATH', os.path.join(self.test_dir, 'journal')),
+            mock.patch.object(Copilot, 'LOG_PATH', os.path.join(self.test_dir, 'logs')),
+            mock.patch.object(BaseAgent, 'STORAGE_PATH', os.path.join(self.test_dir, 'storage')),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+        LOG_WRITER.flush(5)
+        shutil.rmtree(self.test_dir)
+
+    def _scripted(self, script: dict) -> ScriptedLLM:
+        llm = ScriptedLLM(script)
+        for module in ['agents', 'algorythm']:
+            patch = mock.patch(f'{module}.llm_query', llm)
+            patch.start()
+            self.patches.append(patch)
+
+        return llm
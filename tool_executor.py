@@ -0,0 +1,124 @@
+import contextvars
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from config import CONFIG
+from cancellation import CancellationToken, TaskCancelledError
+from metrics import REGISTRY
+
+logger = logging.getLogger('APP')
+
+TOOL_WORKERS = CONFIG.tool_workers
+# per opcode timeouts: `opcode=seconds,...`
+TOOL_TIMEOUTS = CONFIG.tool_timeouts
+# files larger than the limit are not read or patched by tools
+TOOL_MAX_FILE_BYTES = CONFIG.tool_max_file_bytes
+
+TOOL_EXECUTE_TIMEOUTS = REGISTRY.counter('tool_execute_timeouts_total', 'Tool executions abandoned after the timeout per opcode')
+TOOL_EXECUTE_EXCEPTIONS = REGISTRY.counter('tool_execute_exceptions_total', 'Tool executions failed by an exception per opcode')
+
+
+def parse_timeouts(timeouts: str) -> dict:
+    result = {}
+    for item in timeouts.split(','):
+        if '=' not in item:
+            continue
+
+        opcode, seconds = item.split('=', 1)
+        result[opcode.strip()] = float(seconds)
+
+    return result
+
+
+class ToolExecutor:
+    """
+    Runs tool calls on a bounded thread pool with per-opcode timeouts, the caller waits for the result
+    and sees timeouts and exceptions as tool errors. The timeout is counted from the start of the call;
+    a call which is not started in the timeout or before the task is cancelled is removed from the queue.
+    Threads can't be killed: a running call is abandoned, its worker is busy until the call returns
+    (`abandoned` counts such workers).
+    """
+    DEFAULT_TIMEOUT = 30.0
+    DEFAULT_TIMEOUTS = {
+        'read_file': 30.0,
+        'read_more': 30.0,
+        'list_in_directory': 30.0,
+        'list_tree': 30.0,
+        'write_file': 60.0,
+        'replace_code_in_file': 60.0,
+    }
+
+    def __init__(self, workers: int, timeouts: dict|None = None):
+        self.timeouts = dict(self.DEFAULT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self.abandoned = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tool')
+        self._lock = threading.Lock()
+
+    def _abandon(self, future):
+        with self._lock:
+            self.abandoned += 1
+
+        def _release(_):
+            with self._lock:
+                self.abandoned -= 1
+
+        future.add_done_callback(_release)
+
+    def run(self, opcode: str, fn, cancel_token: CancellationToken|None = None) -> dict:
+        timeout = self.timeouts.get(opcode, self.DEFAULT_TIMEOUT)
+        call_state = {}
+
+        def _call():
+            # the timeout is counted from the start of the call: waiting for a free worker is not included
+            call_state['start_time'] = time.monotonic()
+            return fn()
+
+        # tracing spans of the tool are children of the caller's span
+        future = self._executor.submit(contextvars.copy_context().run, _call)
+        submit_time = time.monotonic()
+        is_started = True
+        try:
+            while True:
+                try:
+                    return future.result(timeout=CancellationToken.POLL_INTERVAL)
+                except FutureTimeoutError:
+                    pass
+
+                if cancel_token and cancel_token.is_cancelled:
+                    # a queued call never runs, a running one can't be stopped
+                    if not future.cancel():
+                        self._abandon(future)
+                    raise TaskCancelledError("Task was cancelled")
+
+                start_time = call_state.get('start_time')
+                if start_time is None and time.monotonic() - submit_time >= timeout and future.cancel():
+                    # all workers are busy (abandoned calls): the call is dropped before it's started
+                    is_started = False
+                    break
+                if start_time is not None and time.monotonic() - start_time >= timeout:
+                    break
+        except TaskCancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"Tool `{opcode}` failed")
+            TOOL_EXECUTE_EXCEPTIONS.inc(opcode=opcode)
+            return {'result': f"ERROR: tool failed: {type(e).__name__}: {e}", 'error': True}
+
+        logger.warning(f"Tool `{opcode}` timed out after {timeout}s" + ('' if is_started else ' in the queue'))
+        TOOL_EXECUTE_TIMEOUTS.inc(opcode=opcode)
+        if not is_started:
+            return {'result': f"ERROR: tool was not started in {timeout:g}s, all workers are busy: the call is not executed", 'error': True, 'timeout': True}
+
+        self._abandon(future)
+        message = f"ERROR: tool timed out after {timeout:g}s"
+        if opcode in ['write_file', 'replace_code_in_file']:
+            message += ", the file can still be changed: read it before retrying"
+
+        return {'result': message, 'error': True, 'timeout': True}
+
+
+TOOL_EXECUTOR = ToolExecutor(TOOL_WORKERS, parse_timeouts(TOOL_TIMEOUTS))
@@ -0,0 +1,80 @@
+import json
+import os
+
+from metrics import REGISTRY
+
+TOOL_MEMO_HITS = REGISTRY.counter('tool_memo_hits_total', 'Repeated read-only tool calls answered by reference to an earlier result')
+AGENT_LOOPS = REGISTRY.counter('agent_loops_detected_total', 'Repeated cycles of tool calls detected per role')
+
+
+class ToolMemo:
+    """
+    Memo table of read-only tool calls of one agent run keyed by (opcode, normalized args, file version):
+    repeated call with unchanged file is answered by reference to the tool call which returned the full result.
+    The memo is per agent: results of other agents are not in its conversation (they share the file cache instead).
+    """
+    READ_ONLY_OPCODES = ['read_file', 'list_in_directory']
+
+    def __init__(self, project_root: str):
+        self.project_root = project_root
+        self._memo = {}
+
+    def _key(self, opcode: str, args: list) -> tuple|None:
+        if opcode not in self.READ_ONLY_OPCODES or len(args) != 1 or type(args[0]) is not str:
+            return None
+
+        path = os.path.normpath(args[0].replace('\\', '/')).replace('\\', '/')
+        try:
+            stat = os.stat(os.path.join(self.project_root, path))
+        except OSError:
+            return None
+
+        return opcode, path, stat.st_mtime_ns, stat.st_size
+
+    def lookup(self, opcode: str, args: list) -> dict|None:
+        key = self._key(opcode, args)
+        if key is None or key not in self._memo:
+            return None
+
+        tool_call_id, result = self._memo[key]
+        TOOL_MEMO_HITS.inc(opcode=opcode)
+
+        subject = 'Directory listing' if opcode == 'list_in_directory' else 'File'
+        memo_result = {k: v for k, v in result.items() if k != 'result'}
+        memo_result['result'] = f"{subject} `{key[1]}` is unchanged since your earlier {opcode} call (tool_call_id `{tool_call_id}`), use its result above."
+        memo_result['memo_tool_call_id'] = tool_call_id
+        return memo_result
+
+    def store(self, opcode: str, args: list, tool_call_id: str, result: dict):
+        key = self._key(opcode, args)
+        if key is not None:
+            self._memo[key] = (tool_call_id, dict(result))
+
+
+class LoopDetector:
+    """
+    Detects cycles of tool calls: the last `period` calls (period 1..MAX_PERIOD) repeated MIN_REPEATS times in a row
+    """
+    MAX_PERIOD = 4
+    MIN_REPEATS = 3
+
+    def __init__(self):
+        self.history = []
+
+    @staticmethod
+    def signature(function: str, args: list) -> str:
+        return function + ':' + json.dumps(args, ensure_ascii=False, sort_keys=True, default=str)
+
+    def add(self, signature: str) -> bool:
+        self.history.append(signature)
+
+        for period in range(1, self.MAX_PERIOD + 1):
+            window = period * self.MIN_REPEATS
+            if len(self.history) < window:
+                break
+
+            tail = self.history[-window:]
+            if all(tail[i] == tail[i % period] for i in range(window)):
+                return True
+
+        return False
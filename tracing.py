@@ -0,0 +1,117 @@
+import contextvars
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from config import CONFIG
+
+# Spans are written as Chrome trace events (one JSON object per line),
+# convert file into JSON array for chrome://tracing or ui.perfetto.dev:
+#   python tracing.py ./conversations_log/trace.jsonl > trace.json
+TRACE_FILE = CONFIG.trace_file
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ('name', 'span_id', 'parent_id', 'attributes', 'start_time')
+
+    def __init__(self, name: str, parent_id: int|None, attributes: dict):
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_time = time.time()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_event(self, end_time: float) -> dict:
+        args = {'span_id': self.span_id, 'parent_id': self.parent_id}
+        args.update(self.attributes)
+
+        return {
+            'name': self.name,
+            'cat': self.name.split('.')[0],
+            'ph': 'X',
+            'ts': int(self.start_time * 1_000_000),
+            'dur': int((end_time - self.start_time) * 1_000_000),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+
+class JsonlExporter:
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, event: dict):
+        line = json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.file_path, 'a', encoding='utf8')
+
+            self._file.write(line)
+            self._file.flush()
+
+
+_exporter = JsonlExporter(TRACE_FILE) if TRACE_FILE else None
+
+
+def set_exporter(exporter):
+    global _exporter
+    _exporter = exporter
+
+
+@contextmanager
+def span(name: str, **attributes):
+    if _exporter is None:
+        yield _NoopSpan()
+        return
+
+    parent = _current_span.get()
+    current = Span(name, parent.span_id if parent else None, attributes)
+    _current_span.set(current)
+    try:
+        yield current
+    except GeneratorExit:
+        raise
+    except BaseException as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        # generators can be closed out of order, so don't use ContextVar.reset()
+        _current_span.set(parent)
+        _exporter.export(current.to_event(time.time()))
+
+
+def current_span() -> Span|None:
+    return _current_span.get()
+
+
+def jsonl_to_trace(jsonl_path: str) -> str:
+    events = []
+    with open(jsonl_path, 'r', encoding='utf8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+
+    return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'}, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    print(jsonl_to_trace(sys.argv[1] if len(sys.argv) > 1 else TRACE_FILE))